@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""ForecastDataSet serialization benchmark.
+
+Builds a synthetic dataset with NetbewustLaden and compares the generated
+serializers against the generic pydantic path,
+`json.dumps(model_dump(exclude_none=True), indent=2, default=str)`, for
+both speed and byte-identical output.
+
+    python benchmarks/bench_serialize.py [-s SUBSTATIONS]
+"""
+
+from argparse import ArgumentParser
+from json import dumps
+from time import perf_counter
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from linkml_dataset.netbewust_laden import NetbewustLaden  # noqa: E402
+from linkml_dataset.models.dp_netbewust_laden_json import dumps as dump_json  # noqa: E402
+
+CRS = 'urn:ogc:def:crs:EPSG::28992'
+
+
+def build(substations, transformers=4, charge_points=5):
+    nbl = NetbewustLaden('Benchmark', False)
+    for s in range(substations):
+        for t in range(transformers):
+            ce_name = f'TR-{s}-{t}'
+            for c in range(charge_points):
+                nbl.charge_points(f'SUB-{s}', ce_name, f'8710{s:06d}{t}{c:04d}',
+                                  f'CPO {c % 3}', 'Charge Point Operator',
+                                  '1234AB', str(c + 1), 'Arnhem', 'Centrum',
+                                  'Gelderland', CRS, str(120000.5 + c),
+                                  str(480000.25 + c))
+            nbl.assets(f'SUB-{s}', ce_name, 'Transformer', '1234AB', 'Straat',
+                       str(t + 1), None, 'Arnhem', 'Centrum', 'Gelderland',
+                       CRS, '120000.0', '480000.0',
+                       ('Load', 'ThreePhaseActivePower', 'k', 'W', 100.0 + t,
+                        '2025-01-01T00:00:00+00:00'),
+                       ('Capacity', 'k', 'W', 400.0),
+                       ('NBL Limit', 'k', 'W', 320.0))
+    return nbl
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-s', '--substations', type=int, default=500)
+    args = parser.parse_args()
+    fc = build(args.substations)._fc
+    start = perf_counter()
+    expected = dumps(fc.model_dump(exclude_none=True), indent=2, default=str)
+    pydantic = perf_counter() - start
+    start = perf_counter()
+    actual = dump_json(fc)
+    generated = perf_counter() - start
+    print(f'output size        {len(actual) / 1e6:8.1f} MB')
+    print(f'pydantic + json    {pydantic:8.3f} s')
+    print(f'generated          {generated:8.3f} s  ({pydantic / generated:.1f}x)')
+    print(f'byte-identical     {actual == expected}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""CLI startup benchmark.
+
+Times `linkml-dataset --help` and the subcommand help pages in fresh
+interpreters, against an eager baseline that imports every subcommand
+module and builds all pydantic schemas up front (the behaviour before
+imports were made lazy).  Also reports which heavy modules a plain
+`--help` loads.
+
+    python benchmarks/bench_startup.py [-n RUNS]
+"""
+
+from argparse import ArgumentParser
+from statistics import median
+from subprocess import run
+from time import perf_counter
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLI = ("import sys; sys.argv[0] = 'linkml-dataset'; "
+       "from linkml_dataset.__main__ import cli; cli()")
+EAGER = ("import linkml_dataset.cgmes, linkml_dataset.netbewust_laden; "
+         "from linkml_dataset.models import dp_netbewust_laden as m; "
+         "from pydantic import BaseModel; "
+         "[c.model_rebuild(force=True) for c in vars(m).values() "
+         "if isinstance(c, type) and issubclass(c, BaseModel) "
+         "and c.__module__ == m.__name__]; ")
+LOADED = ("import sys; sys.argv = ['linkml-dataset', '--help']; "
+          "from linkml_dataset.__main__ import cli\n"
+          "try:\n    cli()\nexcept SystemExit:\n    pass\n"
+          "print(' '.join(m for m in ('rdflib', 'pydantic', "
+          "'linkml_dataset.models.dp_netbewust_laden') if m in sys.modules), "
+          "file=sys.stderr)")
+
+
+def timeit(code, args, runs):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        run([sys.executable, '-c', code, *args], cwd=ROOT, check=True,
+            capture_output=True)
+        times.append(perf_counter() - start)
+    return median(times)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    args = parser.parse_args()
+    python = timeit('pass', [], args.runs)
+    print(f'{"interpreter only":<32} {python * 1e3:8.1f} ms')
+    for argv in (['--help'], ['cgmes', '--help'],
+                 ['netbewust-laden', '--help']):
+        label = ' '.join(argv)
+        lazy = timeit(CLI, argv, args.runs)
+        eager = timeit(EAGER + CLI, argv, args.runs)
+        print(f'{label:<32} {lazy * 1e3:8.1f} ms  (eager {eager * 1e3:.1f} ms,'
+              f' {eager / lazy:.1f}x)')
+    loaded = run([sys.executable, '-c', LOADED], cwd=ROOT, check=True,
+                 capture_output=True, text=True).stderr.strip()
+    print(f'{"modules loaded by --help":<32} {loaded or "none"}')
+
+
+if __name__ == '__main__':
+    main()
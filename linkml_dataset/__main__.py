@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 
-from click import option, group, argument, File, echo, ClickException
+from click import (option, group, argument, File, Path, Choice, FloatRange,
+                   echo, ClickException, get_current_context)
 from sys import stdin, stdout
 from pprint import pprint
-from csv import DictReader
+from contextlib import nullcontext
+from itertools import islice
+from io import StringIO
 
-from .netbewust_laden import NetbewustLaden
-from .cgmes import CGMES
+# Subcommand modules are imported in the commands themselves, so rdflib
+# and the pydantic models are only loaded when they are needed.
 
 import logging
 log = logging.getLogger(__name__)
@@ -28,10 +31,71 @@ def catch_exception(func=None, *, handle):
     return wrapper
 
 
+def _load_cgmes(jsonfile, cache_dir, cache_size):
+    from .cgmes import CGMES, GraphCache
+    cache = GraphCache(cache_dir, cache_size << 20) if cache_dir else None
+    return CGMES(jsonfile, cache)
+
+
+def _scan(batch, charge_points, assets, delimiter, count, cache_dir=None,
+          cache_size=None, mapped=False):
+    """Route the rows of the CSV files to the builders of a Batch."""
+    from .readers import read_rows, RowCache
+    cache = None
+    if cache_dir:
+        cache = RowCache(cache_dir, cache_size << 20)
+    for f, process, kind in ((charge_points, batch.charge_points,
+                              'charge_points'),
+                             (assets, batch.assets, 'assets')):
+        rows = read_rows(f, kind, delimiter, cache, mapped, batch.column)
+        try:
+            for c, args in enumerate(rows, start=1):
+                if count is not None and c > count:
+                    break
+                if c % 1000 == 0:
+                    log.info(f'Processed {c} {kind.replace("_", " ")}')
+                if args is None:
+                    continue
+                try:
+                    process(args)
+                except ValueError:
+                    continue
+        except KeyError as e:
+            raise ClickException(f'Missing column {e} in the '
+                                 f'{kind.replace("_", " ")}')
+
+
+def _profile(path):
+    """Profile the rest of the run, writing the collapsed stacks to `path`
+    and a summary table to `path`.txt when the command finishes."""
+    from .profiling import Profiler
+    profiler = Profiler()
+
+    def finish():
+        profiler.stop()
+        with open(path, 'w') as out:
+            profiler.write_collapsed(out)
+        summary = StringIO()
+        profiler.write_summary(summary)
+        with open(f'{path}.txt', 'w') as out:
+            out.write(summary.getvalue())
+        log.info(f'Wrote profile to {path} and {path}.txt\n'
+                 f'{summary.getvalue()}')
+    try:
+        profiler.start()
+    except RuntimeError as e:
+        raise ClickException(str(e))
+    get_current_context().call_on_close(finish)
+
+
 @group()
 @option('--log', type=File(mode='a'), help='Filename for log file')
 @option('--debug', is_flag=True, default=False, help='Enable debug mode')
-def cli(log, debug):
+@option('--profile', default=None, type=Path(dir_okay=False),
+        help='Profile the command with a sampling profiler and tracemalloc. '
+             'Writes collapsed stacks to PROFILE and a summary to '
+             'PROFILE.txt')
+def cli(log, debug, profile):
     """ """
     # Setup logging
     if log:
@@ -44,99 +108,438 @@ def cli(log, debug):
     # Set log level
     level = logging.DEBUG if debug else logging.INFO
     logging.root.setLevel(level)
+    if profile:
+        _profile(profile)
 
 
 @cli.command()
 @option('--out', '-o', type=File('wt'), default=stdout,
         help='Output file.  Omit to print schema to stdout')
-@option('--region', '-r', required=True, help='Region of DSO')
+@option('--region', '-r', default=None,
+        help='Region of DSO.  Required without --base')
+@option('--base', type=File('r'), default=None,
+        help='ForecastDataSet JSON file to append the rows to')
 @option('--assets', type=File('r'), required=True)
 @option('--delimiter', '-d', default=',', help='Delimiter used in CSV file')
 @option('--only-coord', is_flag=True, default=False,
         help='Reduce location information')
 @option('--count', '-c', required=False, default=None, type=int,
         help='Number of rows to process')
+@option('--max-memory', default=None, type=int,
+        help='Memory budget in MB for finished entities before they are '
+             'spilled to disk')
+@option('--spill-dir', default=None, type=Path(file_okay=False),
+        help='Directory for spill files.  Defaults to the temp directory')
+@option('--format', '-f', 'fmt', default='json', show_default=True,
+        type=Choice(['json', 'nt', 'jsonld']),
+        help='Output format: ForecastDataSet JSON, N-Triples or JSON-LD')
+@option('--shard-by', type=Choice(['substation']), default=None,
+        help='Write shards with a manifest to --out-dir instead of one file')
+@option('--shard-size', default=100, type=int, show_default=True,
+        help='Number of substations per shard')
+@option('--out-dir', default=None, type=Path(file_okay=False),
+        help='Directory for the shards')
+@option('--jobs', '-j', default=1, type=int, show_default=True,
+        help='Number of worker processes building shards')
+@option('--target-crs', default=None,
+        help='Reproject positions to this CRS, EPSG:4326 (WGS84) or '
+             'EPSG:28992 (RD New)')
+@option('--match-radius', default=None,
+        type=FloatRange(min=0, min_open=True),
+        help='Assign charge points with an unknown transformer to the '
+             'nearest transformer within this many metres')
+@option('--loads', type=File('r'), default=None,
+        help='CSV file with a load value per transformer and timestamp, '
+             'used as the AnalogValues of the transformers')
+@option('--load-window', default=None,
+        help='Aggregate the loads per window, e.g. 900, 15m, 1h or 1d')
+@option('--load-aggregate', default='max', show_default=True,
+        help='Aggregate of the loads per window: max, min, mean or a '
+             'percentile such as p95')
+@option('--sample', default=None,
+        type=FloatRange(min=0, max=1, min_open=True),
+        help='Build only this fraction of the substations and project the '
+             'size and duration of the full run')
+@option('--dedup', default=None, type=Choice(['first', 'last', 'error']),
+        help='Build one charge point per EAN and one asset per transformer, '
+             'keeping the first or last row, or stop at a duplicate')
+@option('--rejects', type=File('w'), default=None,
+        help='CSV file for the rows rejected as duplicates')
+@option('--mmap', 'mapped', is_flag=True, default=False,
+        help='Read CSV files without quotes through a memory map, decoding '
+             'only the used columns')
+@option('--cache-dir', envvar='LINKML_DATASET_CACHE', default=None,
+        type=Path(file_okay=False),
+        help='Directory for caching parsed CSV rows')
+@option('--cache-size', default=1024, type=int, show_default=True,
+        help='Maximum size of the cache directory in MB')
 @argument('charge_points', type=File('r'), required=True)
-def netbewust_laden(charge_points, assets, out, region, delimiter, only_coord,
-                    count):
+def netbewust_laden(charge_points, assets, out, region, base, delimiter,
+                    only_coord, count, max_memory, spill_dir, fmt, shard_by,
+                    shard_size, out_dir, jobs, target_crs, match_radius,
+                    loads, load_window, load_aggregate, sample, dedup,
+                    rejects, mapped, cache_dir, cache_size):
     """Process NBL Forecast"""
-    nbl = NetbewustLaden(region, only_coord)
-    # Process each row in the Charge Point CSV
-    reader = DictReader(charge_points, delimiter=delimiter)
-    for c, row in enumerate(reader, start=1):
-        if count is not None and c > count:
-            break
+    from .netbewust_laden import NetbewustLaden
+    from .readers import read_rows, RowCache
+    from .dedup import DuplicateError
+    if region is None and base is None:
+        raise ClickException('Missing option --region or --base')
+    if shard_by is not None:
+        if region is None or base is not None or fmt != 'json':
+            raise ClickException('--shard-by needs --region, and does not '
+                                 'support --base or --format')
+        if (target_crs is not None or match_radius is not None or
+                loads is not None or sample is not None or
+                dedup is not None):
+            raise ClickException('--shard-by does not support --target-crs, '
+                                 '--match-radius, --loads, --sample or '
+                                 '--dedup')
+        if out_dir is None:
+            raise ClickException('--shard-by needs --out-dir')
+        from .batch import Shards
+        shards = Shards(region, only_coord, shard_size, jobs, max_memory,
+                        spill_dir)
+        _scan(shards, charge_points, assets, delimiter, count, cache_dir,
+              cache_size, mapped)
+        shards.write(out_dir)
+        return
+    deduplicator = None
+    if dedup is not None:
+        from .dedup import Deduplicator
+        if dedup == 'last' and not (charge_points.seekable() and
+                                    assets.seekable()):
+            raise ClickException('--dedup last reads the CSV files twice, '
+                                 'they cannot be read from stdin')
+        deduplicator = Deduplicator(dedup, rejects)
+    elif rejects is not None:
+        raise ClickException('--rejects needs --dedup')
+    sampler = None
+    if sample is not None:
+        from .sample import Sampler
+        sampler = Sampler(sample)
+    reprojector = None
+    if target_crs is not None:
+        from .crs import Reprojector
         try:
-            if c % 1000 == 0:
-                log.info(f'Processed {c} charge points')
-            nbl.charge_points(row['1_Substation.Name'],
-                              row['2_ConductingEquipment.Name'],
-                              row['100_MarketEvaluationPoint.EAN'].strip("'"),
-                              row['110_MarketParticipant.Name'],
-                              # row['111_MarketRole.Name'],
-                              'Charge Point Operator',
-                              row['120_StreetAddress.Postalcode'],
-                              row['122_StreetDetail.Number'].strip(' ELP'),
-                              row['123_TownDetail.Name'],
-                              row['124_TownDetail.Section'],
-                              row['125_TownDetail.StateOrProvince'],
-                              row['126_CoordinateSystem.Name'],
-                              row['127_PositionPoint.Xposition'].strip("'"),
-                              row['128_PositionPoint.Yposition'].strip("'"))
+            reprojector = Reprojector(target_crs)
         except ValueError as e:
-            # log.error(e)
-            continue
-    # Process each row in the Charge Point CSV
-    reader = DictReader(assets, delimiter=delimiter)
-    for c, row in enumerate(reader, start=1):
-        if count is not None and c > count:
-            break
+            raise ClickException(str(e))
+    store = None
+    if max_memory is not None:
+        from .store import EntityStore
+        store = EntityStore(max_memory << 20, spill_dir)
+    if base is not None:
+        log.info(f'Loading {base.name}')
+        nbl = NetbewustLaden.load(base, only_coord, store)
+        store = nbl._store
+        if deduplicator is not None:
+            deduplicator.seed('charge_points', nbl.eans())
+            deduplicator.seed('assets', nbl.asset_transformers())
+    else:
+        nbl = NetbewustLaden(region, only_coord, store)
+    if loads is not None:
+        from .timeseries import duration, read_loads
         try:
-            if c % 1000 == 0:
-                log.info(f'Processed {c} assets')
-            nbl.assets(row['1_Substation.Name'],
-                       row['2_ConductingEquipment.Name'],
-                       row['3_MktPSRType.PsrType'],
-                       row['10_StreetAddress.Postalcode'],
-                       row['11_StreetDetail.Name'],
-                       row['12_StreetDetail.Number'],
-                       row['13_StreetDetail.Code'],
-                       row['14_TownDetail.Name'],
-                       row['15_TownDetail.Section'],
-                       row['16_TownDetail.StateOrProvince'],
-                       row['17_CoordinateSystem.Name'],
-                       row['18_PositionPoint.Xposition'].strip("'"),
-                       row['19_PositionPoint.Yposition'].strip("'"),
-                       (row['30_Analog.Name'],
-                        row['31_Analog.MeasurementType'],
-                        row['32_Analog.UnitMultiplier'],
-                        row['33_Analog.UnitSymbol'],
-                        float(row['34_AnalogValue.Value']),
-                        row['35_AnalogValue.Timestamp']),
-                       (row['40_OperationalLimitSet.Name'],
-                        row['41_ActivePowerLimit.UnitMultiplier'],
-                        row['42_ActivePowerLimit.UnitSymbol'],
-                        float(row['43_ActivePowerLimit.Value'])),
-                       (row['50_OperationalLimitSet.Name'],
-                        row['51_ActivePowerLimit.UnitMultiplier'],
-                        row['52_ActivePowerLimit.UnitSymbol'],
-                        float(row['53_ActivePowerLimit.Value'])))
+            window = (duration(load_window) if load_window is not None
+                      else None)
+            nbl.set_loads(read_loads(loads, delimiter, window,
+                                     load_aggregate))
+        except KeyError as e:
+            raise ClickException(f'Missing column {e} in --loads')
         except ValueError as e:
-            # log.error(f'{row['2_ConductingEquipment.Name']}: {e}')
-            continue
+            raise ClickException(str(e))
+    cache = None
+    if cache_dir:
+        cache = RowCache(cache_dir, cache_size << 20)
+        if count is not None:
+            log.info('Not all rows are read with --count, the rows are '
+                     'only cached by runs without it')
+    matcher = None
+    if match_radius is not None:
+        from .match import TransformerMatcher
+        if not assets.seekable():
+            raise ClickException('--match-radius reads the assets twice, '
+                                 'they cannot be read from stdin')
+        matcher = TransformerMatcher(match_radius, nbl._power_transformers)
+        matcher.add_assets(read_rows(assets, 'assets', delimiter, cache,
+                                     mapped))
+        assets.seek(0)
+    # Process each row of the charge point and asset CSVs
+    for f, process, kind in ((charge_points, nbl.charge_points,
+                              'charge_points'),
+                             (assets, nbl.assets, 'assets')):
+        rows = read_rows(f, kind, delimiter, cache, mapped)
+        if deduplicator is not None:
+            if deduplicator.policy == 'last':
+                # Only the processed rows take part in the deduplication
+                deduplicator.scan(rows if count is None
+                                  else islice(rows, count), kind)
+                f.seek(0)
+                rows = read_rows(f, kind, delimiter, cache, mapped)
+            rows = deduplicator.rows(rows, kind)
+        if matcher is not None and kind == 'charge_points':
+            rows = matcher.rows(rows)
+        if sampler is not None:
+            rows = sampler.rows_of(rows, kind)
+            process = sampler.timed(process)
+        if reprojector is not None:
+            rows = reprojector.rows(rows)
+        with (sampler.building(nbl, kind) if sampler is not None
+              else nullcontext()):
+            try:
+                for c, args in enumerate(rows, start=1):
+                    if count is not None and c > count:
+                        break
+                    if c % 1000 == 0:
+                        log.info(f'Processed {c} {kind.replace("_", " ")}')
+                    if args is None:
+                        continue
+                    try:
+                        process(*args)
+                    except ValueError:
+                        continue
+            except DuplicateError as e:
+                raise ClickException(str(e))
+    if deduplicator is not None:
+        deduplicator.log()
+    if matcher is not None:
+        matcher.log()
+    if reprojector is not None:
+        reprojector.log()
     # Output dataset
-    echo(nbl, file=out)
+    with (sampler.writing(out) if sampler is not None
+          else nullcontext(out)) as out:
+        if fmt == 'json':
+            nbl.write(out)
+            out.write('\n')
+        else:
+            from .rdf import write_rdf
+            log.info('Writing RDF output')
+            write_rdf(out, nbl.fields(), fmt)
+    if sampler is not None:
+        sampler.log()
+    if store is not None:
+        store.close()
+
+
+@cli.command()
+@option('--out-dir', '-o', required=True, type=Path(file_okay=False),
+        help='Directory for the ForecastDataSet of each region')
+@option('--region-column', default=None,
+        help='CSV column with the region of each row')
+@option('--region-map', type=File('r'), default=None,
+        help='CSV file with region and substation name columns')
+@option('--assets', type=File('r'), required=True)
+@option('--delimiter', '-d', default=',', help='Delimiter used in CSV file')
+@option('--only-coord', is_flag=True, default=False,
+        help='Reduce location information')
+@option('--count', '-c', required=False, default=None, type=int,
+        help='Number of rows to process')
+@option('--jobs', '-j', default=1, type=int, show_default=True,
+        help='Number of worker processes building regions')
+@option('--max-memory', default=None, type=int,
+        help='Memory budget in MB per region for finished entities before '
+             'they are spilled to disk')
+@option('--spill-dir', default=None, type=Path(file_okay=False),
+        help='Directory for spill files.  Defaults to the temp directory')
+@option('--mmap', 'mapped', is_flag=True, default=False,
+        help='Read CSV files without quotes through a memory map, decoding '
+             'only the used columns')
+@option('--cache-dir', envvar='LINKML_DATASET_CACHE', default=None,
+        type=Path(file_okay=False),
+        help='Directory for caching parsed CSV rows')
+@option('--cache-size', default=1024, type=int, show_default=True,
+        help='Maximum size of the cache directory in MB')
+@argument('charge_points', type=File('r'), required=True)
+def netbewust_laden_batch(charge_points, assets, out_dir, region_column,
+                          region_map, delimiter, only_coord, count, jobs,
+                          max_memory, spill_dir, mapped, cache_dir,
+                          cache_size):
+    """Process NBL Forecasts of many regions in one pass"""
+    from .batch import Batch, read_region_map
+    if (region_column is None) == (region_map is None):
+        raise ClickException('Use either --region-column or --region-map')
+    if region_map is not None:
+        region_map = read_region_map(region_map, delimiter)
+    batch = Batch(only_coord, region_column, region_map, jobs, max_memory,
+                  spill_dir)
+    _scan(batch, charge_points, assets, delimiter, count, cache_dir,
+          cache_size, mapped)
+    batch.write(out_dir)
 
 
 @cli.command()
 @option('--out', '-o', type=File('wt'), default=stdout,
         help='Output file.  Omit to print to stdout')
+@option('--max-memory', default=256, type=int, show_default=True,
+        help='Memory budget in MB for merged entities before they are '
+             'spilled to disk')
+@option('--spill-dir', default=None, type=Path(file_okay=False),
+        help='Directory for spill files.  Defaults to the temp directory')
+@argument('inputs', nargs=-1, required=True, type=File('r'))
+def merge(inputs, out, max_memory, spill_dir):
+    """Merge ForecastDataSet JSON files"""
+    from .merge import Merge
+    merged = Merge(max_memory << 20, spill_dir)
+    for f in inputs:
+        log.info(f'Reading {f.name}')
+        merged.add(f)
+    merged.write(out)
+    out.write('\n')
+    merged.close()
+
+
+@cli.command()
+@option('--out', '-o', type=File('wt'), default=stdout,
+        help='Output file.  Omit to print to stdout')
+@option('--max-memory', default=64, type=int, show_default=True,
+        help='Memory budget in MB for the page cache of the diff database')
+@option('--spill-dir', default=None, type=Path(file_okay=False),
+        help='Directory for the diff database.  Defaults to the temp '
+             'directory')
+@argument('old', type=File('r'))
+@argument('new', type=File('r'))
+def diff(old, new, out, max_memory, spill_dir):
+    """Diff two ForecastDataSet JSON files as NDJSON"""
+    from .diff import Diff
+    d = Diff(old, new, spill_dir, max_memory << 20)
+    try:
+        n = d.write(out)
+    finally:
+        d.close()
+    log.info(f'{n} differences')
+
+
+@cli.command()
+@option('--out', '-o', type=File('wt'), default=stdout,
+        help='Output file for the problems.  Omit to print to stdout')
+@option('--max-memory', default=64, type=int, show_default=True,
+        help='Memory budget in MB for the page cache of the index database')
+@option('--spill-dir', default=None, type=Path(file_okay=False),
+        help='Directory for the index database.  Defaults to the temp '
+             'directory')
+@argument('jsonfile', type=File('r'))
+def verify(jsonfile, out, max_memory, spill_dir):
+    """Verify the mRID references of a ForecastDataSet JSON file"""
+    from .verify import Verifier
+    verifier = Verifier(jsonfile, spill_dir, max_memory << 20)
+    try:
+        counts = verifier.write(out)
+    finally:
+        verifier.close()
+    log.info(f'Verified {verifier.entities} entities')
+    if counts:
+        raise ClickException(', '.join(f'{n} {problem}'
+                                       for problem, n in counts.items()))
+
+
+@cli.command()
+@option('--out', '-o', type=File('wt'), default=stdout,
+        help='Output file.  Omit to print to stdout')
+@option('--format', '-f', 'fmt', default='nt', show_default=True,
+        type=Choice(['nt', 'jsonld']), help='N-Triples or JSON-LD')
+@argument('jsonfile', type=File('r'))
+def rdf(jsonfile, out, fmt):
+    """Export a ForecastDataSet JSON file as RDF"""
+    from .jsonstream import iter_dataset
+    from .rdf import write_rdf
+    fields = ((name, (item for item, _ in value)
+               if hasattr(value, '__next__') else value)
+              for name, value in iter_dataset(jsonfile))
+    write_rdf(out, fields, fmt)
+
+
+@cli.command()
+@option('--out', '-o', type=File('wt'), default=stdout,
+        help='Output file.  Omit to print to stdout')
+@option('--cache-dir', envvar='LINKML_DATASET_CACHE', default=None,
+        type=Path(file_okay=False),
+        help='Directory for caching parsed models')
+@option('--cache-size', default=1024, type=int, show_default=True,
+        help='Maximum size of the cache directory in MB')
+@option('--format', '-f', 'fmt', default='text', show_default=True,
+        type=Choice(['text', 'dot', 'graphml', 'json']), help='Output format')
 @argument('jsonfile', type=File('r', encoding='utf-8'), required=True)
-def cgmes(jsonfile, out):
+def cgmes(jsonfile, out, cache_dir, cache_size, fmt):
     """Process CGMES JSON LD"""
-    cgmes = CGMES(jsonfile)
-    for e in cgmes.edges():
-        subj = e.subject.split('#')[-1]
-        pred = e.predicate.split('#')[-1]
-        obj = e.object.split('#')[-1]
-        echo(f'{subj} -> {obj}: "{pred}"')
+    from .formats import FORMATS
+    cgmes = _load_cgmes(jsonfile, cache_dir, cache_size)
+    FORMATS[fmt](cgmes.class_graph(), out)
+
+
+@cli.command()
+@option('--out', '-o', type=File('wt'), default=stdout,
+        help='Output file.  Omit to print to stdout')
+@option('--edges', '-e', default='bus-branch', show_default=True,
+        type=Choice(['connectivity', 'bus-branch', 'nodes']),
+        help='Edge list to write')
+@option('--normal-state', is_flag=True, default=False,
+        help='Use Switch.normalOpen instead of Switch.open')
+@option('--delimiter', '-d', default=',', help='Delimiter used in output')
+@option('--cache-dir', envvar='LINKML_DATASET_CACHE', default=None,
+        type=Path(file_okay=False),
+        help='Directory for caching parsed models')
+@option('--cache-size', default=1024, type=int, show_default=True,
+        help='Maximum size of the cache directory in MB')
+@argument('jsonfile', type=File('r', encoding='utf-8'), required=True)
+def topology(jsonfile, out, edges, normal_state, delimiter, cache_dir,
+             cache_size):
+    """Export CGMES topology as edge list"""
+    from .topology import Topology
+    topology = Topology(_load_cgmes(jsonfile, cache_dir, cache_size),
+                        normal_state)
+    topology.write_edges(out, edges, delimiter)
+
+
+@cli.command()
+@option('--out', '-o', type=File('wt'), default=stdout,
+        help='Output file.  Omit to print to stdout')
+@option('--region', '-r', required=True, help='Region of DSO')
+@option('--only-coord', is_flag=True, default=False,
+        help='Reduce location information')
+@option('--normal-state', is_flag=True, default=False,
+        help='Use Switch.normalOpen instead of Switch.open')
+@option('--cache-dir', envvar='LINKML_DATASET_CACHE', default=None,
+        type=Path(file_okay=False),
+        help='Directory for caching parsed models')
+@option('--cache-size', default=1024, type=int, show_default=True,
+        help='Maximum size of the cache directory in MB')
+@argument('jsonfile', type=File('r', encoding='utf-8'), required=True)
+def cgmes_forecast(jsonfile, out, region, only_coord, normal_state,
+                   cache_dir, cache_size):
+    """Build NBL Forecast from CGMES JSON LD"""
+    from .netbewust_laden import NetbewustLaden
+    from .cgmes_forecast import CGMESForecast
+    converter = CGMESForecast(_load_cgmes(jsonfile, cache_dir, cache_size),
+                              normal_state)
+    nbl = converter.convert(NetbewustLaden(region, only_coord))
+    echo(nbl, file=out)
+
+
+@cli.command()
+@option('--host', default='127.0.0.1', show_default=True,
+        help='Address to listen on')
+@option('--port', '-p', default=8080, type=int, show_default=True)
+@option('--workers', '-w', default=4, type=int, show_default=True,
+        help='Number of builds running concurrently')
+@option('--max-upload', default=1024, type=int, show_default=True,
+        help='Maximum size of a request body in MB')
+@option('--spill-dir', default=None, type=Path(file_okay=False),
+        help='Directory for uploaded files.  Defaults to the temp directory')
+@option('--cache-dir', envvar='LINKML_DATASET_CACHE', default=None,
+        type=Path(file_okay=False),
+        help='Directory for caching parsed models and CSV rows')
+@option('--cache-size', default=1024, type=int, show_default=True,
+        help='Maximum size of the cache directory in MB')
+def serve(host, port, workers, max_upload, spill_dir, cache_dir, cache_size):
+    """Serve builds over HTTP from a warm process"""
+    from .serve import serve
+    cache = row_cache = None
+    if cache_dir:
+        from .cgmes import GraphCache
+        from .readers import RowCache
+        cache = GraphCache(cache_dir, cache_size << 20)
+        row_cache = RowCache(cache_dir, cache_size << 20)
+    serve(host, port, workers=workers, cache=cache, spill_dir=spill_dir,
+          max_upload=max_upload << 20, row_cache=row_cache)
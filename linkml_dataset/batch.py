@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Build many ForecastDataSets from a single scan of the CSVs.
+
+`Batch` routes rows to a region by a region column in the CSV files or by
+a substation -> region mapping.  `Shards` splits the dataset of one region
+into shards of a fixed number of substations, each a ForecastDataSet with
+everything reachable from its substations, plus a manifest.  The datasets
+are either built in this process while scanning, or, with more than one
+job, collected per dataset and built in a pool of worker processes.
+"""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from csv import reader as csv_reader
+from json import dump
+from uuid import uuid4, uuid5, UUID
+import os
+import re
+
+from .cache import file_digest
+from .netbewust_laden import NetbewustLaden
+
+import logging
+log = logging.getLogger(__name__)
+
+# Index of the substation name in the argument tuples
+SUBSTATION = 0
+MANIFEST = 'manifest.json'
+
+
+def read_region_map(f, delimiter=','):
+    """Substation name -> region from a CSV file with a header row and
+    region, substation columns."""
+    rows = csv_reader(f, delimiter=delimiter)
+    next(rows, None)
+    return {substation: region for region, substation, *_ in rows}
+
+
+def region_filename(region):
+    """Output file name for `region`."""
+    return re.sub(r'[^\w.-]+', '_', region).strip('_') + '.json'
+
+
+class ShardBuilder(NetbewustLaden):
+    """NetbewustLaden for one shard of a dataset.
+
+    The regions, coordinate systems, market roles and market participants
+    are in every shard that refers to them.  Their mRIDs are derived from
+    the `namespace` of the dataset and their natural key, so they are the
+    same in every shard, also when shards are built by other processes.
+    """
+    SHARED = {'coordinate_systems': 'crs_urn',
+              'market_roles': 'type',
+              'market_participants': 'description'}
+
+    def __init__(self, region, only_coord, namespace, store=None):
+        super().__init__(region, only_coord, store)
+        self._namespace = UUID(namespace)
+        geo_region = self._fc.geographical_regions[0]
+        sub_geo_region = self._fc.sub_geographical_regions[0]
+        geo_region.m_rid = self._uuid('geographical_regions',
+                                      geo_region.description)
+        sub_geo_region.m_rid = self._uuid('sub_geographical_regions',
+                                          sub_geo_region.description)
+        geo_region.regions = [sub_geo_region.m_rid]
+
+    def _uuid(self, section, key):
+        return str(uuid5(self._namespace, f'{section}:{key}'))
+
+    def _add(self, section, entity):
+        name = self.SHARED.get(section)
+        if name is not None:
+            entity.m_rid = self._uuid(section, getattr(entity, name))
+        super()._add(section, entity)
+
+
+def _builder(cls, args, max_memory, spill_dir):
+    store = None
+    if max_memory is not None:
+        from .store import EntityStore
+        store = EntityStore(max_memory << 20, spill_dir)
+    return cls(*args, store=store)
+
+
+def _counts(nbl):
+    """Number of entities per section."""
+    store = nbl._store
+    return {name: (store.count(name) if store is not None and name in store
+                   else len(value))
+            for name, value in nbl._fc if isinstance(value, list)}
+
+
+def _write(nbl, path):
+    """Write the dataset, returns its entity counts and sha256 digest."""
+    with open(path, 'w') as out:
+        nbl.write(out)
+        out.write('\n')
+    counts = _counts(nbl)
+    if nbl._store is not None:
+        nbl._store.close()
+    return counts, file_digest(path)
+
+
+def build(cls, args, charge_points, assets, path, max_memory=None,
+          spill_dir=None):
+    """Build and write a ForecastDataSet with NetbewustLaden class `cls`
+    from the argument tuples of its charge points and assets.  Runs in a
+    worker process."""
+    nbl = _builder(cls, args, max_memory, spill_dir)
+    for row in charge_points:
+        try:
+            nbl.charge_points(*row)
+        except ValueError:
+            continue
+    for row in assets:
+        try:
+            nbl.assets(*row)
+        except ValueError:
+            continue
+    return _write(nbl, path)
+
+
+class Batch:
+    """Route CSV rows to per-region NetbewustLaden builders."""
+    builder = NetbewustLaden
+
+    def __init__(self, only_coord, region_column=None, region_map=None,
+                 jobs=1, max_memory=None, spill_dir=None):
+        if (region_column is None) == (region_map is None):
+            raise ValueError('Provide either a region column or a region map')
+        self._only_coord = only_coord
+        self._region_column = region_column
+        self._region_map = region_map
+        self._jobs = jobs
+        self._max_memory = max_memory
+        self._spill_dir = spill_dir
+        # key -> NetbewustLaden, or (charge points, assets) when the
+        # datasets are built by workers
+        self._targets = {}
+        self.unrouted = Counter()
+
+    @property
+    def column(self):
+        """Column of which the value is appended to the argument tuples of
+        the rows, None if they are routed by substation."""
+        return self._region_column
+
+    def key(self, args):
+        """Dataset of the argument tuple of a row, or None if it cannot be
+        routed."""
+        if self._region_column is not None:
+            return args[-1] or None
+        return self._region_map.get(args[SUBSTATION])
+
+    def args(self, key):
+        """Arguments of the builder of dataset `key`."""
+        return key, self._only_coord
+
+    def filename(self, key):
+        return region_filename(key)
+
+    def _target(self, args, kind):
+        key = self.key(args)
+        if key is None:
+            self.unrouted[kind] += 1
+            return None
+        target = self._targets.get(key)
+        if target is None:
+            if self._jobs > 1:
+                target = ([], [])
+            else:
+                log.info(f'Building "{key}"')
+                target = _builder(self.builder, self.args(key),
+                                  self._max_memory, self._spill_dir)
+            self._targets[key] = target
+        return target
+
+    def charge_points(self, args):
+        """Route the argument tuple of a charge point row, as read with
+        `read_rows(..., extra=self.column)`."""
+        target = self._target(args, 'charge points')
+        if target is None:
+            return
+        if self.column is not None:
+            args = args[:-1]
+        if self._jobs > 1:
+            target[0].append(args)
+        else:
+            target.charge_points(*args)
+
+    def assets(self, args):
+        """Route the argument tuple of an asset row."""
+        target = self._target(args, 'assets')
+        if target is None:
+            return
+        if self.column is not None:
+            args = args[:-1]
+        if self._jobs > 1:
+            target[1].append(args)
+        else:
+            target.assets(*args)
+
+    def write(self, out_dir):
+        """Write every dataset to `out_dir`.  Returns key -> (path, entity
+        counts, sha256 digest)."""
+        for kind, n in self.unrouted.items():
+            log.warning(f'Skipped {n} {kind} without region')
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {key: os.path.join(out_dir, self.filename(key))
+                 for key in self._targets}
+        if len(set(paths.values())) < len(paths):
+            raise ValueError('Names map to the same output file')
+        written = {}
+        if self._jobs <= 1:
+            for key, nbl in self._targets.items():
+                log.info(f'Writing "{key}" to {paths[key]}')
+                written[key] = (paths[key],) + _write(nbl, paths[key])
+            return written
+        with ProcessPoolExecutor(self._jobs) as pool:
+            futures = {key: pool.submit(build, self.builder, self.args(key),
+                                        charge_points, assets, paths[key],
+                                        self._max_memory, self._spill_dir)
+                       for key, (charge_points, assets)
+                       in self._targets.items()}
+            for key, future in futures.items():
+                written[key] = (paths[key],) + future.result()
+                log.info(f'Wrote "{key}" to {paths[key]}')
+        return written
+
+
+class Shards(Batch):
+    """Route CSV rows of one region to shards of `shard_size` substations,
+    in order of first appearance."""
+    builder = ShardBuilder
+    column = None
+
+    def __init__(self, region, only_coord, shard_size, jobs=1,
+                 max_memory=None, spill_dir=None):
+        super().__init__(only_coord, region_map={}, jobs=jobs,
+                         max_memory=max_memory, spill_dir=spill_dir)
+        self._region = region
+        self._shard_size = shard_size
+        self._namespace = str(uuid4())
+        # Substation name -> shard number
+        self._shards = {}
+
+    def key(self, args):
+        name = args[SUBSTATION]
+        shard = self._shards.get(name)
+        if shard is None:
+            shard = self._shards[name] = len(self._shards) // self._shard_size
+        return shard
+
+    def args(self, key):
+        return self._region, self._only_coord, self._namespace
+
+    def filename(self, key):
+        return f'shard-{key:05d}.json'
+
+    def write(self, out_dir):
+        """Write the shards and their manifest to `out_dir`."""
+        written = super().write(out_dir)
+        substations = {}
+        for name, shard in self._shards.items():
+            substations.setdefault(shard, []).append(name)
+        manifest = {'identifier': self._namespace,
+                    'region': self._region,
+                    'shard_by': 'substation',
+                    'shard_size': self._shard_size,
+                    'shards': [{'file': os.path.basename(path),
+                                'sha256': digest,
+                                'substations': substations[shard],
+                                'entities': counts}
+                               for shard, (path, counts, digest)
+                               in sorted(written.items())]}
+        path = os.path.join(out_dir, MANIFEST)
+        with open(path, 'w') as out:
+            dump(manifest, out, indent=2)
+            out.write('\n')
+        log.info(f'Wrote {len(written)} shards and {path}')
+        return written
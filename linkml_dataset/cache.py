@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from hashlib import sha256
+import os
+
+import logging
+log = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1 << 20
+# Suffixes of the entries of every cache, as the caches share a directory
+SUFFIXES = ('.cache', '.graph', '.rows')
+
+
+def file_digest(filename):
+    """SHA-256 of the contents of `filename`."""
+    digest = sha256()
+    with open(filename, 'rb') as f:
+        while block := f.read(BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileCache:
+    """Directory of cache entries keyed by content hash and format version.
+
+    Entries are evicted least recently used first once the total size of the
+    entries of all caches in the directory exceeds `max_size` bytes.  Using
+    an entry updates its mtime.
+    """
+    suffix = '.cache'
+
+    def __init__(self, directory, max_size, version):
+        self.directory = directory
+        self.max_size = max_size
+        self.version = version
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, filename, key=None):
+        """Path of the cache entry for `filename`, None if not a file.
+        Entries of the same file are told apart by an optional `key`."""
+        if not os.path.isfile(filename):
+            return None
+        text = f'{file_digest(filename)}:{self.version}'
+        if key is not None:
+            text += f':{key}'
+        key = sha256(text.encode())
+        return os.path.join(self.directory, key.hexdigest() + self.suffix)
+
+    def touch(self, path):
+        os.utime(path)
+
+    def commit(self, tmp_path, path):
+        """Atomically move a written entry into place and evict."""
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(SUFFIXES):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            log.debug(f'Evicting cache entry "{path}"')
+            os.remove(path)
+            total -= size
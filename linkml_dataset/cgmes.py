@@ -3,40 +3,304 @@
 from datetime import date
 from uuid import uuid4
 from json import dumps, load
-from collections import namedtuple
+from collections import namedtuple, Counter
+from array import array
+from bisect import bisect_right
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from threading import get_ident
 from pprint import pprint
-from rdflib import Graph, RDF
+import os
+from rdflib import Graph, RDF, URIRef, BNode, Literal
+from rdflib import __version__ as rdflib_version
+
+from .cache import FileCache
+from .query import Query
 
 import logging
 log = logging.getLogger(__name__)
 
+Triple = namedtuple('Triple', ['subject', 'predicate', 'object'])
+ClassGraph = namedtuple('ClassGraph', ['edges', 'classes'])
+
 
 class CGMES:
-    def __init__(self, jsonfile):
-        self.G = Graph()
-        self.G.parse(file=jsonfile, format='json-ld')
+    def __init__(self, jsonfile, cache=None):
+        self._graph = None
+        path = cache.path(jsonfile.name) if cache else None
+        triples = cache.load(path) if path else None
+        if triples is None:
+            self._graph = Graph()
+            self._graph.parse(file=jsonfile, format='json-ld')
+            triples = self._encode(self._graph)
+            if path:
+                cache.store(path, *triples)
+        self.terms, self.subjects, self.predicates, self.objects = triples
+        self._type_index = None
+        self._predicate_index = None
+        self._class_index = {}
+        self._adjacency_index = {}
+
+    @property
+    def G(self):
+        """rdflib Graph of the model, rebuilt when loaded from cache."""
+        if self._graph is None:
+            log.info('Rebuilding rdflib Graph from cached triples')
+            self._graph = Graph()
+            terms = self.terms
+            for s, p, o in self.triples():
+                self._graph.add((terms[s], terms[p], terms[o]))
+        return self._graph
+
+    def triples(self):
+        """Iterate over the integer-encoded (subject, predicate, object)."""
+        return zip(self.subjects, self.predicates, self.objects)
+
+    def local(self, term_id):
+        """Local name of a term, i.e. the part after the '#'."""
+        return str(self.terms[term_id]).split('#')[-1]
+
+    def pairs(self, name):
+        """Iterate over (subject, object) ids of predicates named `name`."""
+        for pred, (subjects, objects) in self._predicates().items():
+            if self.local(pred) == name:
+                yield from zip(subjects, objects)
+
+    def values(self, name):
+        """Map subject ids to the (first) string value of predicate `name`."""
+        values = {}
+        terms = self.terms
+        for subj, obj in self.pairs(name):
+            if subj not in values:
+                values[subj] = str(terms[obj])
+        return values
+
+    def instances(self, name):
+        """Ids of the resources whose rdf:type is named `name`."""
+        if not self._class_index:
+            for subj, t in self._types().items():
+                self._class_index.setdefault(self.local(t), set()).add(subj)
+        return self._class_index.get(name, set())
+
+    def adjacency(self, name, inverse=False):
+        """Hash index from subject (object if `inverse`) ids to the object
+        (subject) ids of predicate `name`."""
+        key = (name, inverse)
+        index = self._adjacency_index.get(key)
+        if index is None:
+            index = self._adjacency_index[key] = {}
+            for subj, obj in self.pairs(name):
+                if inverse:
+                    subj, obj = obj, subj
+                index.setdefault(subj, []).append(obj)
+        return index
+
+    def query(self, *chain, where=None):
+        """Typed path query, e.g. ('PowerTransformer',
+        'Equipment.EquipmentContainer', 'Substation').  See Query."""
+        return Query(self, *chain, where=where)
 
     def edges(self):
-        Triple = namedtuple('Triple', ['subject', 'predicate', 'object'])
-        edges = set()
-        typed_resources = set(s for s, p, o in self.G if p == RDF.type)
-        for subj, pred, obj in self.G:
-            if not subj in typed_resources or obj not in typed_resources:
+        return set(self.class_graph().edges)
+
+    def class_graph(self):
+        """Class-level edges and classes with their instance counts.
+
+        Returns a ClassGraph with a Counter of (subject class, predicate,
+        object class) Triples and a Counter of instances per class, both
+        computed in a single pass over the triples.
+        """
+        edges = Counter()
+        types = self._types()
+        filtered = set(t for t in set(types.values()) if self._is_filtered(t))
+        for subj, pred, obj in self.triples():
+            subj_type = types.get(subj)
+            obj_type = types.get(obj)
+            if subj_type is None or obj_type is None:
                 continue
-            if self._is_filtered(subj) or self._is_filtered(obj):
+            if subj_type in filtered or obj_type in filtered:
                 continue
-            subj = str(self._get_rdf_type(subj))
-            obj = str(self._get_rdf_type(obj))
-            pred = str(self._get_rdf_type(pred))
-            edges.add(Triple(subj, pred, obj))
-        return edges
-
-    def _get_rdf_type(self, resource):
-        rdf_type = next(self.G.objects(resource, RDF.type), None)
-        return rdf_type if rdf_type else resource
-
-    def _is_filtered(self, resource):
-        resource_type = self._get_rdf_type(resource)
+            edges[subj_type, types.get(pred, pred), obj_type] += 1
+        terms = self.terms
+        return ClassGraph(
+            Counter({Triple(str(terms[s]), str(terms[p]), str(terms[o])): n
+                     for (s, p, o), n in edges.items()}),
+            Counter({str(terms[t]): n
+                     for t, n in Counter(types.values()).items()
+                     if t not in filtered}))
+
+    def _encode(self, graph):
+        """Integer-encode the triples of `graph` against a term table."""
+        ids = {}
+        subjects, predicates, objects = array('I'), array('I'), array('I')
+        for triple in graph:
+            for term, column in zip(triple, (subjects, predicates, objects)):
+                column.append(ids.setdefault(term, len(ids)))
+        return TermTable.from_terms(list(ids)), subjects, predicates, objects
+
+    def _predicates(self):
+        """Map each predicate id to its subject and object id columns."""
+        if self._predicate_index is not None:
+            return self._predicate_index
+        index = self._predicate_index = {}
+        for subj, pred, obj in self.triples():
+            columns = index.get(pred)
+            if columns is None:
+                columns = index[pred] = (array('I'), array('I'))
+            columns[0].append(subj)
+            columns[1].append(obj)
+        return index
+
+    def _types(self):
+        """Map each typed resource to its (first) rdf:type."""
+        if self._type_index is not None:
+            return self._type_index
+        types = self._type_index = {}
+        rdf_type = self.terms.index(RDF.type)
+        if rdf_type not in self._predicates():
+            return types
+        for subj, obj in zip(*self._predicates()[rdf_type]):
+            if subj not in types:
+                types[subj] = obj
+        return types
+
+    def _is_filtered(self, resource_type):
         filter_types = {'Terminal', 'ConnectivityNode', 'IdentifiedObject',
                         'Name', 'NameType'}
-        return resource_type and str(resource_type).split('#')[-1] in filter_types
+        return str(self.terms[resource_type]).split('#')[-1] in filter_types
+
+
+class TermTable:
+    """Sequence of RDF terms stored as one UTF-8 blob plus offsets.
+
+    Each term is encoded as a kind character (U, B or L) followed by its
+    text; literals carry their datatype and language before the value.
+    Terms are only decoded when accessed.
+    """
+    SEP = '\x1f'
+
+    def __init__(self, offsets, blob, base=0):
+        self._offsets = offsets
+        self._blob = blob
+        self._base = base
+        self._terms = [None] * (len(offsets) - 1)
+        self._index = None
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __getitem__(self, i):
+        term = self._terms[i]
+        if term is None:
+            term = self._terms[i] = self.decode(self.text(i))
+        return term
+
+    def text(self, i):
+        base = self._base
+        return str(self._blob[base + self._offsets[i]:
+                              base + self._offsets[i + 1]], 'utf-8')
+
+    def index(self, term):
+        """Id of `term`, None if it is not in the table."""
+        if self._index is not None:
+            return self._index.get(term)
+        needle = self.encode(term).encode('utf-8')
+        base, end = self._base, self._base + self._offsets[-1]
+        pos = self._blob.find(needle, base, end)
+        while pos != -1:
+            start = pos - base
+            i = bisect_right(self._offsets, start) - 1
+            if (self._offsets[i] == start and
+                    self._offsets[i + 1] == start + len(needle)):
+                return i
+            pos = self._blob.find(needle, pos + 1, end)
+        return None
+
+    @classmethod
+    def from_terms(cls, terms):
+        offsets = array('Q', [0])
+        chunks = []
+        size = 0
+        for term in terms:
+            chunk = cls.encode(term).encode('utf-8')
+            chunks.append(chunk)
+            size += len(chunk)
+            offsets.append(size)
+        table = cls(offsets, b''.join(chunks))
+        table._terms = list(terms)
+        table._index = {term: i for i, term in enumerate(terms)}
+        return table
+
+    @classmethod
+    def encode(cls, term):
+        if isinstance(term, Literal):
+            return (f'L{term.datatype or ""}{cls.SEP}{term.language or ""}'
+                    f'{cls.SEP}{term}')
+        if isinstance(term, BNode):
+            return f'B{term}'
+        return f'U{term}'
+
+    @classmethod
+    def decode(cls, text):
+        kind, text = text[0], text[1:]
+        if kind == 'L':
+            datatype, lang, value = text.split(cls.SEP, 2)
+            return Literal(value, lang=lang or None,
+                           datatype=URIRef(datatype) if datatype else None)
+        if kind == 'B':
+            return BNode(text)
+        return URIRef(text)
+
+
+class GraphCache(FileCache):
+    """Cache of parsed graphs as integer-encoded triples and a term table.
+
+    Layout: header, term offsets (uint64), subject, predicate and object
+    columns (uint32) and the term blob.  Loading memory-maps the file, so
+    nothing is decoded until it is used.
+    """
+    suffix = '.graph'
+    FORMAT_VERSION = 1
+    HEADER = Struct('<4sIQQQ')
+    MAGIC = b'LDGC'
+
+    def __init__(self, directory, max_size):
+        super().__init__(directory, max_size,
+                         f'{self.FORMAT_VERSION}:rdflib-{rdflib_version}')
+
+    def load(self, path):
+        """Returns (terms, subjects, predicates, objects) or None."""
+        if path is None or not os.path.exists(path):
+            return None
+        log.info(f'Loading cached graph "{path}"')
+        with open(path, 'rb') as f:
+            mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        magic, version, n_terms, n_triples, _ = self.HEADER.unpack_from(mm)
+        if magic != self.MAGIC or version != self.FORMAT_VERSION:
+            return None
+        self.touch(path)
+        view = memoryview(mm)
+        pos = self.HEADER.size
+        offsets = view[pos:pos + 8 * (n_terms + 1)].cast('Q')
+        pos += 8 * (n_terms + 1)
+        columns = []
+        for _ in range(3):
+            columns.append(view[pos:pos + 4 * n_triples].cast('I'))
+            pos += 4 * n_triples
+        terms = TermTable(offsets, mm, pos)
+        return (terms, *columns)
+
+    def store(self, path, terms, subjects, predicates, objects):
+        if path is None:
+            return
+        log.info(f'Storing parsed graph in cache "{path}"')
+        tmp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION,
+                                     len(terms), len(subjects),
+                                     terms._offsets[-1]))
+            f.write(terms._offsets)
+            for column in (subjects, predicates, objects):
+                f.write(column)
+            f.write(terms._blob)
+        self.commit(tmp_path, path)
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+from uuid import uuid5, NAMESPACE_URL
+from collections import defaultdict
+
+from .models import dp_netbewust_laden as nbl
+from .topology import Topology
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def _group(pairs):
+    groups = defaultdict(list)
+    for key, value in pairs:
+        groups[key].append(value)
+    return groups
+
+
+class CGMESForecast:
+    """Populate a NetbewustLaden ForecastDataSet from a CGMES model.
+
+    All lookups go through indexes built once from the CGMES predicate
+    index, so the conversion is linear in the size of the model.  Source
+    mRIDs are preserved; topological nodes derived from switch states get a
+    name-based UUID of their first connectivity node.
+    """
+    def __init__(self, cgmes, normal_state=False):
+        self.cgmes = cgmes
+        self._normal_state = normal_state
+        c = cgmes
+        self._mrid = c.values('IdentifiedObject.mRID')
+        self._name = c.values('IdentifiedObject.name')
+        self._description = c.values('IdentifiedObject.description')
+        # Containment
+        self._container = dict(c.pairs('Equipment.EquipmentContainer'))
+        self._parent = dict(c.pairs('VoltageLevel.Substation'))
+        self._parent.update(c.pairs('Bay.VoltageLevel'))
+        self._sub_region = dict(c.pairs('SubGeographicalRegion.Region'))
+        self._substation_region = dict(c.pairs('Substation.Region'))
+        # PowerTransformer -> PowerTransformerEnd -> Terminal
+        self._ends = _group((pt, pte) for pte, pt in
+                            c.pairs('PowerTransformerEnd.PowerTransformer'))
+        self._end_terminal = dict(c.pairs('TransformerEnd.Terminal'))
+        self._end_number = c.values('TransformerEnd.endNumber')
+        # Terminal -> OperationalLimitSet -> OperationalLimit
+        self._limit_sets = _group((t, ols) for ols, t in
+                                  c.pairs('OperationalLimitSet.Terminal'))
+        self._limits = _group((ols, limit) for limit, ols in
+                              c.pairs('OperationalLimit.OperationalLimitSet'))
+        self._limit_type = dict(c.pairs('OperationalLimit.OperationalLimitType'))
+        self._limit_value = c.values('ActivePowerLimit.value')
+        # Terminal -> Analog -> AnalogValue
+        self._measurements = _group((t, m) for m, t in
+                                    c.pairs('Measurement.Terminal'))
+        self._measurement_type = c.values('Measurement.measurementType')
+        self._unit_multiplier = c.values('Measurement.unitMultiplier')
+        self._unit_symbol = c.values('Measurement.unitSymbol')
+        self._analog_values = _group((a, av) for av, a in
+                                     c.pairs('AnalogValue.Analog'))
+        self._value = c.values('AnalogValue.value')
+        self._time_stamp = c.values('MeasurementValue.timeStamp')
+        # PowerSystemResource -> Location -> PositionPoint
+        self._locations = dict((psr, loc) for loc, psr in
+                               c.pairs('Location.PowerSystemResources'))
+        self._position_points = _group((loc, pp) for pp, loc in
+                                       c.pairs('PositionPoint.Location'))
+        self._location_crs = dict(c.pairs('Location.CoordinateSystem'))
+        self._crs_urn = c.values('CoordinateSystem.crsUrn')
+        self._x = c.values('PositionPoint.xPosition')
+        self._y = c.values('PositionPoint.yPosition')
+        self._z = c.values('PositionPoint.zPosition')
+        self._sequence = c.values('PositionPoint.sequenceNumber')
+        # Terminal -> TopologicalNode, from the TP profile when present
+        self._terminal_tn = dict(c.pairs('Terminal.TopologicalNode'))
+        self._tn_cns = _group((tn, cn) for cn, tn in
+                              c.pairs('ConnectivityNode.TopologicalNode'))
+        self._tn_mrid = {}
+        if not self._terminal_tn:
+            self._derive_topological_nodes()
+
+    def convert(self, builder):
+        """Add the CGMES entities to a NetbewustLaden `builder`."""
+        self._builder = builder
+        self._fc = builder._fc
+        self._coordinate_systems = {}
+        self._topological_nodes = {}
+        self._sub_regions = self._regions()
+        substations = {}
+        for s in sorted(self.cgmes.instances('Substation')):
+            substations[s] = self._substation(s)
+        for pt in sorted(self.cgmes.instances('PowerTransformer')):
+            substation = substations.get(self._substation_of(pt))
+            if substation is None:
+                log.debug(f'PowerTransformer "{self._mrid_of(pt)}" is not '
+                          'in a Substation')
+                continue
+            self._power_transformer(substation, pt)
+            if builder._store is not None:
+                builder._store.check()
+        log.info(f'Converted {len(substations)} substations and '
+                 f'{len(self._fc.power_transformers)} power transformers')
+        return builder
+
+    def _mrid_of(self, resource):
+        mrid = self._mrid.get(resource)
+        if mrid is None:
+            mrid = str(self.cgmes.terms[resource]).split('#')[-1]
+            mrid = mrid.removeprefix('urn:uuid:').removeprefix('_')
+            self._mrid[resource] = mrid
+        return mrid
+
+    def _name_of(self, resource):
+        return self._name.get(resource, self._description.get(resource))
+
+    def _derive_topological_nodes(self):
+        """Collapse connectivity nodes over closed switches."""
+        topology = Topology(self.cgmes, self._normal_state)
+        first_cn = {}
+        for cn, label in zip(topology.cns, topology.topological_nodes):
+            tn = first_cn.setdefault(label, cn)
+            self._tn_cns[tn].append(cn)
+        for terminal, cn in zip(topology.terminals, topology.terminal_cn):
+            tn = first_cn[topology.topological_nodes[cn]]
+            self._terminal_tn[terminal] = tn
+        for tn in first_cn.values():
+            self._tn_mrid[tn] = str(uuid5(NAMESPACE_URL,
+                                          str(self.cgmes.terms[tn])))
+
+    def _regions(self):
+        """Use the CGMES (Sub)GeographicalRegions when there are any."""
+        if not self._sub_region:
+            return {}
+        self._fc.geographical_regions.clear()
+        self._fc.sub_geographical_regions.clear()
+        sub_regions = {}
+        regions = defaultdict(list)
+        for sub_region, region in sorted(self._sub_region.items()):
+            sgr = nbl.SubGeographicalRegion(m_rid=self._mrid_of(sub_region),
+                                            description=self._name_of(sub_region),
+                                            substations=[], lines=[])
+            regions[region].append(sgr.m_rid)
+            self._fc.sub_geographical_regions.append(sgr)
+            sub_regions[sub_region] = sgr
+        for region, members in regions.items():
+            geo_region = nbl.GeographicalRegion(m_rid=self._mrid_of(region),
+                                                description=self._name_of(region),
+                                                regions=members)
+            self._fc.geographical_regions.append(geo_region)
+        return sub_regions
+
+    def _substation(self, s):
+        """cim:Substation"""
+        sub_geo_region = self._sub_regions.get(
+            self._substation_region.get(s),
+            self._fc.sub_geographical_regions[0])
+        substation = nbl.Substation(m_rid=self._mrid_of(s),
+                                    description=self._name_of(s),
+                                    equipments=[], location=self._location(s))
+        sub_geo_region.substations.append(substation.m_rid)
+        self._builder._add('substations', substation)
+        if substation.description is not None:
+            self._builder._substations[substation.description] = substation
+        return substation
+
+    def _substation_of(self, equipment):
+        c = self._container.get(equipment)
+        while c in self._parent:
+            c = self._parent[c]
+        return c
+
+    def _coordinate_system(self, crs):
+        """cim:CoordinateSystem"""
+        coordinate_system = self._coordinate_systems.get(crs)
+        if coordinate_system is None:
+            urn = self._crs_urn.get(crs, '')
+            coordinate_system = nbl.CoordinateSystem(
+                m_rid=self._mrid_of(crs),
+                description=self._name_of(crs) or urn, crs_urn=urn)
+            self._builder._add('coordinate_systems', coordinate_system)
+            self._coordinate_systems[crs] = coordinate_system
+        return coordinate_system
+
+    def _location(self, psr):
+        """cim:Location"""
+        loc = self._locations.get(psr)
+        if loc is None:
+            return None
+        crs = self._location_crs.get(loc)
+        points = sorted((pp for pp in self._position_points.get(loc, [])
+                         if pp in self._x and pp in self._y),
+                        key=lambda pp: int(self._sequence.get(pp, 0)))
+        position_points = [nbl.PositionPoint(x_position=self._x[pp],
+                                             y_position=self._y[pp],
+                                             z_position=self._z.get(pp),
+                                             sequence_number=self._sequence.get(pp))
+                           for pp in points]
+        return nbl.Location(m_rid=self._mrid_of(loc),
+                            coordinate_system=(self._coordinate_system(crs).m_rid
+                                               if crs is not None else None),
+                            position_points=position_points)
+
+    def _topological_node(self, tn):
+        """cim:TopologicalNode"""
+        topological_node = self._topological_nodes.get(tn)
+        if topological_node is None:
+            cns = self._tn_cns.get(tn)
+            topological_node = nbl.TopologicalNode(
+                m_rid=self._tn_mrid.get(tn) or self._mrid_of(tn),
+                description=self._name_of(tn), terminal=[],
+                connectivity_nodes=([self._mrid_of(cn) for cn in cns]
+                                    if cns else None))
+            self._builder._add('topological_nodes', topological_node)
+            self._topological_nodes[tn] = topological_node
+        return topological_node
+
+    def _power_transformer(self, substation, pt):
+        """cim:PowerTransformer"""
+        power_transformer = nbl.PowerTransformer(
+            m_rid=self._mrid_of(pt), description=self._name_of(pt),
+            power_transformer_end=[], location=self._location(pt))
+        substation.equipments.append(power_transformer.m_rid)
+        self._builder._add('power_transformers', power_transformer)
+        ends = sorted(self._ends.get(pt, []),
+                      key=lambda pte: int(self._end_number.get(pte, 0)))
+        topological_node = None
+        for pte in ends:
+            t = self._end_terminal.get(pte)
+            if t is None:
+                continue
+            end = nbl.PowerTransformerEnd(m_rid=self._mrid_of(pte),
+                                          description=self._name_of(pte),
+                                          terminal=self._mrid_of(t))
+            power_transformer.power_transformer_end.append(end)
+            self._terminal(t)
+            if t in self._terminal_tn:
+                topological_node = self._topological_node(self._terminal_tn[t])
+        # Index by name so charge points can be added to the transformer
+        name = power_transformer.description
+        if name is not None and topological_node is not None:
+            self._builder._power_transformers[name] = power_transformer
+            self._builder._topological_nodes[name] = topological_node
+        return power_transformer
+
+    def _terminal(self, t):
+        """cim:Terminal"""
+        terminal = nbl.Terminal(m_rid=self._mrid_of(t),
+                                description=self._name_of(t))
+        tn = self._terminal_tn.get(t)
+        if tn is not None:
+            topological_node = self._topological_node(tn)
+            topological_node.terminal.append(terminal.m_rid)
+            terminal.topological_node = topological_node.m_rid
+        limit_sets = [self._operational_limit_set(ols)
+                      for ols in self._limit_sets.get(t, [])]
+        if limit_sets:
+            terminal.operational_limit_set = [ols.m_rid for ols in limit_sets]
+        analogs = [self._analog(m) for m in self._measurements.get(t, [])
+                   if m in self._unit_multiplier and m in self._unit_symbol]
+        if analogs:
+            terminal.measurements = [analog.m_rid for analog in analogs]
+        self._builder._add('terminals', terminal)
+        return terminal
+
+    def _operational_limit_set(self, ols):
+        """cim:OperationalLimitSet"""
+        operational_limit_set = nbl.OperationalLimitSet(
+            m_rid=self._mrid_of(ols), description=self._name_of(ols),
+            operational_limit_value=[])
+        for limit in self._limits.get(ols, []):
+            if limit not in self._limit_value:
+                continue
+            apl = self._active_power_limit(limit)
+            operational_limit_set.operational_limit_value.append(apl.m_rid)
+        self._builder._add('operational_limit_sets', operational_limit_set)
+        return operational_limit_set
+
+    def _active_power_limit(self, limit):
+        """cim:ActivePowerLimit, CGMES ActivePower is in MW"""
+        ap = nbl.ActivePower(multiplier='M', unit='W',
+                             value=float(self._limit_value[limit]))
+        olt = self._limit_type.get(limit)
+        if olt is not None:
+            olt = nbl.OperationalLimitType(m_rid=self._mrid_of(olt),
+                                           description=self._name_of(olt))
+        else:
+            olt = nbl.OperationalLimitType(
+                m_rid=str(uuid5(NAMESPACE_URL,
+                                f'{self.cgmes.terms[limit]}#type')),
+                description=self._name_of(limit))
+        apl = nbl.ActivePowerLimit(m_rid=self._mrid_of(limit),
+                                   description=self._name_of(limit),
+                                   value=ap, operational_limit_type=olt)
+        self._builder._add('active_power_limits', apl)
+        return apl
+
+    def _analog(self, m):
+        """cim:Analog"""
+        analog_values = [nbl.AnalogValue(m_rid=self._mrid_of(av),
+                                         value=float(self._value[av]),
+                                         time_stamp=self._time_stamp[av])
+                         for av in self._analog_values.get(m, [])
+                         if av in self._value and av in self._time_stamp]
+        analog = nbl.Analog(m_rid=self._mrid_of(m),
+                            description=self._name_of(m),
+                            measurement_type=self._measurement_type.get(m),
+                            positive_flow_in=True,
+                            unit_multiplier=self._unit_multiplier[m].split('.')[-1],
+                            unit_symbol=self._unit_symbol[m].split('.')[-1],
+                            analog_values=analog_values)
+        self._builder._add('analogs', analog)
+        return analog
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Generate specialized JSON serializers for the LinkML pydantic models.
+
+For every model class a `dump_<Class>(obj, level)` function is emitted that
+writes the fields in pydantic's order, skips optional fields that are None
+and formats enums, floats and datetimes the way
+`json.dumps(obj.model_dump(exclude_none=True), indent=2, default=str)`
+does, so the output is byte-identical without the generic model walk.
+
+Before that, the models module written by LinkML's gen-pydantic is post-
+processed so its schemas are built on first use: `defer_build = True` is
+added to the ConfiguredBaseModel config and the `model_rebuild()` calls
+at the end of the module, which build every schema at import time, are
+removed.  Run this after every gen-pydantic run:
+
+    gen-pydantic schema.yaml > linkml_dataset/models/dp_netbewust_laden.py
+    python -m linkml_dataset.codegen [-m MODULE] [-o OUTPUT]
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, date
+from enum import Enum
+from importlib import import_module
+from importlib.util import find_spec
+from typing import Union, get_args, get_origin
+import os
+import re
+import types
+
+from pydantic import BaseModel, RootModel
+
+import logging
+log = logging.getLogger(__name__)
+
+MODULE = 'linkml_dataset.models.dp_netbewust_laden'
+
+CONFIG = re.compile(r'(class ConfiguredBaseModel\(BaseModel\):\n'
+                    r'    model_config = ConfigDict\(\n(?:        .*\n)*?)'
+                    r'(    \))')
+REBUILD = re.compile(r'# see https://pydantic-docs\S*\n'
+                     r'(?:\w+\.model_rebuild\(\)\n)+\n?')
+DEFERRED = ('# Schemas are built on first use (defer_build in '
+            'ConfiguredBaseModel) instead\n'
+            '# of calling model_rebuild() on every class at import time.\n')
+
+HEADER = '''# -*- coding: utf-8 -*-
+# Generated by linkml_dataset.codegen from {source}, do not edit.
+"""JSON serializers for {source}.
+
+`dump_<Class>(obj, level)` returns the JSON text of `obj` as nested at
+`level` in a document indented by two spaces; `dumps(obj)` returns the
+document itself.  Equal to `json.dumps(obj.model_dump(exclude_none=True),
+indent=2, default=str)`.
+"""
+
+from json.encoder import encode_basestring_ascii as _str
+
+
+class _Indents(dict):
+    def __missing__(self, level):
+        indent = self[level] = '\\n' + '  ' * level
+        return indent
+
+
+INDENTS = _Indents()
+
+
+def _float(v):
+    if v != v:
+        return 'NaN'
+    if v == float('inf'):
+        return 'Infinity'
+    if v == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(v)
+
+
+def _bool(v):
+    return 'true' if v else 'false'
+
+
+def _datetime(v):
+    return _str(str(v))
+
+
+def _list(values, level, dump):
+    if not values:
+        return '[]'
+    indent = INDENTS[level + 1]
+    return ('[' + indent +
+            (',' + indent).join([dump(v, level + 1) for v in values]) +
+            INDENTS[level] + ']')
+
+
+def _scalar_list(values, level, dump):
+    if not values:
+        return '[]'
+    indent = INDENTS[level + 1]
+    return ('[' + indent + (',' + indent).join([dump(v) for v in values]) +
+            INDENTS[level] + ']')
+
+
+def _object(items, level):
+    if not items:
+        return '{{}}'
+    indent = INDENTS[level + 1]
+    return '{{' + indent + (',' + indent).join(items) + INDENTS[level] + '}}'
+'''
+
+
+def _unwrap_optional(annotation):
+    """(annotation without Optional, is optional)"""
+    origin = get_origin(annotation)
+    if origin in (Union, getattr(types, 'UnionType', Union)):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return annotation, False
+
+
+def _scalar(annotation):
+    """Name of the formatter for a scalar annotation."""
+    if isinstance(annotation, type):
+        if issubclass(annotation, bool):
+            return '_bool'
+        if issubclass(annotation, Enum) or issubclass(annotation, str):
+            return '_str'
+        if issubclass(annotation, int):
+            return 'int.__repr__'
+        if issubclass(annotation, float):
+            return '_float'
+        if issubclass(annotation, (datetime, date)):
+            return '_datetime'
+    raise ValueError(f'Unsupported annotation {annotation!r}')
+
+
+def _expression(annotation, value):
+    """Python expression that serializes `value` of type `annotation`."""
+    if get_origin(annotation) in (list, tuple, set):
+        item, = get_args(annotation)
+        item, _ = _unwrap_optional(item)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return f'_list({value}, level + 1, dump_{item.__name__})'
+        return f'_scalar_list({value}, level + 1, {_scalar(item)})'
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return f'dump_{annotation.__name__}({value}, level + 1)'
+    return f'{_scalar(annotation)}({value})'
+
+
+def generate_class(cls):
+    lines = [f'def dump_{cls.__name__}(o, level=0):',
+             f'    """{cls.__name__}"""',
+             '    items = []']
+    for name, field in cls.model_fields.items():
+        annotation, optional = _unwrap_optional(field.annotation)
+        key = f'\'"{name}": \''
+        if optional:
+            lines += [f'    v = o.{name}',
+                      '    if v is not None:',
+                      f'        items.append({key} + {_expression(annotation, "v")})']
+        else:
+            lines.append(f'    items.append({key} + '
+                         f'{_expression(annotation, "o." + name)})')
+    lines.append('    return _object(items, level)')
+    return '\n'.join(lines)
+
+
+def defer_build(source):
+    """`source` of a gen-pydantic models module with its schemas built on
+    first use instead of at import.  Unchanged if already processed."""
+    if 'defer_build = True' not in source:
+        source, n = CONFIG.subn(r'\1        defer_build = True,\n\2',
+                                source, count=1)
+        if not n:
+            raise ValueError('No ConfiguredBaseModel config found')
+    return REBUILD.sub(DEFERRED, source, count=1)
+
+
+def generate(module):
+    classes = [c for c in vars(module).values()
+               if isinstance(c, type) and issubclass(c, BaseModel) and
+               not issubclass(c, RootModel) and
+               c.__module__ == module.__name__ and c.model_fields]
+    for cls in classes:
+        cls.model_rebuild()
+    source = module.__name__.rsplit('.', 1)[-1] + '.py'
+    chunks = [HEADER.format(source=source)]
+    chunks += [generate_class(cls) for cls in classes]
+    dumpers = ',\n'.join(f"           '{c.__name__}': dump_{c.__name__}"
+                         for c in classes)
+    chunks.append('DUMPERS = {' + dumpers.lstrip() + '}')
+    chunks.append('def dumps(o):\n'
+                  '    """JSON document of model instance `o`."""\n'
+                  '    return DUMPERS[type(o).__name__](o, 0)')
+    return '\n\n\n'.join(chunks) + '\n'
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-m', '--module', default=MODULE,
+                        help='Module with the pydantic models')
+    parser.add_argument('-o', '--out', default=None,
+                        help='Output file, defaults to <module>_json.py')
+    args = parser.parse_args()
+    spec = find_spec(args.module)
+    with open(spec.origin, newline='') as f:
+        source = f.read()
+    processed = defer_build(source)
+    if processed != source:
+        log.info(f'Deferring the schema builds of {spec.origin}')
+        with open(spec.origin, 'w', newline='') as f:
+            f.write(processed)
+    module = import_module(args.module)
+    out = args.out or os.path.splitext(module.__file__)[0] + '_json.py'
+    with open(out, 'w') as f:
+        f.write(generate(module))
+
+
+if __name__ == '__main__':
+    main()
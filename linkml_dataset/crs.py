@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Reprojection of PositionPoints between RD New and WGS84.
+
+Uses the polynomial approximation of Schreutelkamp and Strang van Hees
+between RD New (EPSG:28992) and WGS84 (EPSG:4326), accurate to about a
+metre within the Netherlands.  Points are transformed in blocks of
+`array('d')` columns.  For WGS84 the x position is the longitude and the
+y position the latitude, both in degrees.
+"""
+
+from array import array
+from collections import Counter
+import re
+
+from .readers import POSITION
+
+import logging
+log = logging.getLogger(__name__)
+
+RD = 28992
+WGS84 = 4326
+URN = 'urn:ogc:def:crs:EPSG::{}'
+# Decimals written per CRS, about a millimetre and a centimetre
+DECIMALS = {RD: 3, WGS84: 7}
+BLOCK_ROWS = 1 << 14
+
+EPSG = re.compile(r'^(?:urn:ogc:def:crs:EPSG:[\d.]*:|EPSG:)?(\d+)$',
+                  re.IGNORECASE)
+
+# RD origin in Amersfoort
+X0, Y0 = 155000.0, 463000.0
+LAT0, LON0 = 52.15517440, 5.38720621
+
+
+def epsg(crs):
+    """EPSG code of a CRS URN, `EPSG:<code>` or code, None if unknown."""
+    match = EPSG.match(crs.strip())
+    return int(match.group(1)) if match else None
+
+
+def rd_to_wgs84(x, y):
+    """Longitudes and latitudes of RD coordinates, as arrays."""
+    lon, lat = array('d'), array('d')
+    for X, Y in zip(x, y):
+        p = (X - X0) * 1e-5
+        q = (Y - Y0) * 1e-5
+        p2, q2 = p * p, q * q
+        lat.append(LAT0 + (
+            3235.65389 * q - 32.58297 * p2 - 0.24750 * q2 -
+            0.84978 * p2 * q - 0.06550 * q2 * q - 0.01709 * p2 * q2 -
+            0.00738 * p + 0.00530 * p2 * p2 - 0.00039 * p2 * q2 * q +
+            0.00033 * p2 * p2 * q - 0.00012 * p * q) / 3600)
+        lon.append(LON0 + (
+            5260.52916 * p + 105.94684 * p * q + 2.45656 * p * q2 -
+            0.81885 * p2 * p + 0.05594 * p * q2 * q -
+            0.05607 * p2 * p * q + 0.01199 * q - 0.00256 * p2 * p * q2 +
+            0.00128 * p * q2 * q2 + 0.00022 * q2 - 0.00022 * p2 +
+            0.00026 * p2 * p2 * p) / 3600)
+    return lon, lat
+
+
+def wgs84_to_rd(lon, lat):
+    """RD coordinates of longitudes and latitudes, as arrays."""
+    x, y = array('d'), array('d')
+    for LON, LAT in zip(lon, lat):
+        p = 0.36 * (LAT - LAT0)
+        q = 0.36 * (LON - LON0)
+        p2, q2 = p * p, q * q
+        x.append(X0 + (
+            190094.945 * q - 11832.228 * p * q - 114.221 * p2 * q -
+            32.391 * q2 * q - 0.705 * p - 2.340 * p2 * p * q -
+            0.608 * p * q2 * q - 0.008 * q2 + 0.148 * p2 * q2 * q))
+        y.append(Y0 + (
+            309056.544 * p + 3638.893 * q2 + 73.077 * p2 -
+            157.984 * p * q2 + 59.788 * p2 * p + 0.433 * q -
+            6.439 * p2 * q2 - 0.032 * p * q + 0.092 * q2 * q2 -
+            0.054 * p * q2 * q2))
+    return x, y
+
+
+TRANSFORMS = {(RD, WGS84): rd_to_wgs84, (WGS84, RD): wgs84_to_rd}
+
+
+class Reprojector:
+    """Reproject the positions of argument tuples of readers.py to
+    `target` in blocks of rows.
+
+    Rows in a CRS without a transform to `target`, or with positions that
+    are not numbers, are passed on unchanged and counted in `skipped`.
+    """
+    def __init__(self, target, block_rows=BLOCK_ROWS):
+        self.target = epsg(target)
+        if self.target not in DECIMALS:
+            raise ValueError(f'Unsupported target CRS "{target}", use one of '
+                             f'{", ".join(f"EPSG:{c}" for c in DECIMALS)}')
+        self.urn = URN.format(self.target)
+        self._format = f'{{:.{DECIMALS[self.target]}f}}'.format
+        self._block_rows = block_rows
+        self.reprojected = 0
+        self.skipped = Counter()
+
+    def rows(self, rows):
+        """Iterate over `rows`, reprojected.  None rows are passed on."""
+        block = []
+        for args in rows:
+            block.append(args)
+            if len(block) >= self._block_rows:
+                yield from self._reproject(block)
+                block = []
+        yield from self._reproject(block)
+
+    def _reproject(self, block):
+        c, i, j = POSITION
+        # Source EPSG code -> indexes of the rows in that CRS
+        sources = {}
+        for n, args in enumerate(block):
+            if args is not None:
+                sources.setdefault(args[c], []).append(n)
+        for crs, rows in sources.items():
+            source = epsg(crs)
+            if source == self.target:
+                for n in rows:
+                    args = block[n]
+                    block[n] = args[:c] + (self.urn,) + args[c + 1:]
+                continue
+            transform = TRANSFORMS.get((source, self.target))
+            if transform is None:
+                self.skipped[crs] += len(rows)
+                continue
+            x, y = array('d'), array('d')
+            valid = []
+            for n in rows:
+                args = block[n]
+                try:
+                    x.append(float(args[i]))
+                    y.append(float(args[j]))
+                except ValueError:
+                    del x[len(y):]
+                    self.skipped[crs] += 1
+                    continue
+                valid.append(n)
+            x, y = transform(x, y)
+            fmt = self._format
+            for n, x_pos, y_pos in zip(valid, map(fmt, x), map(fmt, y)):
+                args = block[n]
+                block[n] = (args[:c] + (self.urn, x_pos, y_pos) +
+                            args[j + 1:])
+            self.reprojected += len(valid)
+        return block
+
+    def log(self):
+        log.info(f'Reprojected {self.reprojected} positions to {self.urn}')
+        for crs, n in self.skipped.items():
+            log.warning(f'Kept {n} positions in "{crs}" that could not be '
+                        f'reprojected')
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Duplicate charge points and assets.
+
+Charge points are keyed by their EAN and assets by their transformer
+name.  Each occurrence of a key would add another set of entities, so
+with a `Deduplicator` only one row per key is built:
+
+- 'first': the first row wins, later rows are rejected.
+- 'last': the last row wins.  The rows are read twice; the first pass
+  counts the occurrences of the keys seen more than once.
+- 'error': a second row with a key raises DuplicateError.
+
+Keys already in a ForecastDataSet that rows are appended to are added
+with `seed`.  Its entities cannot be replaced, so rows with those keys
+are rejected with every policy, or raise DuplicateError for 'error'.
+
+The keys seen are kept as 64-bit fingerprints in a `FingerprintSet`, an
+open addressing table in an `array('Q')` of 11 to 21 bytes per key.
+Fingerprints are the string hashes of the keys; two different keys have
+the same fingerprint with a chance of about n² / 2⁶⁵ for n keys, well
+below one in a thousand for 50 million keys.  Rejected rows are written
+to a CSV file with their kind, row number and key.
+"""
+
+from array import array
+from collections import Counter
+from csv import writer
+
+import logging
+log = logging.getLogger(__name__)
+
+POLICIES = ('first', 'last', 'error')
+# Kind -> (index of the key in the argument tuples, key name)
+KEYS = {'charge_points': (2, 'EAN'), 'assets': (1, 'transformer')}
+CAPACITY = 1 << 16
+MASK = (1 << 64) - 1
+
+
+class DuplicateError(ValueError):
+    pass
+
+
+def fingerprint(key):
+    """Non-zero 64-bit fingerprint of `key`."""
+    return hash(key) & MASK or 1
+
+
+class FingerprintSet:
+    """Set of non-zero 64-bit fingerprints, in a table with linear probing
+    that is kept at most 3/4 full."""
+    def __init__(self, capacity=CAPACITY):
+        self._table = array('Q', bytes(8 * capacity))
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self._table.__sizeof__()
+
+    def __contains__(self, fp):
+        table = self._table
+        mask = len(table) - 1
+        i = fp & mask
+        while True:
+            v = table[i]
+            if not v:
+                return False
+            if v == fp:
+                return True
+            i = (i + 1) & mask
+
+    def add(self, fp):
+        """Add fingerprint `fp`, returns False if it was in the set."""
+        table = self._table
+        mask = len(table) - 1
+        i = fp & mask
+        while True:
+            v = table[i]
+            if not v:
+                break
+            if v == fp:
+                return False
+            i = (i + 1) & mask
+        table[i] = fp
+        self._len += 1
+        if self._len * 4 > len(table) * 3:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self._table
+        table = self._table = array('Q', bytes(16 * len(old)))
+        mask = len(table) - 1
+        for fp in old:
+            if fp:
+                i = fp & mask
+                while table[i]:
+                    i = (i + 1) & mask
+                table[i] = fp
+
+
+class Deduplicator:
+    """Keep one row per key with `policy` 'first', 'last' or 'error',
+    writing the rejected rows to the text file `rejects` if given."""
+    def __init__(self, policy, rejects=None):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown duplicate policy "{policy}"')
+        self.policy = policy
+        self._rejects = None
+        if rejects is not None:
+            self._rejects = writer(rejects)
+            self._rejects.writerow(('kind', 'row', 'key'))
+        # Kind -> fingerprint -> earlier occurrences to reject, for 'last'
+        self._remaining = {}
+        # Kind -> FingerprintSet of the keys added with seed
+        self._seeded = {}
+        self.rejected = Counter()
+
+    def seed(self, kind, keys):
+        """Add the `keys` of `kind` of the entities that rows are appended
+        to, so rows with those keys are duplicates."""
+        seeded = self._seeded.setdefault(kind, FingerprintSet())
+        for key in keys:
+            if key is not None:
+                seeded.add(fingerprint(key))
+        log.info(f'Seeded {len(seeded)} {KEYS[kind][1]} keys')
+
+    def scan(self, rows, kind):
+        """First pass over the rows of `kind` for the 'last' policy."""
+        index, _ = KEYS[kind]
+        seen = FingerprintSet()
+        remaining = self._remaining[kind] = Counter()
+        for args in rows:
+            if args is not None:
+                fp = fingerprint(args[index])
+                if not seen.add(fp):
+                    remaining[fp] += 1
+        self._log_size(kind, seen)
+
+    def rows(self, rows, kind):
+        """Iterate over the rows of `kind`, yielding None for rejected
+        rows, so rows keep their numbers."""
+        index, name = KEYS[kind]
+        if self.policy == 'last':
+            remaining = self._remaining.pop(kind)
+            seeded = self._seeded.get(kind, ())
+            for n, args in enumerate(rows, start=1):
+                if args is not None and (remaining or seeded):
+                    fp = fingerprint(args[index])
+                    earlier = remaining.pop(fp, 0)
+                    if earlier > 1:
+                        remaining[fp] = earlier - 1
+                    if earlier or fp in seeded:
+                        args = self._reject(kind, n, args[index])
+                yield args
+            return
+        seen = self._seeded.pop(kind, None) or FingerprintSet()
+        for n, args in enumerate(rows, start=1):
+            if args is not None and not seen.add(fingerprint(args[index])):
+                if self.policy == 'error':
+                    raise DuplicateError(f'Duplicate {name} '
+                                         f'"{args[index]}" in row {n} of '
+                                         f'the {kind.replace("_", " ")}')
+                args = self._reject(kind, n, args[index])
+            yield args
+        self._log_size(kind, seen)
+
+    def _reject(self, kind, n, key):
+        self.rejected[kind] += 1
+        if self._rejects is not None:
+            self._rejects.writerow((kind, n, key))
+        return None
+
+    def _log_size(self, kind, seen):
+        log.info(f'Checked {len(seen)} {KEYS[kind][1]} keys for duplicates '
+                 f'in {seen.__sizeof__() / (1 << 20):.1f} MB')
+
+    def log(self):
+        for kind, n in self.rejected.items():
+            log.warning(f'Rejected {n} duplicate {kind.replace("_", " ")}, '
+                        f'keeping the {self.policy} row of each '
+                        f'{KEYS[kind][1]}')
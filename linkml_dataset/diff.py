@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""Diff two ForecastDataSet JSON documents by natural key.
+
+mRIDs are random, so entities are compared on a view keyed by a natural
+key: Substations and PowerTransformers by description, UsagePoints by EAN.
+The view resolves the references of an entity to the names of what they
+point at, e.g. the substation and the loads and limits of a transformer.
+
+Both documents are streamed into the tables of a temporary SQLite
+database, which keeps memory bounded and spills to disk.  The views are
+then read back sorted by key and merge-joined, emitting one record per
+added, removed or changed entity.
+"""
+
+from heapq import merge
+from itertools import groupby
+from json import dumps, loads
+from operator import itemgetter
+from tempfile import mkstemp
+import os
+import sqlite3
+
+from .jsonstream import iter_dataset
+
+import logging
+log = logging.getLogger(__name__)
+
+OLD, NEW = 0, 1
+BATCH = 10000
+
+SCHEMA = '''
+CREATE TABLE substation (side, mrid, name, location);
+CREATE TABLE equipment (side, substation, pt);
+CREATE TABLE pt (side, mrid, name);
+CREATE TABLE pt_end (side, pt, terminal);
+CREATE TABLE terminal (side, mrid, equipment, connectivity_node);
+CREATE TABLE measurement (side, terminal, analog);
+CREATE TABLE limit_set (side, terminal, ols);
+CREATE TABLE limit_value (side, ols, apl);
+CREATE TABLE analog (side, mrid, doc);
+CREATE TABLE apl (side, mrid, doc);
+CREATE TABLE tn_terminal (side, tn, terminal);
+CREATE TABLE usage_point (side, mrid, ean);
+CREATE TABLE consumer (side, mrid, usage_point, location);
+CREATE TABLE mkt_node (side, mrid, resource);
+CREATE TABLE registered_load (side, mrid, participant);
+CREATE TABLE participant (side, mrid, name);
+'''
+
+# Created after loading, for the joins and the ORDER BY of the views
+INDEXES = [('substation', 'mrid'), ('substation', 'name'),
+           ('equipment', 'substation'), ('equipment', 'pt'),
+           ('pt', 'mrid'), ('pt', 'name'), ('pt_end', 'pt'),
+           ('terminal', 'mrid'), ('terminal', 'equipment'),
+           ('measurement', 'terminal'), ('limit_set', 'terminal'),
+           ('limit_value', 'ols'), ('analog', 'mrid'), ('apl', 'mrid'),
+           ('tn_terminal', 'terminal'), ('usage_point', 'ean'),
+           ('consumer', 'usage_point'), ('mkt_node', 'mrid'),
+           ('registered_load', 'mrid'), ('participant', 'mrid')]
+
+# Entity type -> [(field, is list, query)].  Every query selects the key
+# and a value for one side, ordered by key.
+VIEWS = {
+    'Substation': [
+        ('location', False, '''
+            SELECT name, location FROM substation
+            WHERE side = ? AND name IS NOT NULL ORDER BY name'''),
+        ('power_transformers', True, '''
+            SELECT s.name, p.name FROM substation s
+            JOIN equipment e ON e.side = s.side AND e.substation = s.mrid
+            JOIN pt p ON p.side = s.side AND p.mrid = e.pt
+            WHERE s.side = ? AND s.name IS NOT NULL ORDER BY s.name''')],
+    'PowerTransformer': [
+        ('substation', False, '''
+            SELECT p.name, s.name FROM pt p
+            LEFT JOIN equipment e ON e.side = p.side AND e.pt = p.mrid
+            LEFT JOIN substation s ON s.side = p.side AND
+                                      s.mrid = e.substation
+            WHERE p.side = ? AND p.name IS NOT NULL ORDER BY p.name'''),
+        ('loads', True, '''
+            SELECT p.name, a.doc FROM pt p
+            JOIN pt_end pe ON pe.side = p.side AND pe.pt = p.mrid
+            JOIN measurement m ON m.side = p.side AND
+                                  m.terminal = pe.terminal
+            JOIN analog a ON a.side = p.side AND a.mrid = m.analog
+            WHERE p.side = ? AND p.name IS NOT NULL ORDER BY p.name'''),
+        ('limits', True, '''
+            SELECT p.name, a.doc FROM pt p
+            JOIN pt_end pe ON pe.side = p.side AND pe.pt = p.mrid
+            JOIN limit_set ls ON ls.side = p.side AND
+                                 ls.terminal = pe.terminal
+            JOIN limit_value lv ON lv.side = p.side AND lv.ols = ls.ols
+            JOIN apl a ON a.side = p.side AND a.mrid = lv.apl
+            WHERE p.side = ? AND p.name IS NOT NULL ORDER BY p.name''')],
+    'UsagePoint': [
+        ('location', False, '''
+            SELECT u.ean, c.location FROM usage_point u
+            LEFT JOIN consumer c ON c.side = u.side AND
+                                    c.usage_point = u.mrid
+            WHERE u.side = ? AND u.ean IS NOT NULL ORDER BY u.ean'''),
+        ('power_transformer', False, '''
+            SELECT u.ean, n.tn FROM usage_point u
+            JOIN consumer c ON c.side = u.side AND c.usage_point = u.mrid
+            JOIN terminal t ON t.side = u.side AND t.equipment = c.mrid
+            JOIN tn_terminal n ON n.side = u.side AND n.terminal = t.mrid
+            WHERE u.side = ? AND u.ean IS NOT NULL ORDER BY u.ean'''),
+        ('market_participant', False, '''
+            SELECT u.ean, p.name FROM usage_point u
+            JOIN consumer c ON c.side = u.side AND c.usage_point = u.mrid
+            JOIN terminal t ON t.side = u.side AND t.equipment = c.mrid
+            JOIN mkt_node m ON m.side = u.side AND
+                               m.mrid = t.connectivity_node
+            JOIN registered_load r ON r.side = u.side AND
+                                      r.mrid = m.resource
+            JOIN participant p ON p.side = u.side AND
+                                  p.mrid = r.participant
+            WHERE u.side = ? AND u.ean IS NOT NULL ORDER BY u.ean''')]}
+
+
+def _strip(obj):
+    """`obj` without mRIDs, which differ between any two builds."""
+    if isinstance(obj, dict):
+        return {k: _strip(v) for k, v in obj.items() if k != 'm_rid'}
+    if isinstance(obj, list):
+        return [_strip(v) for v in obj]
+    return obj
+
+
+def _doc(obj):
+    return dumps(obj, sort_keys=True)
+
+
+class _Loader:
+    """Batched inserts of the rows of one side."""
+    def __init__(self, db, side):
+        self._db = db
+        self._side = side
+        self._rows = {}
+        self._n = 0
+        # CoordinateSystem mRID -> crs_urn, a handful of entities
+        self.crs = {}
+
+    def add(self, table, *row):
+        self._rows.setdefault(table, []).append((self._side,) + row)
+        self._n += 1
+        if self._n >= BATCH:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self._rows.items():
+            marks = ', '.join('?' * len(rows[0]))
+            self._db.executemany(f'INSERT INTO {table} VALUES ({marks})', rows)
+        self._rows.clear()
+        self._n = 0
+
+    def location(self, location):
+        if location is None:
+            return None
+        location = dict(location)
+        crs = location.get('coordinate_system')
+        if crs is not None:
+            location['coordinate_system'] = self.crs.get(crs, crs)
+        return _doc(_strip(location))
+
+    def load(self, section, e):
+        add = self.add
+        if section == 'coordinate_systems':
+            self.crs[e['m_rid']] = e['crs_urn']
+        elif section == 'substations':
+            add('substation', e['m_rid'], e.get('description'),
+                self.location(e.get('location')))
+            for pt in e.get('equipments', []):
+                add('equipment', e['m_rid'], pt)
+        elif section == 'power_transformers':
+            add('pt', e['m_rid'], e.get('description'))
+            for end in e.get('power_transformer_end', []):
+                add('pt_end', e['m_rid'], end.get('terminal'))
+        elif section == 'terminals':
+            add('terminal', e['m_rid'], e.get('conducting_equipment'),
+                e.get('connectivity_node'))
+            for analog in e.get('measurements') or []:
+                add('measurement', e['m_rid'], analog)
+            for ols in e.get('operational_limit_set') or []:
+                add('limit_set', e['m_rid'], ols)
+        elif section == 'topological_nodes':
+            for terminal in e.get('terminal', []):
+                add('tn_terminal', e.get('description'), terminal)
+        elif section == 'analogs':
+            add('analog', e['m_rid'], _doc(_strip(e)))
+        elif section == 'operational_limit_sets':
+            for apl in e.get('operational_limit_value', []):
+                add('limit_value', e['m_rid'], apl)
+        elif section == 'active_power_limits':
+            add('apl', e['m_rid'], _doc(_strip(e)))
+        elif section == 'usage_points':
+            add('usage_point', e['m_rid'], e.get('european_article_number_ean'))
+        elif section == 'energy_consumers':
+            location = self.location(e.get('location'))
+            for up in e.get('usage_points') or []:
+                add('consumer', e['m_rid'], up, location)
+        elif section == 'mkt_connectivity_nodes':
+            for resource in e.get('registered_resource', []):
+                add('mkt_node', e['m_rid'], resource)
+        elif section == 'registered_loads':
+            add('registered_load', e['m_rid'], e.get('market_participant'))
+        elif section == 'market_participants':
+            add('participant', e['m_rid'], e.get('description'))
+
+
+class Diff:
+    """Differences between an old and a new ForecastDataSet document."""
+    def __init__(self, old, new, directory=None, cache_size=64 << 20):
+        fd, self._path = mkstemp(suffix='.sqlite', dir=directory)
+        os.close(fd)
+        self._db = sqlite3.connect(self._path)
+        self._db.execute('PRAGMA journal_mode = OFF')
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute(f'PRAGMA cache_size = -{cache_size >> 10}')
+        self._db.executescript(SCHEMA)
+        for side, f in ((OLD, old), (NEW, new)):
+            self._load(side, f)
+        log.info('Indexing')
+        for table, column in INDEXES:
+            self._db.execute(f'CREATE INDEX {table}_{column} '
+                             f'ON {table} (side, {column})')
+
+    def _load(self, side, f):
+        loader = _Loader(self._db, side)
+        for name, value in iter_dataset(f):
+            if not hasattr(value, '__next__'):
+                continue
+            log.info(f'Loading {name} from {getattr(f, "name", f)}')
+            for item, _ in value:
+                loader.load(name, item)
+        loader.flush()
+
+    def _rows(self, sql, side, field):
+        for key, value in self._db.execute(sql, (side,)):
+            yield key, field, value
+
+    def _view(self, kind, side):
+        """(key, {field: value}) of an entity type, ordered by key."""
+        fields = VIEWS[kind]
+        rows = merge(*[self._rows(sql, side, i)
+                       for i, (_, _, sql) in enumerate(fields)],
+                     key=itemgetter(0))
+        for key, group in groupby(rows, key=itemgetter(0)):
+            view = {name: [] if is_list else None
+                    for name, is_list, _ in fields}
+            for _, i, value in group:
+                name, is_list, _ = fields[i]
+                if is_list:
+                    view[name].append(value)
+                elif view[name] is None:
+                    view[name] = value
+            for name, is_list, _ in fields:
+                if is_list:
+                    view[name].sort()
+            yield key, view
+
+    def __iter__(self):
+        """Records with the change, entity type and key, and the old and
+        new values of the fields that differ."""
+        for kind in VIEWS:
+            old = self._view(kind, OLD)
+            new = self._view(kind, NEW)
+            rows = merge(((key, OLD, v) for key, v in old),
+                         ((key, NEW, v) for key, v in new),
+                         key=itemgetter(0, 1))
+            for key, group in groupby(rows, key=itemgetter(0)):
+                views = dict((side, v) for _, side, v in group)
+                if NEW not in views:
+                    yield {'change': 'removed', 'type': kind, 'key': key,
+                           'old': _decode(views[OLD])}
+                elif OLD not in views:
+                    yield {'change': 'added', 'type': kind, 'key': key,
+                           'new': _decode(views[NEW])}
+                elif views[OLD] != views[NEW]:
+                    old, new = _decode(views[OLD]), _decode(views[NEW])
+                    yield {'change': 'changed', 'type': kind, 'key': key,
+                           'changes': {name: {'old': old[name],
+                                              'new': new[name]}
+                                       for name in old
+                                       if old[name] != new[name]}}
+
+    def write(self, out):
+        """Write the records as NDJSON, returns the number of records."""
+        n = 0
+        for n, record in enumerate(self, start=1):
+            out.write(dumps(record))
+            out.write('\n')
+        return n
+
+    def close(self):
+        self._db.close()
+        os.remove(self._path)
+
+
+def _decode(view):
+    """View with the JSON documents of locations, loads and limits
+    decoded."""
+    return {name: ([_json(v) for v in value] if isinstance(value, list)
+                   else _json(value))
+            for name, value in view.items()}
+
+
+def _json(value):
+    if isinstance(value, str) and value.startswith(('{', '[')):
+        return loads(value)
+    return value
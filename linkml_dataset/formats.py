@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from json import dumps
+from xml.sax.saxutils import quoteattr, escape
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def _local(iri):
+    return iri.split('#')[-1]
+
+
+def _dot_id(name):
+    return dumps(name)
+
+
+def write_text(graph, out):
+    """`subj -> obj: "pred"` per edge, as printed by earlier versions."""
+    for e in graph.edges:
+        out.write(f'{_local(e.subject)} -> {_local(e.object)}: '
+                  f'"{_local(e.predicate)}"\n')
+
+
+def write_dot(graph, out):
+    """Graphviz digraph with instance counts on nodes and edges."""
+    out.write('digraph cgmes {\n')
+    for name, count in graph.classes.most_common():
+        name = _local(name)
+        label = f'{name}\n{count}'
+        out.write(f'  {_dot_id(name)} [label={_dot_id(label)}];\n')
+    for e, count in graph.edges.most_common():
+        label = f'{_local(e.predicate)} ({count})'
+        out.write(f'  {_dot_id(_local(e.subject))} -> '
+                  f'{_dot_id(_local(e.object))} [label={_dot_id(label)}, '
+                  f'weight={count}];\n')
+    out.write('}\n')
+
+
+def write_graphml(graph, out):
+    """GraphML with `count` on nodes and `predicate`/`count` on edges."""
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+              '  <key id="iri" for="node" attr.name="iri" attr.type="string"/>\n'
+              '  <key id="n_count" for="node" attr.name="count" attr.type="long"/>\n'
+              '  <key id="predicate" for="edge" attr.name="predicate" attr.type="string"/>\n'
+              '  <key id="e_count" for="edge" attr.name="count" attr.type="long"/>\n'
+              '  <graph id="cgmes" edgedefault="directed">\n')
+    for name, count in graph.classes.most_common():
+        out.write(f'    <node id={quoteattr(_local(name))}>'
+                  f'<data key="iri">{escape(name)}</data>'
+                  f'<data key="n_count">{count}</data></node>\n')
+    for e, count in graph.edges.most_common():
+        out.write(f'    <edge source={quoteattr(_local(e.subject))} '
+                  f'target={quoteattr(_local(e.object))}>'
+                  f'<data key="predicate">{escape(_local(e.predicate))}</data>'
+                  f'<data key="e_count">{count}</data></edge>\n')
+    out.write('  </graph>\n</graphml>\n')
+
+
+def write_json(graph, out):
+    """JSON object with `classes` and `edges` arrays, one item per line."""
+    out.write('{\n  "classes": [')
+    sep = '\n'
+    for name, count in graph.classes.most_common():
+        out.write(sep + '    ' + dumps({'class': _local(name), 'iri': name,
+                                        'count': count}))
+        sep = ',\n'
+    out.write('\n  ],\n  "edges": [')
+    sep = '\n'
+    for e, count in graph.edges.most_common():
+        out.write(sep + '    ' + dumps({'subject': _local(e.subject),
+                                        'predicate': _local(e.predicate),
+                                        'object': _local(e.object),
+                                        'count': count}))
+        sep = ',\n'
+    out.write('\n  ]\n}\n')
+
+
+FORMATS = {'text': write_text,
+           'dot': write_dot,
+           'graphml': write_graphml,
+           'json': write_json}
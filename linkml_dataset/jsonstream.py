@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Incremental reader for ForecastDataSet JSON documents.
+
+The document is read in blocks and decoded one list item at a time with
+`JSONDecoder.raw_decode`, so memory use is bounded by the largest item
+instead of the size of the file.  The JSON text of every item is kept as
+well, so it can be copied to another document without formatting it
+again.
+"""
+
+from json import JSONDecoder, JSONDecodeError
+import re
+
+from .cache import BLOCK_SIZE
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Buffer:
+    def __init__(self, f, block_size):
+        self._f = f
+        self._block_size = block_size
+        self._decoder = JSONDecoder()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        block = self._f.read(self._block_size)
+        if not block:
+            self.eof = True
+            return
+        self.text = self.text[self.pos:] + block
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the file."""
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or self.eof:
+                return self.text[self.pos:self.pos + 1]
+            self._read()
+
+    def expect(self, chars):
+        c = self.peek()
+        if c not in chars or not c:
+            raise ValueError(f'Expected {chars!r} at offset {self.pos}, '
+                             f'found {c!r}')
+        self.pos += 1
+        return c
+
+    def decode(self):
+        """(value, JSON text) of the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.text, self.pos)
+            except JSONDecodeError:
+                if self.eof:
+                    raise
+                self._read()
+                continue
+            # A number may continue in the next block
+            if end == len(self.text) and not self.eof:
+                self._read()
+                continue
+            text = self.text[self.pos:end]
+            self.pos = end
+            return value, text
+
+
+def iter_dataset(f, block_size=BLOCK_SIZE):
+    """Stream the top-level fields of a ForecastDataSet JSON document.
+
+    Yields (name, value) for every field.  Scalars are decoded, lists are
+    yielded as generators of (item, JSON text) that must be consumed
+    before the next field is read.
+    """
+    buf = _Buffer(f, block_size)
+    buf.expect('{')
+    if buf.peek() == '}':
+        return
+    while True:
+        name, _ = buf.decode()
+        buf.expect(':')
+        if buf.peek() == '[':
+            buf.pos += 1
+            items = _items(buf)
+            yield name, items
+            # Skip what the caller did not consume
+            for _ in items:
+                pass
+        else:
+            value, _ = buf.decode()
+            yield name, value
+        if buf.expect(',}') == '}':
+            return
+
+
+def _items(buf):
+    if buf.peek() == ']':
+        buf.pos += 1
+        return
+    while True:
+        yield buf.decode()
+        if buf.expect(',]') == ']':
+            return
+
+
+def iter_items(f, block_size=BLOCK_SIZE):
+    """Stream the comma separated JSON values of a file, such as the list
+    items in an EntityStore segment.  Yields (value, JSON text)."""
+    buf = _Buffer(f, block_size)
+    if not buf.peek():
+        return
+    while True:
+        yield buf.decode()
+        if not buf.peek():
+            return
+        buf.expect(',')
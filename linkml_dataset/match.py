@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Match charge points to the nearest transformer by position.
+
+Charge points name the transformer they are connected to.  When that name
+is empty or not one of the transformers in the asset CSV, the charge point
+can be assigned to the nearest transformer within a radius instead.  The
+positions of the asset rows are indexed in a uniform grid with cells of
+the size of the radius, in RD New metres, so a query only looks at the
+3 x 3 cells around a point.  Charge points are matched in blocks of rows,
+reprojecting their positions to RD New in one batch per CRS.
+"""
+
+from array import array
+from collections import Counter
+from math import floor, hypot
+
+from .crs import RD, TRANSFORMS, epsg
+from .readers import POSITION
+
+import logging
+log = logging.getLogger(__name__)
+
+BLOCK_ROWS = 1 << 14
+# Indexes of the substation and transformer names in the argument tuples
+SUBSTATION, TRANSFORMER = 0, 1
+
+
+def _to_rd(crs, xs, ys):
+    """RD coordinates of positions in `crs`, None if there is no
+    transform."""
+    source = epsg(crs)
+    if source == RD:
+        return xs, ys
+    transform = TRANSFORMS.get((source, RD))
+    return transform(xs, ys) if transform is not None else None
+
+
+class GridIndex:
+    """Points in a uniform grid of `cell_size` cells."""
+    def __init__(self, cell_size):
+        self._cell_size = float(cell_size)
+        self._cells = {}
+        self.x = array('d')
+        self.y = array('d')
+
+    def _cell(self, x, y):
+        return floor(x / self._cell_size), floor(y / self._cell_size)
+
+    def add(self, x, y):
+        """Add a point, returns its id."""
+        i = len(self.x)
+        self.x.append(x)
+        self.y.append(y)
+        self._cells.setdefault(self._cell(x, y), []).append(i)
+        return i
+
+    def __len__(self):
+        return len(self.x)
+
+    def nearest(self, x, y, radius):
+        """(id, distance) of the nearest point within `radius`, which may
+        not exceed the cell size, or None."""
+        cx, cy = self._cell(x, y)
+        best, best_d = None, radius
+        xs, ys, cells = self.x, self.y, self._cells
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for k in cells.get((i, j), ()):
+                    d = hypot(xs[k] - x, ys[k] - y)
+                    if d <= best_d:
+                        best, best_d = k, d
+        return None if best is None else (best, best_d)
+
+
+def _positions(block, indexes):
+    """Group the rows `indexes` of `block` by CRS with their positions as
+    arrays.  Rows with positions that are not numbers are left out."""
+    c, i, j = POSITION
+    groups = {}
+    for n in indexes:
+        args = block[n]
+        try:
+            x, y = float(args[i]), float(args[j])
+        except ValueError:
+            continue
+        group = groups.get(args[c])
+        if group is None:
+            group = groups[args[c]] = ([], array('d'), array('d'))
+        group[0].append(n)
+        group[1].append(x)
+        group[2].append(y)
+    return groups
+
+
+class TransformerMatcher:
+    """Assign charge points without a known transformer to the nearest
+    transformer of the asset rows within `radius` metres.  Transformers
+    named in `known`, such as those of a loaded dataset, are not
+    replaced."""
+    def __init__(self, radius, known=(), block_rows=BLOCK_ROWS):
+        if radius <= 0:
+            raise ValueError('The match radius must be positive')
+        self._radius = radius
+        self._block_rows = block_rows
+        self._index = GridIndex(radius)
+        # Point id -> (substation name, transformer name)
+        self._transformers = []
+        self._names = set(known)
+        self.counts = Counter()
+
+    def add_assets(self, rows):
+        """Index the transformers of asset argument tuples, at the position
+        of their first row."""
+        block = []
+        for args in rows:
+            if args is None or args[TRANSFORMER] in self._names:
+                continue
+            self._names.add(args[TRANSFORMER])
+            block.append(args)
+            if len(block) >= self._block_rows:
+                self._add(block)
+                block = []
+        self._add(block)
+        log.info(f'Indexed {len(self._index)} transformers for matching')
+
+    def _add(self, block):
+        groups = _positions(block, range(len(block)))
+        for crs, (indexes, xs, ys) in groups.items():
+            rd = _to_rd(crs, xs, ys)
+            if rd is None:
+                continue
+            for n, x, y in zip(indexes, *rd):
+                args = block[n]
+                self._index.add(x, y)
+                self._transformers.append((args[SUBSTATION],
+                                           args[TRANSFORMER]))
+
+    def rows(self, rows):
+        """Iterate over charge point argument tuples.  Tuples of matched
+        charge points name the nearest transformer and get the
+        EnergyConsumer description that flags the match appended."""
+        block = []
+        for args in rows:
+            block.append(args)
+            if len(block) >= self._block_rows:
+                yield from self._match(block)
+                block = []
+        yield from self._match(block)
+
+    def _match(self, block):
+        unknown = [n for n, args in enumerate(block) if args is not None and
+                   args[TRANSFORMER] not in self._names]
+        matched = set()
+        for crs, (indexes, xs, ys) in _positions(block, unknown).items():
+            rd = _to_rd(crs, xs, ys)
+            if rd is None:
+                continue
+            for n, x, y in zip(indexes, *rd):
+                found = self._index.nearest(x, y, self._radius)
+                if found is None:
+                    continue
+                k, distance = found
+                s_name, ce_name = self._transformers[k]
+                args = block[n]
+                note = (f'Matched by position to transformer "{ce_name}" '
+                        f'at {distance:.1f} m')
+                if args[TRANSFORMER]:
+                    note += f', instead of unknown "{args[TRANSFORMER]}"'
+                block[n] = (s_name, ce_name) + args[2:] + (note,)
+                matched.add(n)
+        self.counts['matched'] += len(matched)
+        self.counts['unmatched'] += len(unknown) - len(matched)
+        return block
+
+    def log(self):
+        log.info(f'Matched {self.counts["matched"]} charge points to the '
+                 f'nearest transformer, {self.counts["unmatched"]} without '
+                 f'a transformer within {self._radius:g} m')
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Merge ForecastDataSet JSON documents into one.
+
+Every input creates its own GeographicalRegion, CoordinateSystems,
+MarketRoles and MarketParticipants.  These shared entities are
+deduplicated on their natural key: the first one seen is kept and the
+mRIDs of later duplicates are rewritten to it.  All other entities are
+not parsed beyond finding their end; their JSON text is appended to a
+segment per section, spooled in memory up to `max_memory` bytes and on
+disk beyond it, and copied to the output with the references rewritten
+once all inputs have been read.
+"""
+
+from json import dumps
+from json.encoder import encode_basestring_ascii
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+import re
+
+from .jsonstream import iter_dataset
+
+import logging
+log = logging.getLogger(__name__)
+
+# Shared section -> function returning the natural key of an entity
+SHARED = {'geographical_regions': lambda e: e.get('description'),
+          'coordinate_systems': lambda e: e['crs_urn'],
+          'market_roles': lambda e: e['type'],
+          'market_participants': lambda e: e.get('description')}
+
+# Fields of non-shared entities that refer to a shared entity
+REFERENCE = re.compile(r'("(?:coordinate_system|market_participant)"'
+                       r'\s*:\s*)"((?:[^"\\]|\\.)*)"')
+
+ITEM_SEP = ',\n    '
+
+
+def _dump_item(item):
+    """JSON text of a list item nested at level 2, as NetbewustLaden writes
+    it."""
+    return dumps(item, indent=2).replace('\n', '\n    ')
+
+
+class Merge:
+    """Merge ForecastDataSet documents added with `add` and write the
+    result with `write`."""
+    def __init__(self, max_memory=256 << 20, directory=None):
+        self.max_memory = max_memory
+        self._directory = directory
+        # Field names in order of first appearance
+        self._fields = {}
+        self._scalars = {}
+        # Shared section -> {natural key: entity}
+        self._shared = {section: {} for section in SHARED}
+        # mRID of a duplicate shared entity -> mRID of the one kept
+        self._remap = {}
+        self._segments = {}
+        self._counts = {}
+        self._size = 0
+        self._spilled = False
+        self.inputs = 0
+
+    def add(self, f):
+        """Read one ForecastDataSet document from file object `f`."""
+        self.inputs += 1
+        for name, value in iter_dataset(f):
+            self._fields.setdefault(name, None)
+            if not hasattr(value, '__next__'):
+                self._scalars.setdefault(name, value)
+            elif name in SHARED:
+                self._add_shared(name, value)
+            else:
+                self._spool(name, value)
+
+    def _add_shared(self, section, items):
+        key = SHARED[section]
+        entities = self._shared[section]
+        for item, _ in items:
+            kept = entities.setdefault(key(item), item)
+            if kept is item:
+                continue
+            self._remap[item['m_rid']] = kept['m_rid']
+            # The entity kept refers to the sub regions or roles of both
+            for name in ('regions', 'market_role'):
+                if name in item:
+                    kept[name] += [r for r in item[name]
+                                   if r not in kept[name]]
+
+    def _spool(self, section, items):
+        segment = self._segments.get(section)
+        if segment is None:
+            segment = SpooledTemporaryFile(self.max_memory, 'w+',
+                                           encoding='utf-8',
+                                           dir=self._directory)
+            if self._spilled:
+                segment.rollover()
+            self._segments[section] = segment
+            self._counts[section] = 0
+        n = self._counts[section]
+        for _, text in items:
+            if n:
+                segment.write(ITEM_SEP)
+            segment.write(text)
+            self._size += len(text)
+            n += 1
+        self._counts[section] = n
+        if not self._spilled and self._size > self.max_memory:
+            log.info('Spilling merged sections to disk')
+            for segment in self._segments.values():
+                segment.rollover()
+            self._spilled = True
+
+    def _rewrite(self, match):
+        mrid = match.group(2)
+        return f'{match.group(1)}"{self._remap.get(mrid, mrid)}"'
+
+    def write(self, out):
+        """Stream the merged ForecastDataSet as JSON to `out`."""
+        # Rewrite the references between shared entities
+        for mp in self._shared['market_participants'].values():
+            roles = [self._remap.get(r, r) for r in mp.get('market_role', [])]
+            mp['market_role'] = list(dict.fromkeys(roles))
+        out.write('{')
+        sep = '\n  '
+        for name in self._fields:
+            out.write(f'{sep}"{name}": ')
+            sep = ',\n  '
+            if name == 'identifier':
+                # The merged dataset is a new dataset
+                out.write(encode_basestring_ascii(str(uuid4())))
+            elif name in self._scalars:
+                out.write(dumps(self._scalars[name]))
+            elif name in SHARED:
+                items = list(self._shared[name].values())
+                if not items:
+                    out.write('[]')
+                    continue
+                out.write('[\n    ')
+                out.write(ITEM_SEP.join(map(_dump_item, items)))
+                out.write('\n  ]')
+            elif self._counts.get(name):
+                out.write('[\n    ')
+                self._copy(self._segments[name], out)
+                out.write('\n  ]')
+            else:
+                out.write('[]')
+        out.write('\n}')
+
+    def _copy(self, segment, out):
+        segment.seek(0)
+        if not self._remap:
+            copyfileobj(segment, out)
+            return
+        for line in segment:
+            out.write(REFERENCE.sub(self._rewrite, line))
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
@@ -40,6 +40,7 @@ class ConfiguredBaseModel(BaseModel):
         arbitrary_types_allowed = True,
         use_enum_values = True,
         strict = False,
+        defer_build = True,
     )
     pass
 
@@ -943,54 +944,5 @@ For CIMXML data files in RDF syntax conforming to IEC 61970-552, the mRID is map
 
 
 # Model rebuild
-# see https://pydantic-docs.helpmanual.io/usage/models/#rebuilding-a-model
-ForecastDataSet.model_rebuild()
-Name.model_rebuild()
-NameType.model_rebuild()
-NameTypeAuthority.model_rebuild()
-IdentifiedObject.model_rebuild()
-ActivePower.model_rebuild()
-TopologicalNode.model_rebuild()
-ConnectivityNode.model_rebuild()
-TransformerEnd.model_rebuild()
-OperationalLimitSet.model_rebuild()
-ACDCTerminal.model_rebuild()
-Terminal.model_rebuild()
-Measurement.model_rebuild()
-PowerSystemResource.model_rebuild()
-ConnectivityNodeContainer.model_rebuild()
-Equipment.model_rebuild()
-ConductingEquipment.model_rebuild()
-EnergyConnection.model_rebuild()
-Location.model_rebuild()
-StreetAddress.model_rebuild()
-StreetDetail.model_rebuild()
-TownDetail.model_rebuild()
-CoordinateSystem.model_rebuild()
-PositionPoint.model_rebuild()
-OperationalLimit.model_rebuild()
-OperationalLimitType.model_rebuild()
-EquipmentContainer.model_rebuild()
-UsagePoint.model_rebuild()
-Substation.model_rebuild()
-SubGeographicalRegion.model_rebuild()
-Line.model_rebuild()
-GeographicalRegion.model_rebuild()
-PowerTransformer.model_rebuild()
-PowerTransformerEnd.model_rebuild()
-Conductor.model_rebuild()
-ACLineSegment.model_rebuild()
-Analog.model_rebuild()
-ActivePowerLimit.model_rebuild()
-RegisteredResource.model_rebuild()
-RegisteredLoad.model_rebuild()
-MktConnectivityNode.model_rebuild()
-Organisation.model_rebuild()
-MarketParticipant.model_rebuild()
-OrganisationRole.model_rebuild()
-MarketRole.model_rebuild()
-EnergyConsumer.model_rebuild()
-IOPoint.model_rebuild()
-MeasurementValue.model_rebuild()
-AnalogValue.model_rebuild()
-
+# Schemas are built on first use (defer_build in ConfiguredBaseModel) instead
+# of calling model_rebuild() on every class at import time.
@@ -0,0 +1,793 @@
+# -*- coding: utf-8 -*-
+# Generated by linkml_dataset.codegen from dp_netbewust_laden.py, do not edit.
+"""JSON serializers for dp_netbewust_laden.py.
+
+`dump_<Class>(obj, level)` returns the JSON text of `obj` as nested at
+`level` in a document indented by two spaces; `dumps(obj)` returns the
+document itself.  Equal to `json.dumps(obj.model_dump(exclude_none=True),
+indent=2, default=str)`.
+"""
+
+from json.encoder import encode_basestring_ascii as _str
+
+
+class _Indents(dict):
+    def __missing__(self, level):
+        indent = self[level] = '\n' + '  ' * level
+        return indent
+
+
+INDENTS = _Indents()
+
+
+def _float(v):
+    if v != v:
+        return 'NaN'
+    if v == float('inf'):
+        return 'Infinity'
+    if v == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(v)
+
+
+def _bool(v):
+    return 'true' if v else 'false'
+
+
+def _datetime(v):
+    return _str(str(v))
+
+
+def _list(values, level, dump):
+    if not values:
+        return '[]'
+    indent = INDENTS[level + 1]
+    return ('[' + indent +
+            (',' + indent).join([dump(v, level + 1) for v in values]) +
+            INDENTS[level] + ']')
+
+
+def _scalar_list(values, level, dump):
+    if not values:
+        return '[]'
+    indent = INDENTS[level + 1]
+    return ('[' + indent + (',' + indent).join([dump(v) for v in values]) +
+            INDENTS[level] + ']')
+
+
+def _object(items, level):
+    if not items:
+        return '{}'
+    indent = INDENTS[level + 1]
+    return '{' + indent + (',' + indent).join(items) + INDENTS[level] + '}'
+
+
+
+def dump_ForecastDataSet(o, level=0):
+    """ForecastDataSet"""
+    items = []
+    items.append('"identifier": ' + _str(o.identifier))
+    items.append('"conforms_to": ' + _str(o.conforms_to))
+    items.append('"contact_point": ' + _str(o.contact_point))
+    items.append('"release_date": ' + _str(o.release_date))
+    items.append('"version": ' + _str(o.version))
+    items.append('"terminals": ' + _list(o.terminals, level + 1, dump_Terminal))
+    items.append('"topological_nodes": ' + _list(o.topological_nodes, level + 1, dump_TopologicalNode))
+    items.append('"coordinate_systems": ' + _list(o.coordinate_systems, level + 1, dump_CoordinateSystem))
+    items.append('"usage_points": ' + _list(o.usage_points, level + 1, dump_UsagePoint))
+    items.append('"substations": ' + _list(o.substations, level + 1, dump_Substation))
+    items.append('"sub_geographical_regions": ' + _list(o.sub_geographical_regions, level + 1, dump_SubGeographicalRegion))
+    items.append('"lines": ' + _list(o.lines, level + 1, dump_Line))
+    items.append('"geographical_regions": ' + _list(o.geographical_regions, level + 1, dump_GeographicalRegion))
+    items.append('"power_transformers": ' + _list(o.power_transformers, level + 1, dump_PowerTransformer))
+    items.append('"ac_line_segments": ' + _list(o.ac_line_segments, level + 1, dump_ACLineSegment))
+    items.append('"analogs": ' + _list(o.analogs, level + 1, dump_Analog))
+    items.append('"active_power_limits": ' + _list(o.active_power_limits, level + 1, dump_ActivePowerLimit))
+    items.append('"operational_limit_sets": ' + _list(o.operational_limit_sets, level + 1, dump_OperationalLimitSet))
+    items.append('"registered_loads": ' + _list(o.registered_loads, level + 1, dump_RegisteredLoad))
+    items.append('"mkt_connectivity_nodes": ' + _list(o.mkt_connectivity_nodes, level + 1, dump_MktConnectivityNode))
+    items.append('"market_participants": ' + _list(o.market_participants, level + 1, dump_MarketParticipant))
+    items.append('"market_roles": ' + _list(o.market_roles, level + 1, dump_MarketRole))
+    items.append('"energy_consumers": ' + _list(o.energy_consumers, level + 1, dump_EnergyConsumer))
+    return _object(items, level)
+
+
+def dump_Name(o, level=0):
+    """Name"""
+    items = []
+    items.append('"name_type": ' + dump_NameType(o.name_type, level + 1))
+    return _object(items, level)
+
+
+def dump_NameType(o, level=0):
+    """NameType"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    v = o.name_type_authority
+    if v is not None:
+        items.append('"name_type_authority": ' + dump_NameTypeAuthority(v, level + 1))
+    return _object(items, level)
+
+
+def dump_NameTypeAuthority(o, level=0):
+    """NameTypeAuthority"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    return _object(items, level)
+
+
+def dump_IdentifiedObject(o, level=0):
+    """IdentifiedObject"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    return _object(items, level)
+
+
+def dump_ActivePower(o, level=0):
+    """ActivePower"""
+    items = []
+    items.append('"multiplier": ' + _str(o.multiplier))
+    items.append('"unit": ' + _str(o.unit))
+    items.append('"value": ' + _float(o.value))
+    return _object(items, level)
+
+
+def dump_TopologicalNode(o, level=0):
+    """TopologicalNode"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.connectivity_nodes
+    if v is not None:
+        items.append('"connectivity_nodes": ' + _scalar_list(v, level + 1, _str))
+    items.append('"terminal": ' + _scalar_list(o.terminal, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_ConnectivityNode(o, level=0):
+    """ConnectivityNode"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    return _object(items, level)
+
+
+def dump_TransformerEnd(o, level=0):
+    """TransformerEnd"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"terminal": ' + _str(o.terminal))
+    return _object(items, level)
+
+
+def dump_OperationalLimitSet(o, level=0):
+    """OperationalLimitSet"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.operational_limit_value
+    if v is not None:
+        items.append('"operational_limit_value": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_ACDCTerminal(o, level=0):
+    """ACDCTerminal"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _scalar_list(v, level + 1, _str))
+    v = o.measurements
+    if v is not None:
+        items.append('"measurements": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_Terminal(o, level=0):
+    """Terminal"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _scalar_list(v, level + 1, _str))
+    v = o.measurements
+    if v is not None:
+        items.append('"measurements": ' + _scalar_list(v, level + 1, _str))
+    v = o.topological_node
+    if v is not None:
+        items.append('"topological_node": ' + _str(v))
+    v = o.connectivity_node
+    if v is not None:
+        items.append('"connectivity_node": ' + _str(v))
+    v = o.conducting_equipment
+    if v is not None:
+        items.append('"conducting_equipment": ' + _str(v))
+    return _object(items, level)
+
+
+def dump_Measurement(o, level=0):
+    """Measurement"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.measurement_type
+    if v is not None:
+        items.append('"measurement_type": ' + _str(v))
+    items.append('"unit_multiplier": ' + _str(o.unit_multiplier))
+    items.append('"unit_symbol": ' + _str(o.unit_symbol))
+    return _object(items, level)
+
+
+def dump_PowerSystemResource(o, level=0):
+    """PowerSystemResource"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    return _object(items, level)
+
+
+def dump_ConnectivityNodeContainer(o, level=0):
+    """ConnectivityNodeContainer"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    return _object(items, level)
+
+
+def dump_Equipment(o, level=0):
+    """Equipment"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_ConductingEquipment(o, level=0):
+    """ConductingEquipment"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_EnergyConnection(o, level=0):
+    """EnergyConnection"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_Location(o, level=0):
+    """Location"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.main_address
+    if v is not None:
+        items.append('"main_address": ' + dump_StreetAddress(v, level + 1))
+    v = o.coordinate_system
+    if v is not None:
+        items.append('"coordinate_system": ' + _str(v))
+    v = o.position_points
+    if v is not None:
+        items.append('"position_points": ' + _list(v, level + 1, dump_PositionPoint))
+    return _object(items, level)
+
+
+def dump_StreetAddress(o, level=0):
+    """StreetAddress"""
+    items = []
+    items.append('"postal_code": ' + _str(o.postal_code))
+    items.append('"street_detail": ' + dump_StreetDetail(o.street_detail, level + 1))
+    v = o.town_detail
+    if v is not None:
+        items.append('"town_detail": ' + dump_TownDetail(v, level + 1))
+    return _object(items, level)
+
+
+def dump_StreetDetail(o, level=0):
+    """StreetDetail"""
+    items = []
+    v = o.code
+    if v is not None:
+        items.append('"code": ' + _str(v))
+    items.append('"number": ' + _str(o.number))
+    return _object(items, level)
+
+
+def dump_TownDetail(o, level=0):
+    """TownDetail"""
+    items = []
+    v = o.name
+    if v is not None:
+        items.append('"name": ' + _str(v))
+    v = o.section
+    if v is not None:
+        items.append('"section": ' + _str(v))
+    items.append('"state_or_province": ' + _str(o.state_or_province))
+    return _object(items, level)
+
+
+def dump_CoordinateSystem(o, level=0):
+    """CoordinateSystem"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"crs_urn": ' + _str(o.crs_urn))
+    return _object(items, level)
+
+
+def dump_PositionPoint(o, level=0):
+    """PositionPoint"""
+    items = []
+    v = o.group_number
+    if v is not None:
+        items.append('"group_number": ' + int.__repr__(v))
+    v = o.sequence_number
+    if v is not None:
+        items.append('"sequence_number": ' + int.__repr__(v))
+    items.append('"x_position": ' + _str(o.x_position))
+    items.append('"y_position": ' + _str(o.y_position))
+    v = o.z_position
+    if v is not None:
+        items.append('"z_position": ' + _str(v))
+    return _object(items, level)
+
+
+def dump_OperationalLimit(o, level=0):
+    """OperationalLimit"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"operational_limit_type": ' + dump_OperationalLimitType(o.operational_limit_type, level + 1))
+    return _object(items, level)
+
+
+def dump_OperationalLimitType(o, level=0):
+    """OperationalLimitType"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    return _object(items, level)
+
+
+def dump_EquipmentContainer(o, level=0):
+    """EquipmentContainer"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    items.append('"equipments": ' + _scalar_list(o.equipments, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_UsagePoint(o, level=0):
+    """UsagePoint"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"european_article_number_ean": ' + _str(o.european_article_number_ean))
+    return _object(items, level)
+
+
+def dump_Substation(o, level=0):
+    """Substation"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    items.append('"equipments": ' + _scalar_list(o.equipments, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_SubGeographicalRegion(o, level=0):
+    """SubGeographicalRegion"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"lines": ' + _scalar_list(o.lines, level + 1, _str))
+    items.append('"substations": ' + _scalar_list(o.substations, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_Line(o, level=0):
+    """Line"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    items.append('"equipments": ' + _scalar_list(o.equipments, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_GeographicalRegion(o, level=0):
+    """GeographicalRegion"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"regions": ' + _scalar_list(o.regions, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_PowerTransformer(o, level=0):
+    """PowerTransformer"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    items.append('"power_transformer_end": ' + _list(o.power_transformer_end, level + 1, dump_PowerTransformerEnd))
+    return _object(items, level)
+
+
+def dump_PowerTransformerEnd(o, level=0):
+    """PowerTransformerEnd"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"terminal": ' + _str(o.terminal))
+    return _object(items, level)
+
+
+def dump_Conductor(o, level=0):
+    """Conductor"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_ACLineSegment(o, level=0):
+    """ACLineSegment"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_Analog(o, level=0):
+    """Analog"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.measurement_type
+    if v is not None:
+        items.append('"measurement_type": ' + _str(v))
+    items.append('"unit_multiplier": ' + _str(o.unit_multiplier))
+    items.append('"unit_symbol": ' + _str(o.unit_symbol))
+    v = o.positive_flow_in
+    if v is not None:
+        items.append('"positive_flow_in": ' + _bool(v))
+    items.append('"analog_values": ' + _list(o.analog_values, level + 1, dump_AnalogValue))
+    return _object(items, level)
+
+
+def dump_ActivePowerLimit(o, level=0):
+    """ActivePowerLimit"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"operational_limit_type": ' + dump_OperationalLimitType(o.operational_limit_type, level + 1))
+    items.append('"value": ' + dump_ActivePower(o.value, level + 1))
+    return _object(items, level)
+
+
+def dump_RegisteredResource(o, level=0):
+    """RegisteredResource"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    items.append('"market_participant": ' + _str(o.market_participant))
+    return _object(items, level)
+
+
+def dump_RegisteredLoad(o, level=0):
+    """RegisteredLoad"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    items.append('"market_participant": ' + _str(o.market_participant))
+    return _object(items, level)
+
+
+def dump_MktConnectivityNode(o, level=0):
+    """MktConnectivityNode"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"registered_resource": ' + _scalar_list(o.registered_resource, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_Organisation(o, level=0):
+    """Organisation"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    return _object(items, level)
+
+
+def dump_MarketParticipant(o, level=0):
+    """MarketParticipant"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"market_role": ' + _scalar_list(o.market_role, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_OrganisationRole(o, level=0):
+    """OrganisationRole"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    return _object(items, level)
+
+
+def dump_MarketRole(o, level=0):
+    """MarketRole"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"type": ' + _str(o.type))
+    return _object(items, level)
+
+
+def dump_EnergyConsumer(o, level=0):
+    """EnergyConsumer"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    v = o.location
+    if v is not None:
+        items.append('"location": ' + dump_Location(v, level + 1))
+    v = o.operational_limit_set
+    if v is not None:
+        items.append('"operational_limit_set": ' + _list(v, level + 1, dump_OperationalLimitSet))
+    v = o.usage_points
+    if v is not None:
+        items.append('"usage_points": ' + _scalar_list(v, level + 1, _str))
+    return _object(items, level)
+
+
+def dump_IOPoint(o, level=0):
+    """IOPoint"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    return _object(items, level)
+
+
+def dump_MeasurementValue(o, level=0):
+    """MeasurementValue"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"time_stamp": ' + _datetime(o.time_stamp))
+    return _object(items, level)
+
+
+def dump_AnalogValue(o, level=0):
+    """AnalogValue"""
+    items = []
+    v = o.description
+    if v is not None:
+        items.append('"description": ' + _str(v))
+    items.append('"m_rid": ' + _str(o.m_rid))
+    items.append('"time_stamp": ' + _datetime(o.time_stamp))
+    items.append('"value": ' + _float(o.value))
+    return _object(items, level)
+
+
+DUMPERS = {'ForecastDataSet': dump_ForecastDataSet,
+           'Name': dump_Name,
+           'NameType': dump_NameType,
+           'NameTypeAuthority': dump_NameTypeAuthority,
+           'IdentifiedObject': dump_IdentifiedObject,
+           'ActivePower': dump_ActivePower,
+           'TopologicalNode': dump_TopologicalNode,
+           'ConnectivityNode': dump_ConnectivityNode,
+           'TransformerEnd': dump_TransformerEnd,
+           'OperationalLimitSet': dump_OperationalLimitSet,
+           'ACDCTerminal': dump_ACDCTerminal,
+           'Terminal': dump_Terminal,
+           'Measurement': dump_Measurement,
+           'PowerSystemResource': dump_PowerSystemResource,
+           'ConnectivityNodeContainer': dump_ConnectivityNodeContainer,
+           'Equipment': dump_Equipment,
+           'ConductingEquipment': dump_ConductingEquipment,
+           'EnergyConnection': dump_EnergyConnection,
+           'Location': dump_Location,
+           'StreetAddress': dump_StreetAddress,
+           'StreetDetail': dump_StreetDetail,
+           'TownDetail': dump_TownDetail,
+           'CoordinateSystem': dump_CoordinateSystem,
+           'PositionPoint': dump_PositionPoint,
+           'OperationalLimit': dump_OperationalLimit,
+           'OperationalLimitType': dump_OperationalLimitType,
+           'EquipmentContainer': dump_EquipmentContainer,
+           'UsagePoint': dump_UsagePoint,
+           'Substation': dump_Substation,
+           'SubGeographicalRegion': dump_SubGeographicalRegion,
+           'Line': dump_Line,
+           'GeographicalRegion': dump_GeographicalRegion,
+           'PowerTransformer': dump_PowerTransformer,
+           'PowerTransformerEnd': dump_PowerTransformerEnd,
+           'Conductor': dump_Conductor,
+           'ACLineSegment': dump_ACLineSegment,
+           'Analog': dump_Analog,
+           'ActivePowerLimit': dump_ActivePowerLimit,
+           'RegisteredResource': dump_RegisteredResource,
+           'RegisteredLoad': dump_RegisteredLoad,
+           'MktConnectivityNode': dump_MktConnectivityNode,
+           'Organisation': dump_Organisation,
+           'MarketParticipant': dump_MarketParticipant,
+           'OrganisationRole': dump_OrganisationRole,
+           'MarketRole': dump_MarketRole,
+           'EnergyConsumer': dump_EnergyConsumer,
+           'IOPoint': dump_IOPoint,
+           'MeasurementValue': dump_MeasurementValue,
+           'AnalogValue': dump_AnalogValue}
+
+
+def dumps(o):
+    """JSON document of model instance `o`."""
+    return DUMPERS[type(o).__name__](o, 0)
@@ -4,12 +4,24 @@ from datetime import date
 from uuid import uuid4
 from yaml import safe_load, dump, CSafeDumper as SafeDumper
 from json import dumps
+from json.encoder import encode_basestring_ascii
+from io import StringIO
+from threading import Lock, local
 
 from .models import dp_netbewust_laden as nbl
+from .models.dp_netbewust_laden_json import dumps as dump_json
+from .jsonstream import iter_dataset
+from .store import EntityStore, section_dumper, section_model
+from .timeseries import AnalogValues, SeriesAnalog
 
 import logging
 log = logging.getLogger(__name__)
 
+# Locks of ConcurrentNetbewustLaden, picked by the hash of a name
+STRIPES = 64
+# Entities a thread collects before moving them into the dataset
+FLUSH_ENTITIES = 1024
+
 
 class IndentDumper(SafeDumper):
     def increase_indent(self, flow=False, indentless=False):
@@ -17,13 +29,22 @@ class IndentDumper(SafeDumper):
 
 
 class NetbewustLaden:
-    def __init__(self, region, only_coord):
+    def __init__(self, region, only_coord, store=None):
         # Only provide limited location information
         self._only_coord = only_coord
+        # Optional EntityStore that spills finished entities to disk
+        self._store = store
         # Cache dictionaries to speed up lookups
         self._power_transformers = {}
         self._substations = {}
         self._topological_nodes = {}
+        # Transformer name -> load Series of timeseries.py
+        self._loads = {}
+        # Analog mRID -> AnalogValues of a load Series, serialized in place
+        # of the empty analog_values of the model
+        self._series = {}
+        if store is not None:
+            store.views['analogs'] = self._with_series
         # Set up DataSet
         data = {'identifier': str(uuid4()),
                 'conforms_to': 'http://data.netbeheernederland.nl/dp-nbl-forecast',
@@ -66,12 +87,136 @@ class NetbewustLaden:
         log.info('Creating JSON output')
         # return dump(self._fc.dict(exclude_none=True), Dumper=IndentDumper,
         #             sort_keys=False, allow_unicode=True)
-        return dumps(self._fc.dict(exclude_none=True), indent=2, default=str)
+        if self._store is not None or self._series:
+            out = StringIO()
+            self.write(out)
+            return out.getvalue()
+        # Generated serializer, same output as
+        # dumps(self._fc.model_dump(exclude_none=True), indent=2, default=str)
+        return dump_json(self._fc)
+
+    def write(self, out):
+        """Stream the ForecastDataSet as JSON to `out`.
+
+        Sections kept in the EntityStore are streamed from disk, all other
+        sections are serialized from memory.  Same output as __str__.
+        """
+        log.info('Writing JSON output')
+        out.write('{')
+        sep = '\n  '
+        for name in nbl.ForecastDataSet.model_fields:
+            value = getattr(self._fc, name)
+            out.write(f'{sep}"{name}": ')
+            sep = ',\n  '
+            if not isinstance(value, list):
+                out.write(encode_basestring_ascii(value))
+                continue
+            out.write('[')
+            if self._store is not None and name in self._store:
+                first = self._store.write_items(name, out)
+            else:
+                first = True
+                dump = section_dumper(name)
+                if name == 'analogs':
+                    value = map(self._with_series, value)
+                for entity in value:
+                    out.write('\n    ' if first else ',\n    ')
+                    out.write(dump(entity, 2))
+                    first = False
+            out.write(']' if first else '\n  ]')
+        out.write('\n}')
+
+    def fields(self):
+        """(name, value) of every ForecastDataSet field, in the order of
+        iter_dataset.  Sections kept in the EntityStore are iterated from
+        it."""
+        for name in nbl.ForecastDataSet.model_fields:
+            if self._store is not None and name in self._store:
+                yield name, self._store.items(name)
+            elif name == 'analogs':
+                yield name, map(self._with_series, self._fc.analogs)
+            else:
+                yield name, getattr(self._fc, name)
+
+    def _with_series(self, analog):
+        """`analog`, as a SeriesAnalog if it has a load Series."""
+        values = self._series.get(analog.m_rid)
+        return analog if values is None else SeriesAnalog(analog, values)
+
+    def set_loads(self, loads):
+        """Use the load Series of a transformer name as the AnalogValues of
+        the Analog of its assets, instead of the single value of the asset
+        row."""
+        self._loads = loads
+
+    @classmethod
+    def load(cls, f, only_coord, store=None):
+        """Rebuild the builder from a ForecastDataSet JSON document, so new
+        charge points and assets can be appended to it.
+
+        The document is read section by section.  Substations, power
+        transformers, topological nodes, regions and the shared entities
+        are parsed into models and indexed again; the items of the
+        sections kept in the EntityStore are copied as JSON text.  The
+        release date is set to today.
+        """
+        if store is None:
+            # Only used to hold the copied items, never spills models
+            store = EntityStore(float('inf'))
+        builder = cls(None, only_coord, store)
+        builder._fc.geographical_regions.clear()
+        builder._fc.sub_geographical_regions.clear()
+        indexes = {'substations': builder._substations,
+                   'power_transformers': builder._power_transformers,
+                   'topological_nodes': builder._topological_nodes}
+        for name, value in iter_dataset(f):
+            if name not in nbl.ForecastDataSet.model_fields:
+                raise ValueError(f'Unknown ForecastDataSet field "{name}"')
+            if not hasattr(value, '__next__'):
+                if name != 'release_date':
+                    setattr(builder._fc, name, value)
+                continue
+            log.info(f'Loading {name}')
+            if name in store:
+                for _, text in value:
+                    store.append_text(name, text)
+                continue
+            model = section_model(name)
+            index = indexes.get(name)
+            for item, _ in value:
+                entity = model.model_validate(item)
+                getattr(builder._fc, name).append(entity)
+                if index is not None:
+                    index[entity.description] = entity
+        if not builder._fc.sub_geographical_regions:
+            raise ValueError('No SubGeographicalRegion in ForecastDataSet')
+        return builder
+
+    def eans(self):
+        """Iterate over the EANs of the UsagePoints, such as those of a
+        loaded ForecastDataSet."""
+        for usage_point in (self._store.items('usage_points')
+                            if self._store is not None and
+                            'usage_points' in self._store
+                            else self._fc.usage_points):
+            if isinstance(usage_point, dict):
+                yield usage_point.get('european_article_number_ean')
+            else:
+                yield usage_point.european_article_number_ean
+
+    def asset_transformers(self):
+        """Iterate over the names of the PowerTransformers that have an
+        asset.  An asset adds a second PowerTransformerEnd to the one
+        every PowerTransformer starts with."""
+        for ce_name, pt in self._power_transformers.items():
+            if len(pt.power_transformer_end) > 1:
+                yield ce_name
 
     def charge_points(self, s_name, ce_name, ean, mp_name, mp_role,
                       postal_code, number, town_name, town_section, province,
-                      crs_urn, x_pos, y_pos):
-        """Process a single charge point."""
+                      crs_urn, x_pos, y_pos, description=None):
+        """Process a single charge point.  `description` is set on its
+        EnergyConsumer."""
         log.debug(f'Processing charge point: "{ean}"')
         # SubGeographicalRegion -> Substation
         substation = self._substation(self._fc.sub_geographical_regions[0],
@@ -85,13 +230,15 @@ class NetbewustLaden:
         # TopologicalNode -> Terminal
         terminal = nbl.Terminal(m_rid=str(uuid4()))
         topological_node.terminal.append(terminal.m_rid)
-        self._fc.terminals.append(terminal)
+        self._add('terminals', terminal)
         # Terminal -> UsagePoint
         usage_point = self._usage_point(terminal, ean, postal_code,
                                         number, town_name, town_section,
-                                        province, crs_urn, x_pos, y_pos)
+                                        province, crs_urn, x_pos, y_pos,
+                                        description)
         # Terminal -> RegisteredLoad
         self._registered_load(terminal, ce_name, mp_name, mp_role)
+        self._check()
 
     def assets(self, s_name, ce_name, psr_type, postal_code, street_name,
                number, code, town_name, town_section, province, crs_urn, x_pos,
@@ -101,31 +248,51 @@ class NetbewustLaden:
         substation = self._substation(self._fc.sub_geographical_regions[0],
                                       s_name)
         # Substation -> Location
-        if substation.location is None:
-            substation.location = self._location(postal_code, number,
-                                                 town_name, town_section,
-                                                 province, crs_urn, x_pos,
-                                                 y_pos)
+        self._substation_location(substation, postal_code, number,
+                                  town_name, town_section, province, crs_urn,
+                                  x_pos, y_pos)
         # Substation -> PowerTransformer
         pt = self._power_transformer(substation, ce_name)
         # PowerTransformer -> PowerTransformerEnd
         terminal = self._power_transformer_end(pt)
         terminal.measurements = []
         # PowerTransformerEnd -> Analog
-        self._analog(terminal, load)
+        self._analog(terminal, load, self._loads.get(ce_name))
         # PowerTransformerEnd -> OperationalLimitSet
         ols = nbl.OperationalLimitSet(m_rid=str(uuid4()),
                                       operational_limit_value=[])
         terminal.operational_limit_set = [ols.m_rid]
-        self._fc.operational_limit_sets.append(ols)
+        self._add('operational_limit_sets', ols)
         # OperationalLimitSet -> ActivePowerLimit (Capacity)
         apl = self._active_power_limit(ol_01[0], ol_01[3], ol_01[2], ol_01[1])
         ols.operational_limit_value.append(apl.m_rid)
-        self._fc.active_power_limits.append(apl)
+        self._add('active_power_limits', apl)
         # OperationalLimitSet -> ActivePowerLimit (NBL Limit)
         apl = self._active_power_limit(ol_02[0], ol_02[3], ol_02[2], ol_02[1])
         ols.operational_limit_value.append(apl.m_rid)
-        self._fc.active_power_limits.append(apl)
+        self._add('active_power_limits', apl)
+        self._check()
+
+    def _add(self, section, entity):
+        """Add an entity to a ForecastDataSet section."""
+        if self._store is not None and section in self._store:
+            self._store.append(section, entity)
+        else:
+            getattr(self._fc, section).append(entity)
+
+    def _check(self):
+        """Called after each charge point or asset."""
+        if self._store is not None:
+            self._store.check()
+
+    def _shared(self, section, name, create):
+        """Entity of `section` with description `name`, added from
+        `create()` if there is none yet."""
+        entity = self._instance_exists(name, getattr(self._fc, section))
+        if entity is None:
+            entity = create()
+            self._add(section, entity)
+        return entity
 
     def _instance_exists(self, name, container):
         return next((i for i in container if i.description == name), None)
@@ -152,16 +319,23 @@ class NetbewustLaden:
         return(nbl.ActivePowerLimit(m_rid=str(uuid4()), value=ap,
                                     operational_limit_type=olt))
 
-    def _analog(self, terminal, load):
-        """cim:Analog"""
-        analog_value = nbl.AnalogValue(m_rid=str(uuid4()), value=load[4],
-                                       time_stamp=load[5])
+    def _analog(self, terminal, load, series=None):
+        """cim:Analog, with the AnalogValues of a load Series if given."""
+        if series is None:
+            analog_values = [nbl.AnalogValue(m_rid=str(uuid4()),
+                                             value=load[4],
+                                             time_stamp=load[5])]
+        else:
+            analog_values = []
         analog = nbl.Analog(description=load[0], m_rid=str(uuid4()),
                             positive_flow_in=True, unit_multiplier=load[2],
                             unit_symbol=load[3], measurement_type=load[1],
-                            analog_values=[analog_value])
+                            analog_values=analog_values)
+        if series is not None:
+            # Keeps the arrays instead of a model per value
+            self._series[analog.m_rid] = AnalogValues(series, analog.m_rid)
         terminal.measurements.append(analog.m_rid)
-        self._fc.analogs.append(analog)
+        self._add('analogs', analog)
         return analog
 
     def _substation(self, sub_geo_region, s_name):
@@ -173,7 +347,7 @@ class NetbewustLaden:
             substation = nbl.Substation(m_rid=str(uuid4()), description=s_name,
                                         equipments=[])
             sub_geo_region.substations.append(substation.m_rid)
-            self._fc.substations.append(substation)
+            self._add('substations', substation)
             self._substations[s_name] = substation
         return substation
 
@@ -184,7 +358,7 @@ class NetbewustLaden:
         power_transformer.power_transformer_end.append(pte)
         # PowerTransformerEnd -> Terminal
         terminal = nbl.Terminal(m_rid=pte.terminal)
-        self._fc.terminals.append(terminal)
+        self._add('terminals', terminal)
         return terminal
 
     def _street_address(self, postal_code, number, town_name, town_section,
@@ -205,19 +379,22 @@ class NetbewustLaden:
         """cim:Location"""
         street_address = self._street_address(postal_code, number, town_name,
                                               town_section, province)
-        coordinate_system = self._instance_exists(crs_urn,
-                                                  self._fc.coordinate_systems)
-        if coordinate_system is None:
-            coordinate_system = nbl.CoordinateSystem(description=crs_urn,
-                                                     m_rid=str(uuid4()),
-                                                     crs_urn=crs_urn)
-            self._fc.coordinate_systems.append(coordinate_system)
+        coordinate_system = self._shared(
+            'coordinate_systems', crs_urn,
+            lambda: nbl.CoordinateSystem(description=crs_urn,
+                                         m_rid=str(uuid4()), crs_urn=crs_urn))
         position_point = nbl.PositionPoint(x_position=x_pos, y_position=y_pos)
         location = nbl.Location(m_rid=str(uuid4()), main_address=street_address,
                                 coordinate_system=coordinate_system.m_rid,
                                 position_points=[position_point])
         return location
 
+    def _substation_location(self, substation, *args):
+        """Location of `substation` from the `_location` arguments of its
+        first asset."""
+        if substation.location is None:
+            substation.location = self._location(*args)
+
     def _power_transformer(self, substation, ce_name):
         """cim:PowerTransformer"""
         pt = self._power_transformer_exists(ce_name)
@@ -227,7 +404,7 @@ class NetbewustLaden:
             pt = nbl.PowerTransformer(description=ce_name, m_rid=str(uuid4()),
                                       power_transformer_end=[])
             substation.equipments.append(pt.m_rid)
-            self._fc.power_transformers.append(pt)
+            self._add('power_transformers', pt)
             self._power_transformers[ce_name] = pt
             # PowerTransformerEnd
             terminal = self._power_transformer_end(pt)
@@ -236,12 +413,13 @@ class NetbewustLaden:
                                                    m_rid=str(uuid4()),
                                                    terminal=[])
             terminal.topological_node = topological_node.m_rid
-            self._fc.topological_nodes.append(topological_node)
+            self._add('topological_nodes', topological_node)
             self._topological_nodes[ce_name] = topological_node
         return pt
 
     def _usage_point(self, terminal, ean, postal_code, number, town_name,
-                     town_section, province, crs_urn, x_pos, y_pos):
+                     town_section, province, crs_urn, x_pos, y_pos,
+                     description=None):
         """cim:UsagePoint"""
         # Terminal -> EnergyConsumer
         location = self._location(postal_code, number, town_name,
@@ -249,13 +427,14 @@ class NetbewustLaden:
                                   y_pos)
         energy_consumer = nbl.EnergyConsumer(location=location,
                                              usage_points=[str(uuid4())],
-                                             m_rid=str(uuid4()))
+                                             m_rid=str(uuid4()),
+                                             description=description)
         terminal.conducting_equipment = energy_consumer.m_rid
-        self._fc.energy_consumers.append(energy_consumer)
+        self._add('energy_consumers', energy_consumer)
         # EnergyConsumer -> UsagePoint
         usage_point = nbl.UsagePoint(m_rid=energy_consumer.usage_points[0],
                                      european_article_number_ean=ean)
-        self._fc.usage_points.append(usage_point)
+        self._add('usage_points', usage_point)
         return usage_point
 
     def _registered_load(self, terminal, ce_name, mp_name, mp_role):
@@ -264,22 +443,131 @@ class NetbewustLaden:
         mkt_c_node = nbl.MktConnectivityNode(m_rid=str(uuid4()),
                                              registered_resource=[])
         terminal.connectivity_node = mkt_c_node.m_rid
-        self._fc.mkt_connectivity_nodes.append(mkt_c_node)
+        self._add('mkt_connectivity_nodes', mkt_c_node)
         # MarketRole
-        market_role = self._instance_exists(mp_role, self._fc.market_roles)
-        if market_role is None:
-            market_role = nbl.MarketRole(m_rid=str(uuid4()), description=mp_role,
-                                         type=mp_role)
-            self._fc.market_roles.append(market_role)
+        market_role = self._shared(
+            'market_roles', mp_role,
+            lambda: nbl.MarketRole(m_rid=str(uuid4()), description=mp_role,
+                                   type=mp_role))
         # MarketParticipant
-        mp = self._instance_exists(mp_name, self._fc.market_participants)
-        if mp is None:
-            mp = nbl.MarketParticipant(description=mp_name, m_rid=str(uuid4()),
-                                       market_role=[market_role.m_rid])
-            self._fc.market_participants.append(mp)
+        mp = self._shared(
+            'market_participants', mp_name,
+            lambda: nbl.MarketParticipant(description=mp_name,
+                                          m_rid=str(uuid4()),
+                                          market_role=[market_role.m_rid]))
         # MktConnectivityNode -> RegisteredLoad
         registered_load = nbl.RegisteredLoad(m_rid=str(uuid4()),
                                              market_participant=mp.m_rid)
         mkt_c_node.registered_resource.append(registered_load.m_rid)
-        self._fc.registered_loads.append(registered_load)
+        self._add('registered_loads', registered_load)
         return registered_load
+
+
+class ConcurrentNetbewustLaden(NetbewustLaden):
+    """NetbewustLaden that can be fed charge points and assets from
+    several threads at once.
+
+    Substations, power transformers and shared entities such as
+    coordinate systems and market participants are looked up without a
+    lock and created under one of `stripes` locks picked by their name, so
+    threads only wait for each other on the same names.  New entities are
+    collected in a buffer per thread and moved into the dataset, or the
+    EntityStore, under a single lock once FLUSH_ENTITIES have been
+    collected.  The order of the entities follows the order of the moves.
+
+    Call `flush` when all producers are done; `write`, `fields` and
+    `str()` flush too.
+    """
+    def __init__(self, region, only_coord, store=None, stripes=STRIPES):
+        super().__init__(region, only_coord, store)
+        self._locks = [Lock() for _ in range(stripes)]
+        self._flush_lock = Lock()
+        self._local = local()
+        # Buffers of (section, entity) of all threads
+        self._buffers = []
+        # (section, description) -> entity created through _shared
+        self._shared_entities = {}
+
+    def _lock(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = []
+            with self._flush_lock:
+                self._buffers.append(buffer)
+        return buffer
+
+    def _add(self, section, entity):
+        self._buffer().append((section, entity))
+
+    def _move(self, buffer):
+        """Add the entities of `buffer` to the dataset.  Needs the flush
+        lock."""
+        add = super()._add
+        for section, entity in buffer:
+            add(section, entity)
+        buffer.clear()
+
+    def _check(self):
+        buffer = self._buffer()
+        if len(buffer) >= FLUSH_ENTITIES:
+            with self._flush_lock:
+                self._move(buffer)
+                super()._check()
+
+    def flush(self):
+        """Move the entities collected by all threads into the dataset."""
+        with self._flush_lock:
+            for buffer in self._buffers:
+                self._move(buffer)
+            super()._check()
+
+    def _shared(self, section, name, create):
+        key = (section, name)
+        entity = self._shared_entities.get(key)
+        if entity is None:
+            with self._lock(key):
+                entity = self._shared_entities.get(key)
+                if entity is None:
+                    # Finds the entities of a loaded dataset
+                    entity = super()._shared(section, name, create)
+                    self._shared_entities[key] = entity
+        return entity
+
+    def _substation(self, sub_geo_region, s_name):
+        substation = self._substations.get(s_name)
+        if substation is None:
+            with self._lock(s_name):
+                substation = super()._substation(sub_geo_region, s_name)
+        return substation
+
+    def _power_transformer(self, substation, ce_name):
+        pt = self._power_transformers.get(ce_name)
+        # The TopologicalNode is indexed after the PowerTransformer
+        if pt is None or ce_name not in self._topological_nodes:
+            with self._lock(ce_name):
+                pt = super()._power_transformer(substation, ce_name)
+        return pt
+
+    def _substation_location(self, substation, *args):
+        if substation.location is None:
+            # Built outside the lock, _location takes the locks of the
+            # shared entities
+            location = self._location(*args)
+            with self._lock(substation.description):
+                if substation.location is None:
+                    substation.location = location
+
+    def __str__(self):
+        self.flush()
+        return super().__str__()
+
+    def write(self, out):
+        self.flush()
+        super().write(out)
+
+    def fields(self):
+        self.flush()
+        yield from super().fields()
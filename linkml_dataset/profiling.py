@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Sampling profiler for a command line run.
+
+A SIGPROF interval timer samples the Python stacks of all threads every
+`interval` seconds of CPU time.  Threads waiting on a condition, for a
+thread or in a pool for work, such as the idle build workers of `serve`,
+use no CPU time and are left out.  tracemalloc runs alongside; the growth of
+traced memory since the previous sample is attributed to the stack of the
+main thread, an estimate of where memory is allocated and kept.
+
+`write_collapsed` writes the samples in the collapsed-stack format of
+flamegraph.pl and speedscope, one `frame;frame;... count` line per
+distinct stack, root first.  `write_summary` writes a table of CPU time
+and memory per method of the builders and CGMES classes and per
+category: pydantic validation, pydantic schema building and JSON
+serialization.
+"""
+
+from collections import Counter
+from time import perf_counter, process_time
+import os
+import signal
+import sys
+import threading
+import tracemalloc
+
+INTERVAL = 0.002
+
+# (module, class) whose methods get a row in the summary
+CLASSES = (('linkml_dataset.netbewust_laden', 'NetbewustLaden'),
+           ('linkml_dataset.cgmes_forecast', 'CGMESForecast'),
+           ('linkml_dataset.cgmes', 'CGMES'),
+           ('linkml_dataset.topology', 'Topology'))
+
+VALIDATION = {'__init__', 'model_validate', 'model_validate_json',
+              'model_validate_strings', 'model_construct', '__setattr__'}
+SERIALIZATION = {'model_dump', 'model_dump_json'}
+
+
+def _frame_name(code):
+    return (f'{code.co_qualname} '
+            f'({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+
+
+def _methods():
+    """Code object -> summary label of the methods of CLASSES, for the
+    modules the run imported."""
+    labels = {}
+    for module, name in CLASSES:
+        cls = getattr(sys.modules.get(module), name, None)
+        if cls is None:
+            continue
+        for attr, value in vars(cls).items():
+            if isinstance(value, (classmethod, staticmethod)):
+                value = value.__func__
+            elif isinstance(value, property):
+                value = value.fget
+            code = getattr(value, '__code__', None)
+            if code is not None:
+                labels[code] = f'{name}.{attr}'
+    return labels
+
+
+def _idle_codes():
+    """Code objects of the functions a waiting thread is blocked in: lock
+    and queue waits go through Condition.wait, thread pool workers wait in
+    _worker, event loops in their selector."""
+    import concurrent.futures.thread
+    import selectors
+    functions = [threading.Condition.wait, concurrent.futures.thread._worker,
+                 getattr(threading.Thread, '_wait_for_tstate_lock', None)]
+    functions += [cls.select for cls in vars(selectors).values()
+                  if isinstance(cls, type) and
+                  issubclass(cls, selectors.BaseSelector) and
+                  'select' in vars(cls)]
+    return {f.__code__ for f in functions if f is not None}
+
+
+class _Categories:
+    """Summary category of a code object, if any."""
+    def __init__(self):
+        pydantic = sys.modules.get('pydantic')
+        self._pydantic = (os.path.dirname(pydantic.__file__) + os.sep
+                          if pydantic is not None else None)
+        self._cache = {}
+
+    def __call__(self, code):
+        category = self._cache.get(code, False)
+        if category is False:
+            category = self._cache[code] = self._category(code)
+        return category
+
+    def _category(self, code):
+        filename = code.co_filename
+        if filename.endswith('_json.py') and os.sep + 'models' + os.sep in \
+                filename:
+            return 'JSON serialization'
+        if filename.endswith(os.path.join('json', 'encoder.py')):
+            return 'JSON serialization'
+        if self._pydantic is None or not filename.startswith(self._pydantic):
+            return None
+        if os.sep + '_internal' + os.sep in filename:
+            return 'pydantic schema building'
+        if os.path.basename(filename) == 'main.py':
+            if code.co_name in VALIDATION:
+                return 'pydantic validation'
+            if code.co_name in SERIALIZATION:
+                return 'JSON serialization'
+            if code.co_name == 'model_rebuild':
+                return 'pydantic schema building'
+        return None
+
+
+class Profiler:
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        # Stack of code objects, root first -> samples / bytes
+        self.stacks = Counter()
+        self.allocated = Counter()
+        self.samples = 0
+        # Samples left out of waiting threads
+        self.idle = 0
+        self.peak = 0
+        self.wall = self.cpu = 0.0
+        self._traced = 0
+        self._main = threading.main_thread().ident
+        self._idle = _idle_codes()
+
+    def start(self):
+        if not hasattr(signal, 'setitimer'):
+            raise RuntimeError('Profiling needs signal.setitimer')
+        tracemalloc.start()
+        self._wall = perf_counter()
+        self._cpu = process_time()
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        self.wall = perf_counter() - self._wall
+        self.cpu = process_time() - self._cpu
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    @staticmethod
+    def _stack(frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _sample(self, signum, frame):
+        traced = tracemalloc.get_traced_memory()[0]
+        growth = max(0, traced - self._traced)
+        self._traced = traced
+        stack = self._stack(frame)
+        self.stacks[stack] += 1
+        self.allocated[stack] += growth
+        self.samples += 1
+        for ident, other in sys._current_frames().items():
+            if ident == self._main:
+                continue
+            if other.f_code in self._idle:
+                self.idle += 1
+                continue
+            self.stacks[self._stack(other)] += 1
+            self.samples += 1
+
+    def write_collapsed(self, out):
+        for stack, n in sorted(self.stacks.items(),
+                               key=lambda item: -item[1]):
+            out.write(';'.join(map(_frame_name, stack)))
+            out.write(f' {n}\n')
+
+    def summary(self):
+        """Rows of (label, total samples, self samples, bytes), sorted by
+        total samples."""
+        methods = _methods()
+        category = _Categories()
+        total, own, allocated = Counter(), Counter(), Counter()
+        for stack in self.stacks.keys() | self.allocated.keys():
+            n = self.stacks[stack]
+            labels = set()
+            for code in stack:
+                for label in (methods.get(code), category(code)):
+                    if label is not None:
+                        labels.add(label)
+            for label in labels:
+                total[label] += n
+                allocated[label] += self.allocated[stack]
+            if stack:
+                top = stack[-1]
+                for label in {methods.get(top), category(top)} - {None}:
+                    own[label] += n
+        return sorted(((label, total[label], own[label], allocated[label])
+                       for label in total.keys() | allocated.keys()),
+                      key=lambda row: (-row[1], -row[3], row[0]))
+
+    def write_summary(self, out):
+        """Write the summary table.  Times are the share of samples times
+        the CPU time of the run, since signals are only handled between
+        bytecodes and fewer arrive than the interval implies."""
+        samples = max(self.samples, 1)
+        seconds = self.cpu / samples
+        out.write(f'{self.samples} samples every {self.interval * 1000:g} ms '
+                  f'of CPU time; {self.cpu:.3f} s CPU, {self.wall:.3f} s '
+                  f'wall, peak traced memory {self.peak / (1 << 20):.1f} '
+                  f'MiB; {self.idle} samples of waiting threads left out'
+                  f'\n\n')
+        out.write(f'{"":<40} {"total s":>9} {"total %":>8} {"self s":>9} '
+                  f'{"self %":>8} {"memory MiB":>11}\n')
+        for label, n, n_own, size in self.summary():
+            out.write(f'{label:<40} {n * seconds:9.3f} '
+                      f'{100 * n / samples:8.1f} '
+                      f'{n_own * seconds:9.3f} '
+                      f'{100 * n_own / samples:8.1f} '
+                      f'{size / (1 << 20):11.1f}\n')
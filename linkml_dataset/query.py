@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from time import perf_counter
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Query:
+    """Typed path pattern over a CGMES model.
+
+    `chain` alternates class and predicate local names, starting and ending
+    with a class.  A predicate prefixed with '^' is followed from object to
+    subject, e.g. ('Terminal', '^OperationalLimitSet.Terminal',
+    'OperationalLimitSet').  `where` maps a class name or chain position to
+    {predicate: value}; a value matches when it is equal, contained in a
+    set, or accepted by a callable.
+
+    Candidate sets come from the type index; the query starts at the most
+    selective position and extends the path in both directions with hash
+    joins on the predicate index.  Iterating yields one tuple of resource
+    IRIs per match, lazily.  `rows` and `elapsed` describe the last run.
+    """
+    def __init__(self, cgmes, *chain, where=None):
+        if len(chain) % 2 != 1:
+            raise ValueError('Query chain must start and end with a class')
+        self.cgmes = cgmes
+        self.classes = chain[0::2]
+        self.predicates = chain[1::2]
+        self.where = where or {}
+        self.rows = 0
+        self.elapsed = None
+
+    def __iter__(self):
+        start = perf_counter()
+        self.rows = 0
+        candidates = [self._candidates(i) for i in range(len(self.classes))]
+        first = min(range(len(candidates)), key=lambda i: len(candidates[i]))
+        order = (list(range(first + 1, len(self.classes))) +
+                 list(range(first - 1, -1, -1)))
+        steps = [self._step(i, first, candidates) for i in order]
+        terms = self.cgmes.terms
+        row = [None] * len(self.classes)
+        try:
+            for node in candidates[first]:
+                row[first] = node
+                for match in self._extend(row, steps, 0):
+                    self.rows += 1
+                    yield tuple(str(terms[n]) for n in match)
+        finally:
+            self.elapsed = perf_counter() - start
+            log.info(f'Query {" ".join(self.classes)}: {self.rows} rows in '
+                     f'{self.elapsed:.3f}s (started at {self.classes[first]})')
+
+    def _extend(self, row, steps, depth):
+        if depth == len(steps):
+            yield row
+            return
+        position, source, index, allowed = steps[depth]
+        for node in index.get(row[source], ()):
+            if node in allowed:
+                row[position] = node
+                yield from self._extend(row, steps, depth + 1)
+
+    def _step(self, position, first, candidates):
+        """(position, bound neighbour, hash index, candidates) to bind
+        `position` from the neighbour towards `first`."""
+        if position > first:
+            source, predicate = position - 1, self.predicates[position - 1]
+            inverse = predicate.startswith('^')
+        else:
+            source, predicate = position + 1, self.predicates[position]
+            inverse = not predicate.startswith('^')
+        index = self.cgmes.adjacency(predicate.lstrip('^'), inverse)
+        return position, source, index, candidates[position]
+
+    def _candidates(self, position):
+        name = self.classes[position]
+        nodes = self.cgmes.instances(name)
+        filters = dict(self.where.get(name, {}))
+        filters.update(self.where.get(position, {}))
+        for predicate, expected in filters.items():
+            values = self.cgmes.values(predicate)
+            if callable(expected):
+                match = expected
+            elif isinstance(expected, (set, frozenset, list, tuple)):
+                match = set(str(e) for e in expected).__contains__
+            else:
+                match = str(expected).__eq__
+            nodes = set(n for n in nodes if n in values and match(values[n]))
+        return nodes
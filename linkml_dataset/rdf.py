@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""Streaming RDF export of a ForecastDataSet as N-Triples or JSON-LD.
+
+Entities are written one at a time, without building a graph.  For every
+model class a template of (field, predicate, kind) is derived once from
+the pydantic model: entities are identified by `urn:uuid:<mRID>` IRIs,
+mRID reference fields become links to those IRIs, nested objects are
+linked nodes (blank nodes when they have no mRID), enums become CIM enum
+IRIs and other values typed literals.  Predicates are named after the
+class declaring the field, the CIM way: `cim:IdentifiedObject.mRID`,
+`cim:Terminal.TopologicalNode`.
+
+Entities may be model instances or dicts as decoded from the JSON output.
+"""
+
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from json import dumps
+from typing import NamedTuple, get_args, get_origin
+
+from pydantic import BaseModel
+
+from .codegen import _unwrap_optional
+from .models import dp_netbewust_laden as nbl
+from .store import section_model
+from .timeseries import AnalogValues
+from .verify import REFERENCES
+
+CIM = 'http://iec.ch/TC57/CIM100#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+DCAT = 'http://www.w3.org/ns/dcat#'
+DCT = 'http://purl.org/dc/terms/'
+RDF_TYPE = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
+
+CONTEXT = {'cim': CIM, 'xsd': XSD, 'dcat': DCAT, 'dct': DCT}
+
+# CIM names that do not follow from camel casing the field name
+NAMES = {'m_rid': 'mRID',
+         'european_article_number_ean': 'europeanArticleNumberEAN'}
+
+# ForecastDataSet field -> (DCAT/DC Terms property, kind)
+DATASET = {'identifier': (DCT + 'identifier', 'literal'),
+           'conforms_to': (DCT + 'conformsTo', 'iri'),
+           'contact_point': (DCAT + 'contactPoint', 'literal'),
+           'release_date': (DCT + 'issued', 'date'),
+           'version': (DCAT + 'version', 'literal')}
+
+ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n',
+                         '\r': '\\r'})
+# Multivalued field values, AnalogValues of a load series included
+LISTS = (list, AnalogValues)
+
+
+class Field(NamedTuple):
+    name: str
+    # Compact CIM property, e.g. 'Terminal.TopologicalNode'
+    prop: str
+    # 'ref', 'object', 'enum' or an XSD datatype
+    kind: str
+    # Model class of 'object' fields, enum class name of 'enum' fields
+    target: object
+
+
+def _camel(name, upper):
+    name = NAMES.get(name) or ''.join(w.title() if i else w for i, w in
+                                      enumerate(name.split('_')))
+    return name[:1].upper() + name[1:] if upper else name
+
+
+def _domain(cls, name):
+    """Most general model class that declares field `name`."""
+    for base in reversed(cls.__mro__):
+        if (isinstance(base, type) and issubclass(base, BaseModel) and
+                base.__module__ == nbl.__name__ and
+                name in base.model_fields):
+            return base.__name__
+    return cls.__name__
+
+
+def _datatype(annotation):
+    if issubclass(annotation, bool):
+        return 'boolean'
+    if issubclass(annotation, int):
+        return 'integer'
+    if issubclass(annotation, float):
+        return 'float'
+    if issubclass(annotation, datetime):
+        return 'dateTime'
+    if issubclass(annotation, date):
+        return 'date'
+    return 'string'
+
+
+@lru_cache(maxsize=None)
+def template(cls):
+    """Fields of model class `cls` with their CIM property and kind."""
+    cls.model_rebuild()
+    fields = []
+    for name, info in cls.model_fields.items():
+        annotation, _ = _unwrap_optional(info.annotation)
+        if get_origin(annotation) in (list, tuple, set):
+            annotation, = get_args(annotation)
+            annotation, _ = _unwrap_optional(annotation)
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            kind, target = 'object', annotation
+        elif name in REFERENCES:
+            kind, target = 'ref', None
+        elif isinstance(annotation, type) and issubclass(annotation, Enum):
+            kind, target = 'enum', annotation.__name__
+        else:
+            kind, target = _datatype(annotation), None
+        upper = kind in ('object', 'ref')
+        prop = f'{_domain(cls, name)}.{_camel(name, upper)}'
+        fields.append(Field(name, prop, kind, target))
+    return tuple(fields)
+
+
+def _values(obj):
+    return obj if isinstance(obj, dict) else obj.__dict__
+
+
+def _lexical(value, kind):
+    """Lexical form of a literal of XSD datatype `kind`."""
+    if kind == 'boolean':
+        return 'true' if value else 'false'
+    if kind == 'float':
+        value = float(value)
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), -float('inf')):
+            return 'INF' if value > 0 else '-INF'
+        return float.__repr__(value)
+    if kind in ('dateTime', 'date'):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        # str(datetime) as written in the JSON output
+        return str(value).replace(' ', 'T', 1)
+    return str(value)
+
+
+class NTriples:
+    """N-Triples writer."""
+    def __init__(self, out):
+        self._out = out
+        self._blank = 0
+
+    def start(self):
+        pass
+
+    def end(self):
+        pass
+
+    def dataset(self, scalars):
+        s = f'<urn:uuid:{scalars["identifier"]}>'
+        lines = [f'{s} {RDF_TYPE} <{DCAT}Dataset> .\n']
+        for name, value in scalars.items():
+            prop, kind = DATASET.get(name, (None, None))
+            if prop is None:
+                continue
+            if kind == 'iri':
+                o = f'<{value}>'
+            elif kind == 'date':
+                o = f'"{value}"^^<{XSD}date>'
+            else:
+                o = f'"{str(value).translate(ESCAPES)}"'
+            lines.append(f'{s} <{prop}> {o} .\n')
+        self._out.write(''.join(lines))
+
+    def entity(self, cls, obj):
+        lines = []
+        self._node(cls, obj, lines)
+        self._out.write(''.join(lines))
+
+    def _node(self, cls, obj, lines):
+        values = _values(obj)
+        mrid = values.get('m_rid')
+        if mrid is not None:
+            s = f'<urn:uuid:{mrid}>'
+        else:
+            self._blank += 1
+            s = f'_:b{self._blank}'
+        lines.append(f'{s} {RDF_TYPE} <{CIM}{cls.__name__}> .\n')
+        for field in template(cls):
+            value = values.get(field.name)
+            if value is None:
+                continue
+            p = f'<{CIM}{field.prop}>'
+            kind = field.kind
+            for v in (value if isinstance(value, LISTS) else (value,)):
+                if kind == 'ref':
+                    o = f'<urn:uuid:{v}>'
+                elif kind == 'object':
+                    o = self._node(field.target, v, lines)
+                elif kind == 'enum':
+                    o = f'<{CIM}{field.target}.{getattr(v, "value", v)}>'
+                elif kind == 'string':
+                    o = f'"{str(v).translate(ESCAPES)}"'
+                else:
+                    o = f'"{_lexical(v, kind)}"^^<{XSD}{kind}>'
+                lines.append(f'{s} {p} {o} .\n')
+        return s
+
+
+class JSONLD:
+    """JSON-LD writer: one document with a @context and a @graph that is
+    written one node object per line."""
+    def __init__(self, out):
+        self._out = out
+        self._sep = '\n'
+
+    def start(self):
+        self._out.write(f'{{"@context": {dumps(CONTEXT)},\n"@graph": [')
+
+    def end(self):
+        self._out.write('\n]}\n')
+
+    def _write(self, node):
+        self._out.write(self._sep)
+        self._out.write(dumps(node))
+        self._sep = ',\n'
+
+    def dataset(self, scalars):
+        node = {'@id': f'urn:uuid:{scalars["identifier"]}',
+                '@type': 'dcat:Dataset'}
+        for name, value in scalars.items():
+            prop, kind = DATASET.get(name, (None, None))
+            if prop is None:
+                continue
+            if kind == 'iri':
+                value = {'@id': value}
+            elif kind == 'date':
+                value = {'@value': value, '@type': 'xsd:date'}
+            node[prop] = value
+        self._write(node)
+
+    def entity(self, cls, obj):
+        self._write(self._node(cls, obj))
+
+    def _node(self, cls, obj):
+        values = _values(obj)
+        node = {}
+        mrid = values.get('m_rid')
+        if mrid is not None:
+            node['@id'] = f'urn:uuid:{mrid}'
+        node['@type'] = f'cim:{cls.__name__}'
+        for field in template(cls):
+            value = values.get(field.name)
+            if value is None:
+                continue
+            kind = field.kind
+            objects = []
+            for v in (value if isinstance(value, LISTS) else (value,)):
+                if kind == 'ref':
+                    objects.append({'@id': f'urn:uuid:{v}'})
+                elif kind == 'object':
+                    objects.append(self._node(field.target, v))
+                elif kind == 'enum':
+                    objects.append({'@id': f'cim:{field.target}.'
+                                           f'{getattr(v, "value", v)}'})
+                elif kind == 'string':
+                    objects.append(str(v))
+                else:
+                    objects.append({'@value': _lexical(v, kind),
+                                    '@type': f'xsd:{kind}'})
+            node[f'cim:{field.prop}'] = (objects if isinstance(value, LISTS)
+                                         else objects[0])
+        return node
+
+
+def write_rdf(out, fields, fmt='nt'):
+    """Write the ForecastDataSet given as (name, value) fields to `out`,
+    lists as iterables of entities."""
+    writer = {'nt': NTriples, 'jsonld': JSONLD}[fmt](out)
+    writer.start()
+    scalars = {}
+    for name, value in fields:
+        if isinstance(value, str):
+            scalars[name] = value
+            continue
+        if scalars is not None:
+            writer.dataset(scalars)
+            scalars = None
+        cls = section_model(name)
+        for entity in value:
+            writer.entity(cls, entity)
+    if scalars:
+        writer.dataset(scalars)
+    writer.end()
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""Column mapping of the NBL Forecast CSV files.
+
+`charge_point_args(row)` and `asset_args(row)` turn a DictReader row into
+the positional arguments of `NetbewustLaden.charge_points` and
+`NetbewustLaden.assets`.  Both raise ValueError for rows that cannot be
+processed.
+
+`read_rows` iterates over the arguments of every row of a CSV file.  With
+a `RowCache` the cleaned rows are stored in a columnar file keyed by the
+contents of the CSV file, and later runs read that instead of the CSV.
+With `mapped` a CSV file without quotes is read through a memory map,
+and only the columns used by the mapping are decoded.
+"""
+
+from array import array
+from codecs import lookup
+from csv import DictReader, reader
+from json import dumps, loads
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from tempfile import TemporaryFile
+from threading import get_ident
+import os
+import shutil
+
+from .cache import FileCache
+
+import logging
+log = logging.getLogger(__name__)
+
+# Bump when the column mapping below changes, so cached rows are rebuilt
+MAPPING_VERSION = 1
+# Indexes of the CRS URN and the x and y position in the argument tuples
+POSITION = (10, 11, 12)
+# Rows decoded at a time from a cached file
+BLOCK_ROWS = 1 << 12
+# Bytes of a memory-mapped CSV file split into lines at a time
+BLOCK_BYTES = 1 << 20
+# Encodings in which a newline, delimiter or quote is a single ASCII byte
+ASCII_ENCODINGS = {'ascii', 'utf-8', 'latin-1', 'iso8859-15', 'cp1252'}
+
+
+def charge_point_args(row):
+    return (row['1_Substation.Name'],
+            row['2_ConductingEquipment.Name'],
+            row['100_MarketEvaluationPoint.EAN'].strip("'"),
+            row['110_MarketParticipant.Name'],
+            # row['111_MarketRole.Name'],
+            'Charge Point Operator',
+            row['120_StreetAddress.Postalcode'],
+            row['122_StreetDetail.Number'].strip(' ELP'),
+            row['123_TownDetail.Name'],
+            row['124_TownDetail.Section'],
+            row['125_TownDetail.StateOrProvince'],
+            row['126_CoordinateSystem.Name'],
+            row['127_PositionPoint.Xposition'].strip("'"),
+            row['128_PositionPoint.Yposition'].strip("'"))
+
+
+def asset_args(row):
+    return (row['1_Substation.Name'],
+            row['2_ConductingEquipment.Name'],
+            row['3_MktPSRType.PsrType'],
+            row['10_StreetAddress.Postalcode'],
+            row['11_StreetDetail.Name'],
+            row['12_StreetDetail.Number'],
+            row['13_StreetDetail.Code'],
+            row['14_TownDetail.Name'],
+            row['15_TownDetail.Section'],
+            row['16_TownDetail.StateOrProvince'],
+            row['17_CoordinateSystem.Name'],
+            row['18_PositionPoint.Xposition'].strip("'"),
+            row['19_PositionPoint.Yposition'].strip("'"),
+            (row['30_Analog.Name'],
+             row['31_Analog.MeasurementType'],
+             row['32_Analog.UnitMultiplier'],
+             row['33_Analog.UnitSymbol'],
+             float(row['34_AnalogValue.Value']),
+             row['35_AnalogValue.Timestamp']),
+            (row['40_OperationalLimitSet.Name'],
+             row['41_ActivePowerLimit.UnitMultiplier'],
+             row['42_ActivePowerLimit.UnitSymbol'],
+             float(row['43_ActivePowerLimit.Value'])),
+            (row['50_OperationalLimitSet.Name'],
+             row['51_ActivePowerLimit.UnitMultiplier'],
+             row['52_ActivePowerLimit.UnitSymbol'],
+             float(row['53_ActivePowerLimit.Value'])))
+
+
+def load_args(row):
+    return (row['2_ConductingEquipment.Name'],
+            row['35_AnalogValue.Timestamp'],
+            float(row['34_AnalogValue.Value']))
+
+
+ARGS = {'charge_points': charge_point_args, 'assets': asset_args}
+
+
+def _shape(args):
+    """Nesting of an argument tuple: None for a value, a tuple of shapes
+    for a nested tuple."""
+    return tuple(_shape(a) if isinstance(a, tuple) else None for a in args)
+
+
+def _flatten(args):
+    for a in args:
+        if isinstance(a, tuple):
+            yield from _flatten(a)
+        else:
+            yield a
+
+
+def _nester(shape):
+    """Function turning a flat tuple of values into nested tuples."""
+    if all(s is None for s in shape):
+        return tuple
+    parts = []
+    pos = 0
+    for s in shape:
+        if s is None:
+            parts.append(pos)
+            pos += 1
+        else:
+            size = len(list(_flatten_shape(s)))
+            parts.append((_nester(s), pos, pos + size))
+            pos += size
+    return lambda values: tuple(
+        values[p] if isinstance(p, int) else p[0](values[p[1]:p[2]])
+        for p in parts)
+
+
+def _flatten_shape(shape):
+    for s in shape:
+        if s is None:
+            yield s
+        else:
+            yield from _flatten_shape(s)
+
+
+class StringTable:
+    """Sequence of strings stored as one UTF-8 blob plus offsets, decoded
+    when accessed."""
+    def __init__(self, offsets, blob, base=0):
+        self._offsets = offsets
+        self._blob = blob
+        self._base = base
+        self._strings = [None] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __getitem__(self, i):
+        s = self._strings[i]
+        if s is None:
+            base = self._base
+            s = self._strings[i] = str(
+                self._blob[base + self._offsets[i]:base + self._offsets[i + 1]],
+                'utf-8')
+        return s
+
+
+class _Columns:
+    """Columns of cleaned rows being written to temporary files."""
+    FLUSH = 1 << 16
+
+    def __init__(self, directory):
+        self._directory = directory
+        self.rows = 0
+        self.kinds = None
+        self.shape = None
+        self.valid = array('B')
+        self._buffers = None
+        self._files = None
+        self._valid_file = TemporaryFile(dir=directory)
+        self._blob = TemporaryFile(dir=directory)
+        self.offsets = array('Q', [0])
+        self._ids = {}
+
+    def _start(self, args):
+        self.shape = _shape(args)
+        values = list(_flatten(args))
+        self.kinds = ''.join('d' if isinstance(v, float) else 'I'
+                             for v in values)
+        self._buffers = [array(kind) for kind in self.kinds]
+        self._files = [TemporaryFile(dir=self._directory)
+                       for _ in self.kinds]
+        # Rows before the first valid row, flushed or not
+        flushed = self.rows - len(self.valid)
+        for kind, buf, f in zip(self.kinds, self._buffers, self._files):
+            (array(kind, [0]) * flushed).tofile(f)
+            buf.extend([0] * len(self.valid))
+
+    def _string(self, value):
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self._ids)
+            data = value.encode('utf-8')
+            self._blob.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+        return i
+
+    def append(self, args):
+        if args is not None and self.kinds is None:
+            self._start(args)
+        self.rows += 1
+        self.valid.append(args is not None)
+        if self._buffers is not None:
+            if args is None:
+                for buf in self._buffers:
+                    buf.append(0)
+            else:
+                for buf, kind, value in zip(self._buffers, self.kinds,
+                                            _flatten(args)):
+                    buf.append(value if kind == 'd' else self._string(value))
+        if len(self.valid) >= self.FLUSH:
+            self.flush()
+
+    def flush(self):
+        self.valid.tofile(self._valid_file)
+        del self.valid[:]
+        if self._buffers is not None:
+            for buf, f in zip(self._buffers, self._files):
+                buf.tofile(f)
+                del buf[:]
+
+    def write(self, out):
+        """Write the columns in the order of the cache file: doubles,
+        string ids, then the validity bytes and the blob."""
+        self.flush()
+        for kind in 'dI':
+            for k, f in zip(self.kinds or '', self._files or ()):
+                if k == kind:
+                    f.seek(0)
+                    shutil.copyfileobj(f, out)
+        for f in (self._valid_file, self._blob):
+            f.seek(0)
+            shutil.copyfileobj(f, out)
+
+    def close(self):
+        for f in (self._files or []) + [self._valid_file, self._blob]:
+            f.close()
+
+
+class RowCache(FileCache):
+    """Cache of the cleaned rows of CSV files, one columnar file per CSV
+    file, mapping and delimiter.
+
+    Layout: header, JSON metadata with the column kinds and the nesting of
+    the argument tuples, padding to 8 bytes, string offsets (uint64),
+    double columns, string id columns (uint32), a validity byte per row
+    and the UTF-8 string blob.  Strings are stored once per file.
+    Loading memory-maps the file, so later runs do not decode any CSV.
+    """
+    suffix = '.rows'
+    FORMAT_VERSION = 1
+    HEADER = Struct('<4sIQQI')
+    MAGIC = b'LDRC'
+
+    def __init__(self, directory, max_size):
+        super().__init__(directory, max_size,
+                         f'{self.FORMAT_VERSION}:{MAPPING_VERSION}')
+
+    def load(self, path):
+        """Returns (valid, columns, kinds, strings, shape) or None."""
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        magic, version, n_rows, n_strings, meta_size = \
+            self.HEADER.unpack_from(mm)
+        if magic != self.MAGIC or version != self.FORMAT_VERSION:
+            return None
+        log.info(f'Loading cached rows "{path}"')
+        self.touch(path)
+        pos = self.HEADER.size
+        meta = loads(bytes(mm[pos:pos + meta_size]))
+        pos += meta_size
+        pos += -pos % 8
+        view = memoryview(mm)
+        offsets = view[pos:pos + 8 * (n_strings + 1)].cast('Q')
+        pos += 8 * (n_strings + 1)
+        kinds = meta['kinds']
+        columns = [None] * len(kinds)
+        for kind, size in (('d', 8), ('I', 4)):
+            for i, k in enumerate(kinds):
+                if k == kind:
+                    columns[i] = view[pos:pos + size * n_rows].cast(kind)
+                    pos += size * n_rows
+        valid = view[pos:pos + n_rows]
+        pos += n_rows
+        strings = StringTable(offsets, mm, pos)
+        return valid, columns, kinds, strings, _from_json(meta['shape'])
+
+    def store(self, path, columns):
+        if path is None:
+            return
+        log.info(f'Storing parsed rows in cache "{path}"')
+        meta = dumps({'kinds': columns.kinds or '',
+                      'shape': columns.shape}).encode()
+        tmp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION,
+                                     columns.rows, len(columns.offsets) - 1,
+                                     len(meta)))
+            f.write(meta)
+            f.write(bytes(-(self.HEADER.size + len(meta)) % 8))
+            f.write(columns.offsets)
+            columns.write(f)
+        self.commit(tmp_path, path)
+
+
+def _from_json(shape):
+    return tuple(None if s is None else _from_json(s) for s in shape)
+
+
+class _Recorder(dict):
+    def __missing__(self, key):
+        self[key] = '0'
+        return '0'
+
+
+def _used_columns(args):
+    """Names of the columns read by the column mapping `args`."""
+    row = _Recorder()
+    args(row)
+    return list(row)
+
+
+def _map(f, delimiter):
+    """Memory map of the regular file `f` and its encoding, if its rows
+    can be split on bytes: read from the start, an ASCII compatible
+    encoding, a single character delimiter, no quotes and LF or CRLF
+    line ends.  Returns (map, encoding, line end) or None."""
+    try:
+        if f.tell() != 0 or not os.fstat(f.fileno()).st_size:
+            return None
+        encoding = lookup(f.encoding).name
+    except (AttributeError, OSError, ValueError, LookupError):
+        return None
+    if encoding not in ASCII_ENCODINGS or len(delimiter) != 1:
+        return None
+    mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+    sep = _line_end(mm)
+    if sep is None:
+        mm.close()
+        return None
+    return mm, encoding, sep
+
+
+def _line_end(mm):
+    """b'\\n' or b'\\r\\n' if all lines of `mm` end with it and there are
+    no quotes, None otherwise."""
+    if mm.find(b'"') != -1:
+        return None
+    if mm.find(b'\r') == -1:
+        return b'\n'
+    cr = lf = crlf = 0
+    start = 0
+    while start < len(mm):
+        end = start + 16 * BLOCK_BYTES
+        # Keep CRLF pairs in one block
+        end += mm[end - 1:end] == b'\r'
+        block = mm[start:end]
+        cr += block.count(b'\r')
+        lf += block.count(b'\n')
+        crlf += block.count(b'\r\n')
+        start = end
+    return b'\r\n' if cr == lf == crlf else None
+
+
+def _parse_mapped(mm, encoding, sep, args, delimiter):
+    """Like `_parse`, splitting the lines of the memory map `mm` in blocks
+    and decoding the used columns only.  Rows with too few fields are
+    invalid."""
+    d = delimiter.encode(encoding)
+    end = mm.find(sep)
+    end = len(mm) if end == -1 else end
+    header = next(reader([mm[:end].decode(encoding)], delimiter=delimiter))
+    index = {name: i for i, name in enumerate(header)}
+    # (name, field index) of the used columns
+    used = [(name, index[name]) for name in _used_columns(args)]
+    last = max(i for _, i in used)
+    size = len(mm)
+    start = end + len(sep)
+    try:
+        while start < size:
+            end = mm.find(sep, min(start + BLOCK_BYTES, size))
+            end = size if end == -1 else end
+            for line in mm[start:end].split(sep):
+                if not line:
+                    continue
+                fields = line.split(d, last + 1)
+                if len(fields) <= last:
+                    yield None
+                    continue
+                try:
+                    yield args({name: fields[i].decode(encoding)
+                                for name, i in used})
+                except ValueError:
+                    yield None
+            start = end + len(sep)
+    finally:
+        mm.close()
+
+
+def _mapping(kind, extra=None):
+    """Column mapping of `kind`, with the value of column `extra` appended
+    to the argument tuples if given."""
+    args = ARGS[kind]
+    if extra is None:
+        return args
+    return lambda row: args(row) + (row[extra],)
+
+
+def _parse(f, args, delimiter, mapped=False):
+    mapping = _map(f, delimiter) if mapped else None
+    if mapping is not None:
+        yield from _parse_mapped(*mapping, args, delimiter)
+        return
+    if mapped:
+        log.info(f'Reading "{f.name}" without a memory map')
+    # Short rows have None for the missing columns, only the used ones
+    # make a row invalid
+    used = _used_columns(args)
+    for row in DictReader(f, delimiter=delimiter):
+        if any(row[name] is None for name in used):
+            yield None
+            continue
+        try:
+            yield args(row)
+        except ValueError:
+            yield None
+
+
+def read_rows(f, kind, delimiter=',', cache=None, mapped=False, extra=None):
+    """Iterate over the argument tuples of the rows of CSV file `f` with
+    the `kind` ('charge_points' or 'assets') column mapping.  Yields None
+    for rows that cannot be processed.
+
+    With a RowCache the rows are read from the cache when `f` was read
+    before with the same mapping and delimiter, and stored in it after
+    all rows are read otherwise; rows are not stored if the caller stops
+    early.  With `mapped` the CSV file is read
+    through a memory map if it has no quotes.  With `extra` the value of
+    that column is appended to every argument tuple.
+    """
+    key = f'{kind}:{delimiter}' + (f':{extra}' if extra is not None else '')
+    path = cache.path(f.name, key) if cache else None
+    args = _mapping(kind, extra)
+    cached = cache.load(path) if path else None
+    if cached is None:
+        if path is None:
+            yield from _parse(f, args, delimiter, mapped)
+            return
+        columns = _Columns(cache.directory)
+        try:
+            for row in _parse(f, args, delimiter, mapped):
+                columns.append(row)
+                yield row
+            cache.store(path, columns)
+        finally:
+            columns.close()
+        return
+    valid, columns, kinds, strings, shape = cached
+    if not kinds:
+        # No valid rows
+        yield from (None for _ in range(len(valid)))
+        return
+    nest = _nester(shape)
+    for start in range(0, len(valid), BLOCK_ROWS):
+        end = start + BLOCK_ROWS
+        values = [column[start:end].tolist() if kind == 'd' else
+                  [strings[i] for i in column[start:end].tolist()]
+                  for kind, column in zip(kinds, columns)]
+        for ok, row in zip(valid[start:end], zip(*values)):
+            yield nest(row) if ok else None
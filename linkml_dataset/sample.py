@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Sampled trial runs of netbewust-laden.
+
+A `Sampler` keeps the rows of a fraction of the substations, picked by a
+hash of the substation name, so the charge points and assets of a
+substation are either all in the sample or all left out, in every run.
+All rows are still read, to count them, but only the sampled rows are
+built.
+
+From the sample the entity counts, output size, peak memory and wall
+time of the full run are projected.  Sections are scaled by the ratio of
+all rows to sampled rows of the file whose rows created their entities.
+Sections of entities shared by all substations, such as coordinate
+systems and market participants, are not scaled; their sampled count is
+a lower bound.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from zlib import crc32
+import resource
+import sys
+
+from .batch import _counts
+
+import logging
+log = logging.getLogger(__name__)
+
+UNSCALED = {'coordinate_systems', 'geographical_regions', 'market_roles',
+            'market_participants', 'sub_geographical_regions'}
+# Index of the substation name in the argument tuples
+SUBSTATION = 0
+# ru_maxrss is in bytes on macOS and in KiB elsewhere
+RSS_SCALE = 1 if sys.platform == 'darwin' else 1024
+
+
+def _peak_rss():
+    """Peak resident set size of the process in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_SCALE
+
+
+class _CountingWriter:
+    def __init__(self, out):
+        self._out = out
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+        return self._out.write(text)
+
+
+class Sampler:
+    """Sample of `fraction` of the substations."""
+    def __init__(self, fraction):
+        if not 0 < fraction <= 1:
+            raise ValueError('The sample fraction must be in (0, 1]')
+        self.fraction = fraction
+        self._threshold = fraction * (1 << 32)
+        self._start = perf_counter()
+        self._base_rss = _peak_rss()
+        # Kind -> rows read, rows sampled
+        self.rows = Counter()
+        self.sampled = Counter()
+        self.substations = set()
+        self.sampled_substations = set()
+        # Kind -> section -> entities added by the rows of that kind
+        self._added = {}
+        self._built = 0.0
+        self._written = 0.0
+        self.size = 0
+
+    def keep(self, s_name):
+        return crc32(s_name.encode()) < self._threshold
+
+    def rows_of(self, rows, kind):
+        """Iterate over the sampled rows of argument tuples `rows` of
+        `kind`.  Rows that cannot be processed are left out."""
+        read, sampled = self.rows, self.sampled
+        for args in rows:
+            if args is None:
+                continue
+            read[kind] += 1
+            s_name = args[SUBSTATION]
+            self.substations.add(s_name)
+            if self.keep(s_name):
+                sampled[kind] += 1
+                self.sampled_substations.add(s_name)
+                yield args
+
+    @contextmanager
+    def building(self, nbl, kind):
+        """Count the entities `nbl` adds for the rows of `kind`."""
+        before = _counts(nbl)
+        yield
+        after = _counts(nbl)
+        self._added[kind] = {name: n - before.get(name, 0)
+                             for name, n in after.items()}
+
+    def timed(self, process):
+        """`process`, adding the time spent in it to the build time."""
+        def timed(*args):
+            start = perf_counter()
+            try:
+                return process(*args)
+            finally:
+                self._built += perf_counter() - start
+        return timed
+
+    @contextmanager
+    def writing(self, out):
+        """Writer counting the characters written to `out`."""
+        start = perf_counter()
+        writer = _CountingWriter(out)
+        yield writer
+        self._written += perf_counter() - start
+        self.size += writer.size
+
+    def ratio(self, kind):
+        """All rows to sampled rows of `kind`, None if rows were read but
+        none sampled."""
+        if not self.sampled[kind]:
+            return None if self.rows[kind] else 1.0
+        return self.rows[kind] / self.sampled[kind]
+
+    def projection(self):
+        """Projected entity counts per section and (entities, output
+        characters, peak memory bytes, wall seconds) of the full run."""
+        ratios = {kind: self.ratio(kind) for kind in self._added}
+        ratios = {kind: ratio for kind, ratio in ratios.items()
+                  if ratio is not None}
+        # Overall ratio for the output and build time
+        total = sum(self.rows.values())
+        sampled = sum(self.sampled.values())
+        ratio = total / sampled if sampled else 1.0
+        counts = Counter()
+        built = Counter()
+        for kind, added in self._added.items():
+            for name, n in added.items():
+                built[name] += n
+                if name in UNSCALED:
+                    counts[name] = max(counts[name], built[name])
+                else:
+                    counts[name] += round(n * ratios.get(kind, ratio))
+        entities = sum(counts.values())
+        built_entities = sum(built.values())
+        scale = entities / built_entities if built_entities else ratio
+        wall = perf_counter() - self._start
+        # Reading all rows is not scaled, building and writing are
+        wall += (self._built + self._written) * (scale - 1)
+        memory = self._base_rss + (_peak_rss() - self._base_rss) * scale
+        return counts, (entities, round(self.size * scale), round(memory),
+                        wall)
+
+    def log(self):
+        log.info(f'Sampled {len(self.sampled_substations)} of '
+                 f'{len(self.substations)} substations, '
+                 + ', '.join(f'{self.sampled[kind]} of {n} '
+                             f'{kind.replace("_", " ")}'
+                             for kind, n in self.rows.items()))
+        if not any(self.sampled.values()):
+            log.warning('No rows in the sample, use a larger --sample')
+            return
+        counts, (entities, size, memory, wall) = self.projection()
+        for name, n in sorted(counts.items()):
+            if n:
+                log.info(f'Projected {name}: '
+                         f'{"at least " if name in UNSCALED else ""}{n}')
+        log.info(f'Projected full run: {entities} entities, '
+                 f'{size / (1 << 20):.1f} MB output, '
+                 f'{memory / (1 << 20):.0f} MB peak memory, '
+                 f'{wall:.1f} s')
@@ -0,0 +1,622 @@
+# -*- coding: utf-8 -*-
+"""Local HTTP service that builds datasets in a long-running process.
+
+Starting the command line tool for every build pays for importing rdflib
+and building the pydantic models each time.  The service does that once
+and then runs builds concurrently in a pool of worker threads.  The output
+is streamed back with chunked transfer encoding while it is written; a
+bounded queue per request keeps a slow client from buffering the whole
+dataset in memory.
+
+    POST /netbewust-laden?region=R[&only_coord=1][&format=json|nt|jsonld]
+         [&delimiter=,][&count=N][&mmap=1]
+    POST /cgmes-forecast?region=R[&only_coord=1][&normal_state=1]
+    POST /topology[?edges=bus-branch|connectivity|nodes][&normal_state=1]
+         [&delimiter=,]
+    GET  /metrics
+
+Input files are uploaded as multipart/form-data parts named
+`charge_points` and `assets`, or, for the CGMES endpoints, as the request
+body.  A local file can be given instead with a query parameter of the
+same name, or `cgmes=PATH`.  With `mmap=1` CSV inputs without quotes
+are read through a memory map.  /metrics returns request, status, byte and
+latency counters as JSON; responses the client did not read to the end
+are counted with status `aborted`.
+"""
+
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from io import StringIO
+from json import dumps
+from tempfile import mkstemp
+from time import monotonic
+from urllib.parse import urlsplit, parse_qs
+import asyncio
+import os
+
+import logging
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 << 10
+# Chunks buffered per request before the build waits for the client
+QUEUE_SIZE = 16
+# Latencies kept per route for the percentiles
+SAMPLES = 1024
+MAX_HEADERS = 100
+# Size of the headers of a multipart part
+MAX_PART_HEADERS = 16 << 10
+
+CONTENT_TYPES = {'json': 'application/json',
+                 'nt': 'application/n-triples',
+                 'jsonld': 'application/ld+json'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+def _flag(params, name):
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def _required(params, name):
+    value = params.get(name)
+    if not value:
+        raise HTTPError(400, f'Missing query parameter "{name}"')
+    return value
+
+
+def _boundary(content_type):
+    message = Message()
+    message['Content-Type'] = content_type
+    boundary = message.get_boundary()
+    if not boundary:
+        raise HTTPError(400, 'Missing multipart boundary')
+    return boundary.encode('latin-1')
+
+
+def split_multipart(f, boundary, open_part, chunk_size=CHUNK_SIZE):
+    """Copy the parts of the multipart body in binary file `f`, with
+    `boundary`, to the binary files `open_part(headers)` returns for the
+    header Message of each part, or skip a part if it returns None.  The
+    body is read `chunk_size` bytes at a time, never held whole."""
+    delimiter = b'\r\n--' + boundary
+    # The first delimiter may start the body, without a line end
+    buf = bytearray(b'\r\n')
+    eof = False
+
+    def fill():
+        nonlocal eof
+        block = f.read(chunk_size)
+        if not block:
+            eof = True
+        buf.extend(block)
+
+    out = None
+    try:
+        while True:
+            # Copy the part, or skip the preamble, up to the delimiter
+            i = buf.find(delimiter)
+            while i == -1:
+                if eof:
+                    raise HTTPError(400, 'Incomplete multipart body')
+                # Keep what may be the start of a delimiter
+                n = len(buf) - len(delimiter) + 1
+                if n > 0:
+                    if out is not None:
+                        out.write(buf[:n])
+                    del buf[:n]
+                fill()
+                i = buf.find(delimiter)
+            if out is not None:
+                out.write(buf[:i])
+                out.close()
+                out = None
+            del buf[:i + len(delimiter)]
+            while len(buf) < 2 and not eof:
+                fill()
+            if buf[:2] == b'--':
+                return
+            # The line end of the delimiter line, the headers and a blank
+            # line; a part without headers starts with the blank line
+            i = buf.find(b'\r\n\r\n')
+            while i == -1:
+                if eof or len(buf) > MAX_PART_HEADERS:
+                    raise HTTPError(400, 'Invalid multipart part headers')
+                fill()
+                i = buf.find(b'\r\n\r\n')
+            headers = BytesParser(policy=HTTP).parsebytes(
+                bytes(buf[2:i + 4]) if i else b'\r\n', headersonly=True)
+            del buf[:i + 4]
+            out = open_part(headers)
+    finally:
+        if out is not None:
+            out.close()
+
+
+class ChunkWriter:
+    """Text file interface for a build running in a worker thread.
+
+    Writes are collected into chunks of `chunk_size` bytes that are put on
+    an asyncio queue of the event loop.  Putting blocks while the queue is
+    full, so the build runs no further ahead of the client than the queue.
+    """
+    def __init__(self, loop, queue, chunk_size=CHUNK_SIZE):
+        self._loop = loop
+        self._queue = queue
+        self._chunk_size = chunk_size
+        self._parts = []
+        self._size = 0
+        # Set by the event loop when the client went away
+        self.cancelled = False
+
+    def _put(self, item):
+        if self.cancelled:
+            raise ConnectionAbortedError('Client closed the connection')
+        asyncio.run_coroutine_threadsafe(self._queue.put(item),
+                                         self._loop).result()
+
+    def start(self, content_type):
+        self._put(('start', content_type))
+
+    def write(self, s):
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self._chunk_size:
+            self.flush()
+        return len(s)
+
+    def flush(self):
+        if self._parts:
+            data = ''.join(self._parts).encode()
+            self._parts.clear()
+            self._size = 0
+            self._put(('data', data))
+
+    def close(self):
+        self.flush()
+        self._put(('end', None))
+
+    def fail(self, e):
+        asyncio.run_coroutine_threadsafe(self._queue.put(('error', e)),
+                                         self._loop).result()
+
+
+class Metrics:
+    """Request counters, throughput and latency percentiles per route."""
+    def __init__(self, samples=SAMPLES):
+        self.started = monotonic()
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.in_flight = 0
+        self._samples = samples
+        # route -> recent (time to first byte, total) latencies in seconds
+        self._latencies = {}
+
+    def start(self, route, size):
+        self.requests[route] += 1
+        self.bytes_in += size
+        self.in_flight += 1
+
+    def finish(self, route, status, size, first_byte, total):
+        self.statuses[status] += 1
+        self.bytes_out += size
+        self.in_flight -= 1
+        latencies = self._latencies.get(route)
+        if latencies is None:
+            latencies = self._latencies[route] = deque(maxlen=self._samples)
+        latencies.append((first_byte, total))
+
+    @staticmethod
+    def _percentiles(values):
+        values = sorted(values)
+        n = len(values)
+        result = {f'p{p}': round(values[min(n - 1, n * p // 100)], 6)
+                  for p in (50, 90, 99)}
+        result['max'] = round(values[-1], 6)
+        return result
+
+    def snapshot(self):
+        uptime = monotonic() - self.started
+        latency = {}
+        for route, latencies in self._latencies.items():
+            latency[route] = {
+                'samples': len(latencies),
+                'first_byte': self._percentiles(f for f, _ in latencies),
+                'total': self._percentiles(t for _, t in latencies)}
+        return {'uptime': round(uptime, 3),
+                'in_flight': self.in_flight,
+                'requests': dict(self.requests),
+                'statuses': {str(s): n for s, n in self.statuses.items()},
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'throughput': {
+                    'requests_per_second': round(
+                        sum(self.requests.values()) / uptime, 3),
+                    'bytes_out_per_second': round(self.bytes_out / uptime)},
+                'latency': latency}
+
+
+class Service:
+    """HTTP service running builds in `workers` threads."""
+    # path -> (method name, names of the input files)
+    ROUTES = {'/netbewust-laden': ('_netbewust_laden',
+                                   ('charge_points', 'assets')),
+              '/cgmes-forecast': ('_cgmes_forecast', ('cgmes',)),
+              '/topology': ('_topology', ('cgmes',))}
+
+    def __init__(self, workers=4, cache=None, spill_dir=None,
+                 max_upload=1 << 30, chunk_size=CHUNK_SIZE, row_cache=None):
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='build')
+        self._cache = cache
+        self._row_cache = row_cache
+        self._spill_dir = spill_dir
+        self._max_upload = max_upload
+        self._chunk_size = chunk_size
+        self.metrics = Metrics()
+
+    def warm_up(self):
+        """Import the builders and models and build the pydantic schemas
+        and serializers, so the first request does not pay for it."""
+        log.info('Warming up')
+        import rdflib.plugins.parsers.jsonld  # noqa: F401
+        from pydantic import BaseModel
+        from .netbewust_laden import NetbewustLaden
+        from .rdf import template
+        from .store import section_dumper, section_model
+        from .models import dp_netbewust_laden as nbl
+        from . import cgmes, cgmes_forecast, topology  # noqa: F401
+        for cls in vars(nbl).values():
+            if (isinstance(cls, type) and issubclass(cls, BaseModel) and
+                    cls.__module__ == nbl.__name__):
+                cls.model_rebuild()
+        builder = NetbewustLaden('warm-up', False)
+        for name, value in builder.fields():
+            if isinstance(value, list):
+                template(section_model(name))
+                section_dumper(name)
+        builder.write(StringIO())
+
+    # Builds, run in a worker thread.  Each returns its content type and
+    # a function that writes the output to a text file.
+
+    def _netbewust_laden(self, params, inputs):
+        from .netbewust_laden import NetbewustLaden
+        from .readers import read_rows
+        region = _required(params, 'region')
+        fmt = params.get('format', 'json')
+        if fmt not in CONTENT_TYPES:
+            raise HTTPError(400, f'Unknown format "{fmt}"')
+        delimiter = params.get('delimiter', ',')
+        try:
+            count = int(params['count']) if 'count' in params else None
+        except ValueError:
+            raise HTTPError(400, 'Query parameter "count" is not a number')
+        nbl = NetbewustLaden(region, _flag(params, 'only_coord'))
+        mapped = _flag(params, 'mmap')
+        for kind, process in (('charge_points', nbl.charge_points),
+                              ('assets', nbl.assets)):
+            with open(inputs[kind]) as f:
+                rows = read_rows(f, kind, delimiter, self._row_cache, mapped)
+                try:
+                    for c, args in enumerate(rows, start=1):
+                        if count is not None and c > count:
+                            break
+                        if args is None:
+                            continue
+                        try:
+                            process(*args)
+                        except ValueError:
+                            continue
+                except KeyError as e:
+                    raise HTTPError(400, f'Missing column {e} in {kind}')
+
+        def write(out):
+            if fmt == 'json':
+                nbl.write(out)
+                out.write('\n')
+            else:
+                from .rdf import write_rdf
+                write_rdf(out, nbl.fields(), fmt)
+        return CONTENT_TYPES[fmt], write
+
+    def _cgmes(self, path):
+        from .cgmes import CGMES
+        with open(path, encoding='utf-8') as f:
+            return CGMES(f, self._cache)
+
+    def _cgmes_forecast(self, params, inputs):
+        from .netbewust_laden import NetbewustLaden
+        from .cgmes_forecast import CGMESForecast
+        region = _required(params, 'region')
+        converter = CGMESForecast(self._cgmes(inputs['cgmes']),
+                                  _flag(params, 'normal_state'))
+        nbl = converter.convert(NetbewustLaden(region,
+                                               _flag(params, 'only_coord')))
+
+        def write(out):
+            nbl.write(out)
+            out.write('\n')
+        return CONTENT_TYPES['json'], write
+
+    def _topology(self, params, inputs):
+        from .topology import Topology, EDGES
+        edges = params.get('edges', 'bus-branch')
+        if edges not in EDGES:
+            raise HTTPError(400, f'Unknown edge list "{edges}"')
+        topology = Topology(self._cgmes(inputs['cgmes']),
+                            _flag(params, 'normal_state'))
+
+        def write(out):
+            topology.write_edges(out, edges, params.get('delimiter', ','))
+        return 'text/csv', write
+
+    def _run(self, name, params, inputs, out):
+        try:
+            content_type, write = getattr(self, name)(params, inputs)
+            out.start(content_type)
+            write(out)
+            out.close()
+        except Exception as e:
+            if not isinstance(e, (HTTPError, ConnectionAbortedError)):
+                log.exception(f'Build {name} failed')
+            out.fail(e)
+
+    # Request handling
+
+    def _tempfile(self):
+        fd, path = mkstemp(dir=self._spill_dir)
+        return os.fdopen(fd, 'wb'), path
+
+    @staticmethod
+    def _content_length(headers):
+        value = headers.get('content-length', '').strip()
+        if not value:
+            return 0
+        if not value.isdigit() or not value.isascii():
+            raise HTTPError(400, 'Invalid Content-Length')
+        return int(value)
+
+    async def _read_body(self, reader, headers, length, temp_files):
+        """Write the request body of `length` bytes to a temporary file,
+        returns its path."""
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            raise HTTPError(411)
+        if length > self._max_upload:
+            raise HTTPError(413)
+        if not length:
+            return None
+        f, path = self._tempfile()
+        temp_files.append(path)
+        with f:
+            while length:
+                block = await reader.read(min(length, CHUNK_SIZE))
+                if not block:
+                    raise HTTPError(400, 'Incomplete request body')
+                f.write(block)
+                length -= len(block)
+        return path
+
+    def _inputs(self, names, params, headers, body, temp_files):
+        """Path of every input file, from the query parameters, the parts
+        of a multipart body or the body.  Runs in a worker thread."""
+        inputs = {name: params[name] for name in names if name in params}
+        content_type = headers.get('content-type', '')
+        if body is not None and content_type.startswith('multipart/'):
+            def open_part(part):
+                name = part.get_param('name', header='content-disposition')
+                if name not in names or name in inputs:
+                    return None
+                encoding = part.get('content-transfer-encoding', 'binary')
+                if encoding.strip().lower() not in ('7bit', '8bit',
+                                                    'binary'):
+                    raise HTTPError(400, f'Unsupported Content-Transfer-'
+                                         f'Encoding "{encoding}"')
+                f, path = self._tempfile()
+                temp_files.append(path)
+                inputs[name] = path
+                return f
+            with open(body, 'rb') as f:
+                split_multipart(f, _boundary(content_type), open_part)
+            # The parts are copied, free the disk space of the body
+            os.remove(body)
+            temp_files.remove(body)
+        elif body is not None and len(names) == 1 and names[0] not in inputs:
+            inputs[names[0]] = body
+        for name in names:
+            if name not in inputs:
+                raise HTTPError(400, f'Missing input "{name}"')
+            if not os.path.isfile(inputs[name]):
+                raise HTTPError(400, f'Input "{name}" is not a file')
+        return inputs
+
+    def _build(self, name, names, params, headers, body, temp_files, out):
+        try:
+            inputs = self._inputs(names, params, headers, body, temp_files)
+        except Exception as e:
+            out.fail(e)
+            return
+        self._run(name, params, inputs, out)
+
+    async def _send(self, writer, status, body, content_type,
+                    keep_alive=True):
+        data = body.encode()
+        writer.write(self._head(status, content_type, keep_alive,
+                                length=len(data)) + data)
+        await writer.drain()
+        return len(data)
+
+    @staticmethod
+    def _head(status, content_type, keep_alive, length=None):
+        lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+                 f'Content-Type: {content_type}',
+                 'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        if length is None:
+            lines.append('Transfer-Encoding: chunked')
+        else:
+            lines.append(f'Content-Length: {length}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def _stream(self, writer, queue, out, keep_alive):
+        """Send the output of a build.  Returns (status, bytes sent, time of
+        the first byte).  Raises ConnectionError when the client went
+        away."""
+        kind, value = await queue.get()
+        if kind == 'error':
+            e = value
+            status = e.status if isinstance(e, HTTPError) else 500
+            size = await self._send(writer, status,
+                                    dumps({'error': str(e)}) + '\n',
+                                    'application/json', keep_alive)
+            return status, size, monotonic()
+        writer.write(self._head(200, value, keep_alive))
+        first_byte = monotonic()
+        size = 0
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'data':
+                    writer.write(b'%x\r\n' % len(value) + value + b'\r\n')
+                    size += len(value)
+                    await writer.drain()
+                elif kind == 'end':
+                    writer.write(b'0\r\n\r\n')
+                    await writer.drain()
+                    return 200, size, first_byte
+                else:
+                    # Headers are sent, so the client can only tell from
+                    # the missing last chunk
+                    raise ConnectionAbortedError(f'Build failed: {value}')
+        except ConnectionError:
+            out.cancelled = True
+            while kind not in ('end', 'error'):
+                kind, value = await queue.get()
+            raise
+
+    async def _request(self, reader, writer):
+        """Handle one request.  Returns whether to keep the connection."""
+        line = await reader.readline()
+        if not line:
+            return False
+        start = monotonic()
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            await self._send(writer, 400, 'Bad request\n', 'text/plain',
+                             False)
+            return False
+        headers = {}
+        for _ in range(MAX_HEADERS):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = (version == 'HTTP/1.1' and
+                      headers.get('connection', '').lower() != 'close')
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = url.path if url.path in self.ROUTES or \
+            url.path == '/metrics' else 'other'
+        try:
+            length = self._content_length(headers)
+        except HTTPError as e:
+            await self._send(writer, e.status,
+                             dumps({'error': str(e)}) + '\n',
+                             'application/json', False)
+            return False
+        self.metrics.start(route, length)
+        temp_files = []
+        status, size, first_byte = 500, 0, None
+        try:
+            try:
+                if url.path == '/metrics':
+                    if method != 'GET':
+                        raise HTTPError(405)
+                    body = dumps(self.metrics.snapshot(), indent=2) + '\n'
+                    status = 200
+                    size = await self._send(writer, 200, body,
+                                            'application/json', keep_alive)
+                    return keep_alive
+                if url.path not in self.ROUTES:
+                    raise HTTPError(404)
+                if method != 'POST':
+                    raise HTTPError(405)
+                body = await self._read_body(reader, headers, length,
+                                             temp_files)
+            except HTTPError as e:
+                status = e.status
+                # The body was not read, so the connection cannot be reused
+                size = await self._send(writer, status,
+                                        dumps({'error': str(e)}) + '\n',
+                                        'application/json', False)
+                return False
+            name, names = self.ROUTES[url.path]
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue(QUEUE_SIZE)
+            out = ChunkWriter(loop, queue, self._chunk_size)
+            future = loop.run_in_executor(self._pool, self._build, name,
+                                          names, params, headers, body,
+                                          temp_files, out)
+            try:
+                status, size, first_byte = await self._stream(
+                    writer, queue, out, keep_alive)
+            except ConnectionError:
+                status = 'aborted'
+                raise
+            finally:
+                await future
+            return keep_alive
+        finally:
+            for path in temp_files:
+                os.remove(path)
+            end = monotonic()
+            self.metrics.finish(route, status, size,
+                                (first_byte or end) - start, end - start)
+            log.info(f'{method} {target} {status} {size} '
+                     f'{end - start:.3f}s')
+
+    async def handle(self, reader, writer):
+        """Serve the requests of a connection."""
+        try:
+            while await self._request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            log.warning(f'Connection closed: {e}')
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        await asyncio.get_running_loop().run_in_executor(self._pool,
+                                                         self.warm_up)
+        server = await asyncio.start_server(self.handle, host, port)
+        for sock in server.sockets:
+            log.info('Serving on http://%s:%s' % sock.getsockname()[:2])
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def serve(host='127.0.0.1', port=8080, **kwargs):
+    """Run a Service until interrupted."""
+    service = Service(**kwargs)
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
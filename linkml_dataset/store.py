@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+from functools import lru_cache
+from shutil import copyfileobj
+from sys import getsizeof
+from tempfile import TemporaryFile
+from typing import get_args
+
+from pydantic import BaseModel
+
+from .jsonstream import iter_items
+from .models import dp_netbewust_laden as nbl
+from .models.dp_netbewust_laden_json import DUMPERS
+
+import logging
+log = logging.getLogger(__name__)
+
+# Entities that are no longer modified once the NetbewustLaden call that
+# created them returns.  Substations, power transformers, topological nodes
+# and shared entities are updated later on and always stay in memory.
+SPILLABLE = ('terminals', 'usage_points', 'energy_consumers',
+             'registered_loads', 'mkt_connectivity_nodes', 'analogs',
+             'active_power_limits', 'operational_limit_sets')
+
+# Serialized items are nested at this level in the ForecastDataSet
+ITEM_LEVEL = 2
+ITEM_SEP = ',\n    '
+SAMPLE_EVERY = 64
+
+
+@lru_cache(maxsize=None)
+def section_model(section):
+    """Model class of the items of a ForecastDataSet section."""
+    # Resolves the annotations of the deferred model
+    nbl.ForecastDataSet.model_rebuild()
+    item, = get_args(nbl.ForecastDataSet.model_fields[section].annotation)
+    return item
+
+
+def section_dumper(section):
+    """Generated serializer for the items of a ForecastDataSet section."""
+    return DUMPERS[section_model(section).__name__]
+
+
+def deep_sizeof(obj):
+    """Approximate memory held by a model instance, list or scalar."""
+    size = getsizeof(obj)
+    if isinstance(obj, BaseModel):
+        size += getsizeof(obj.__dict__)
+        size += sum(deep_sizeof(v) for v in obj.__dict__.values())
+    elif isinstance(obj, list):
+        size += sum(deep_sizeof(v) for v in obj)
+    return size
+
+
+class EntityStore:
+    """Finished entities of a ForecastDataSet, spilled to disk on demand.
+
+    Entities are buffered per section.  Once their estimated size exceeds
+    `max_memory` bytes, all buffers are serialized into one append-only
+    segment file per section, already formatted as ForecastDataSet list
+    items, so writing the dataset streams the segment before the items
+    still in memory.
+    """
+    def __init__(self, max_memory, directory=None, sections=SPILLABLE):
+        self.max_memory = max_memory
+        self._directory = directory
+        self._buffers = {section: [] for section in sections}
+        # Section -> function returning the object serialized for an entity
+        self.views = {}
+        self._segments = {}
+        self._counts = dict.fromkeys(sections, 0)
+        self._item_size = dict.fromkeys(sections, 0)
+        self._size = 0
+
+    def __contains__(self, section):
+        return section in self._buffers
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def append(self, section, entity):
+        buffer = self._buffers[section]
+        # Re-estimate the size of an entity every SAMPLE_EVERY appends
+        if self._counts[section] % SAMPLE_EVERY == 0:
+            self._item_size[section] = deep_sizeof(entity)
+        buffer.append(entity)
+        self._counts[section] += 1
+        self._size += self._item_size[section]
+
+    def append_text(self, section, text):
+        """Append an entity that is already serialized as a list item,
+        such as an item read back from a ForecastDataSet document."""
+        if self._buffers[section]:
+            # Keep the order of the section
+            self.spill()
+        segment = self._segment(section)
+        if segment.tell():
+            segment.write(ITEM_SEP)
+        segment.write(text)
+        self._counts[section] += 1
+
+    def count(self, section):
+        return self._counts[section]
+
+    def check(self):
+        """Spill the buffers when the memory budget is exceeded."""
+        if self._size > self.max_memory:
+            self.spill()
+
+    def spill(self):
+        log.info(f'Spilling {sum(map(len, self._buffers.values()))} '
+                 f'entities ({self._size >> 20} MB estimated) to disk')
+        for section, buffer in self._buffers.items():
+            if not buffer:
+                continue
+            segment = self._segment(section)
+            dump = section_dumper(section)
+            if segment.tell():
+                segment.write(ITEM_SEP)
+            segment.write(ITEM_SEP.join([dump(e, ITEM_LEVEL)
+                                         for e in self._view(section, buffer)]))
+            buffer.clear()
+        self._size = 0
+
+    def _segment(self, section):
+        segment = self._segments.get(section)
+        if segment is None:
+            segment = TemporaryFile('w+', encoding='utf-8',
+                                    dir=self._directory,
+                                    prefix=f'{section}-', suffix='.json')
+            self._segments[section] = segment
+        return segment
+
+    def write_items(self, section, out, first=True):
+        """Write the serialized items of `section` to `out`, each preceded
+        by a separator unless it is the `first` item of the list."""
+        segment = self._segments.get(section)
+        if segment is not None and segment.tell():
+            segment.flush()
+            end = segment.tell()
+            segment.seek(0)
+            out.write('\n    ' if first else ITEM_SEP)
+            copyfileobj(segment, out)
+            segment.seek(end)
+            first = False
+        dump = section_dumper(section)
+        for entity in self._view(section, self._buffers[section]):
+            out.write('\n    ' if first else ITEM_SEP)
+            out.write(dump(entity, ITEM_LEVEL))
+            first = False
+        return first
+
+    def items(self, section):
+        """The entities of `section`: the spilled ones decoded from the
+        segment as dicts, followed by the models still in memory."""
+        segment = self._segments.get(section)
+        if segment is not None and segment.tell():
+            segment.flush()
+            end = segment.tell()
+            segment.seek(0)
+            try:
+                for item, _ in iter_items(segment):
+                    yield item
+            finally:
+                segment.seek(end)
+        yield from self._view(section, self._buffers[section])
+
+    def _view(self, section, entities):
+        view = self.views.get(section)
+        return entities if view is None else map(view, entities)
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
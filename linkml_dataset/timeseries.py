@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Load time series per transformer.
+
+A long-format load CSV has a row per transformer and time with columns
+`2_ConductingEquipment.Name`, `35_AnalogValue.Timestamp` and
+`34_AnalogValue.Value`.  The values of a transformer are kept as a
+`Series` of two typed arrays, int64 epoch seconds and float64 values,
+instead of one AnalogValue model per point.  `Series.aggregate` reduces
+a series to the maximum, minimum, mean or a percentile per window.
+
+`AnalogValues` is the sequence serialized as `Analog.analog_values` for
+a series.  It creates the AnalogValues while they are serialized, with
+mRIDs derived from the Analog mRID and the time, so every serialization
+writes the same values.  The Analog model itself keeps an empty list; a
+`SeriesAnalog` with the AnalogValues is serialized in its place.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from csv import DictReader
+from datetime import datetime, timezone
+from math import floor, ceil
+from uuid import UUID, uuid5
+import re
+
+from .readers import load_args
+
+import logging
+log = logging.getLogger(__name__)
+
+DURATION = re.compile(r'^(\d+)([smhd]?)$')
+UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+AGGREGATE = re.compile(r'^(max|min|mean|p(\d+(?:\.\d+)?))$')
+
+
+def duration(text):
+    """Seconds of a duration such as `900`, `15m`, `1h` or `1d`."""
+    match = DURATION.match(text.strip())
+    if match is None or not int(match.group(1)):
+        raise ValueError(f'Invalid duration "{text}"')
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+
+def _percentile(values, p):
+    """Percentile `p` of sorted `values`, interpolated linearly."""
+    k = (len(values) - 1) * p / 100
+    lo, hi = floor(k), ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _reducer(how):
+    match = AGGREGATE.match(how)
+    if match is None:
+        raise ValueError(f'Invalid aggregate "{how}", use max, min, mean '
+                         f'or a percentile such as p95')
+    if how == 'max':
+        return max
+    if how == 'min':
+        return min
+    if how == 'mean':
+        return lambda values: sum(values) / len(values)
+    p = float(match.group(2))
+    if p > 100:
+        raise ValueError(f'Invalid percentile "{how}"')
+    return lambda values: _percentile(sorted(values), p)
+
+
+class Series:
+    """Time series of epoch seconds and values."""
+    def __init__(self, timestamps=None, values=None):
+        self.timestamps = timestamps if timestamps is not None else \
+            array('q')
+        self.values = values if values is not None else array('d')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp, value):
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+
+    def sort(self):
+        """Sort by time, if needed."""
+        ts = self.timestamps
+        if all(ts[i] <= ts[i + 1] for i in range(len(ts) - 1)):
+            return
+        order = sorted(range(len(ts)), key=ts.__getitem__)
+        self.timestamps = array('q', [ts[i] for i in order])
+        self.values = array('d', [self.values[i] for i in order])
+
+    def aggregate(self, window, how='max'):
+        """Series of `how` ('max', 'min', 'mean' or 'p<percentile>') of the
+        values per window of `window` seconds, at the start of each
+        window.  The series must be sorted."""
+        reduce = _reducer(how)
+        ts, values = self.timestamps, self.values
+        result = Series()
+        i = 0
+        while i < len(ts):
+            start = ts[i] - ts[i] % window
+            j = bisect_left(ts, start + window, i)
+            result.append(start, reduce(values[i:j]))
+            i = j
+        return result
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self) + self.timestamps.__sizeof__() +
+                self.values.__sizeof__())
+
+
+class _AnalogValue:
+    """Attributes of an AnalogValue, as read by the serializers."""
+    description = None
+
+    def __init__(self, m_rid, time_stamp, value):
+        self.m_rid = m_rid
+        self.time_stamp = time_stamp
+        self.value = value
+
+
+class AnalogValues(Sequence):
+    """The AnalogValues of an Analog with mRID `m_rid` for a Series."""
+    def __init__(self, series, m_rid):
+        self._series = series
+        self._namespace = UUID(m_rid)
+
+    def __len__(self):
+        return len(self._series)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        timestamp = self._series.timestamps[i]
+        return _AnalogValue(str(uuid5(self._namespace, str(timestamp))),
+                            datetime.fromtimestamp(timestamp, timezone.utc),
+                            self._series.values[i])
+
+    def __iter__(self):
+        namespace = self._namespace
+        for timestamp, value in zip(self._series.timestamps,
+                                    self._series.values):
+            yield _AnalogValue(str(uuid5(namespace, str(timestamp))),
+                               datetime.fromtimestamp(timestamp,
+                                                      timezone.utc),
+                               value)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self._series.__sizeof__()
+
+
+class SeriesAnalog:
+    """Attributes of Analog model `analog` with `analog_values`, as read by
+    the serializers."""
+    def __init__(self, analog, analog_values):
+        self.__dict__.update(analog.__dict__)
+        self.analog_values = analog_values
+
+
+def _epoch(text):
+    time = datetime.fromisoformat(text)
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return int(time.timestamp())
+
+
+def read_loads(f, delimiter=',', window=None, how='max'):
+    """Transformer name -> sorted Series of a long-format load CSV file,
+    aggregated per `window` seconds if given.  Rows that cannot be read
+    are skipped."""
+    if window is not None:
+        _reducer(how)
+    series = {}
+    # Timestamps repeat for every transformer, parse each once
+    epochs = {}
+    skipped = 0
+    for row in DictReader(f, delimiter=delimiter):
+        try:
+            name, time, value = load_args(row)
+            timestamp = epochs.get(time)
+            if timestamp is None:
+                timestamp = epochs[time] = _epoch(time)
+        except ValueError:
+            skipped += 1
+            continue
+        s = series.get(name)
+        if s is None:
+            s = series[name] = Series()
+        s.append(timestamp, value)
+    points = 0
+    for name, s in series.items():
+        s.sort()
+        if window is not None:
+            s = series[name] = s.aggregate(window, how)
+        points += len(s)
+    log.info(f'Read load series of {len(series)} transformers, {points} '
+             f'values' + (f', skipped {skipped} rows' if skipped else ''))
+    return series
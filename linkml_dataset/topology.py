@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from collections import defaultdict
+from csv import writer as csv_writer
+
+import logging
+log = logging.getLogger(__name__)
+
+# Edge list name -> (method, header)
+EDGES = {'connectivity': ('connectivity_edges',
+                          ('equipment', 'connectivity_node', 'terminal')),
+         'bus-branch': ('bus_branch_edges',
+                        ('equipment', 'from_node', 'to_node')),
+         'nodes': ('node_edges',
+                   ('connectivity_node', 'topological_node', 'island',
+                    'substation'))}
+
+SWITCH_TYPES = {'Switch', 'Breaker', 'Disconnector', 'LoadBreakSwitch',
+                'Fuse', 'Jumper', 'GroundDisconnector', 'ProtectedSwitch',
+                'Recloser', 'Sectionaliser', 'DisconnectingCircuitBreaker'}
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with union by size and path halving."""
+    def __init__(self, n):
+        self.parent = array('I', range(n))
+        self.size = array('I', [1]) * n
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return i
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self.parent[j] = i
+        self.size[i] += self.size[j]
+        return i
+
+    def labels(self):
+        """Dense component label (0..k-1) per element, in element order."""
+        roots = {}
+        return array('I', (roots.setdefault(self.find(i), len(roots))
+                           for i in range(len(self.parent))))
+
+
+class Topology:
+    """Instance-level topology of a CGMES model.
+
+    Connectivity nodes and conducting equipment are numbered densely and
+    joined through their terminals in CSR form: `cn_indptr`/`cn_terminals`
+    list the terminals per connectivity node, `eq_indptr`/`eq_terminals`
+    the terminals per equipment.  Connectivity nodes joined by closed
+    switches are collapsed into topological nodes (buses), and buses joined
+    by any closed equipment form islands.
+    """
+    def __init__(self, cgmes, normal_state=False):
+        self.cgmes = cgmes
+        # Terminal -> ConductingEquipment / ConnectivityNode
+        terminal_eq = dict(cgmes.pairs('Terminal.ConductingEquipment'))
+        terminal_cn = dict(cgmes.pairs('Terminal.ConnectivityNode'))
+        self.terminals = array('I', (t for t in terminal_eq
+                                     if t in terminal_cn))
+        self.cns = array('I', sorted(set(terminal_cn.values()) |
+                                     cgmes.instances('ConnectivityNode')))
+        self.equipment = array('I', sorted(set(terminal_eq.values())))
+        cn_index = {cn: i for i, cn in enumerate(self.cns)}
+        eq_index = {eq: i for i, eq in enumerate(self.equipment)}
+        self.terminal_cn = array('I', (cn_index[terminal_cn[t]]
+                                       for t in self.terminals))
+        self.terminal_eq = array('I', (eq_index[terminal_eq[t]]
+                                       for t in self.terminals))
+        self.cn_indptr, self.cn_terminals = self._csr(self.terminal_cn,
+                                                      len(self.cns))
+        self.eq_indptr, self.eq_terminals = self._csr(self.terminal_eq,
+                                                      len(self.equipment))
+        # Switch states
+        types = cgmes._types()
+        switch_types = set(t for t in set(types.values())
+                           if cgmes.local(t) in SWITCH_TYPES)
+        state = 'Switch.normalOpen' if normal_state else 'Switch.open'
+        open_ids = set(s for s, o in cgmes.pairs(state)
+                       if str(cgmes.terms[o]).lower() in ('true', '1'))
+        self.is_switch = array('b', (types.get(eq) in switch_types
+                                     for eq in self.equipment))
+        self.is_open = array('b', (eq in open_ids for eq in self.equipment))
+        # Containment: ConnectivityNode -> container -> Substation
+        self.cn_substation = self._substations(cn_index)
+        self.topological_nodes = self._collapse(switches_only=True)
+        self.islands = self._collapse(switches_only=False)
+        log.info(f'Topology: {len(self.terminals)} terminals, '
+                 f'{len(self.cns)} connectivity nodes, '
+                 f'{len(set(self.topological_nodes))} topological nodes, '
+                 f'{len(set(self.islands))} islands')
+
+    def _csr(self, rows, n):
+        """CSR index over the terminals grouped by `rows`."""
+        indptr = array('Q', [0]) * (n + 1)
+        for r in rows:
+            indptr[r + 1] += 1
+        for i in range(n):
+            indptr[i + 1] += indptr[i]
+        fill = array('Q', indptr[:-1])
+        indices = array('I', [0]) * len(rows)
+        for t, r in enumerate(rows):
+            indices[fill[r]] = t
+            fill[r] += 1
+        return indptr, indices
+
+    def _collapse(self, switches_only):
+        """Label connectivity nodes by the closed equipment joining them."""
+        uf = UnionFind(len(self.cns))
+        indptr, terminals = self.eq_indptr, self.eq_terminals
+        terminal_cn = self.terminal_cn
+        for eq in range(len(self.equipment)):
+            if self.is_open[eq]:
+                continue
+            if switches_only and not self.is_switch[eq]:
+                continue
+            first = None
+            for t in terminals[indptr[eq]:indptr[eq + 1]]:
+                if first is None:
+                    first = terminal_cn[t]
+                else:
+                    uf.union(first, terminal_cn[t])
+        return uf.labels()
+
+    def _substations(self, cn_index):
+        """Substation id per connectivity node, None when not contained."""
+        cgmes = self.cgmes
+        container = dict(cgmes.pairs('ConnectivityNode.ConnectivityNodeContainer'))
+        parent = dict(cgmes.pairs('VoltageLevel.Substation'))
+        parent.update(cgmes.pairs('Bay.VoltageLevel'))
+        substations = cgmes.instances('Substation')
+
+        resolved = {}
+        result = []
+        for cn in self.cns:
+            c = container.get(cn)
+            if c not in resolved:
+                s = c
+                while s is not None and s not in substations:
+                    s = parent.get(s)
+                resolved[c] = s
+            result.append(resolved[c])
+        return result
+
+    def substation_islands(self):
+        """Map each substation id to the set of islands within it.
+
+        Only equipment with all terminals inside the substation joins
+        connectivity nodes, so lines between substations are ignored.
+        """
+        uf = UnionFind(len(self.cns))
+        indptr, terminals = self.eq_indptr, self.eq_terminals
+        terminal_cn, cn_substation = self.terminal_cn, self.cn_substation
+        for eq in range(len(self.equipment)):
+            if self.is_open[eq]:
+                continue
+            cns = [terminal_cn[t] for t in terminals[indptr[eq]:indptr[eq + 1]]]
+            if len(set(cn_substation[cn] for cn in cns)) != 1:
+                continue
+            for cn in cns[1:]:
+                uf.union(cns[0], cn)
+        islands = defaultdict(set)
+        for cn, substation in enumerate(cn_substation):
+            if substation is not None:
+                islands[substation].add(uf.find(cn))
+        return islands
+
+    def connectivity_edges(self):
+        """Yield (equipment, connectivity node, terminal) per terminal."""
+        local = self.cgmes.local
+        for t, terminal in enumerate(self.terminals):
+            yield (local(self.equipment[self.terminal_eq[t]]),
+                   local(self.cns[self.terminal_cn[t]]),
+                   local(terminal))
+
+    def bus_branch_edges(self):
+        """Yield (equipment, from bus, to bus) for closed non-switch equipment.
+
+        Equipment with more than two terminals, such as three-winding
+        transformers, yields an edge per pair of buses.
+        """
+        local, labels = self.cgmes.local, self.topological_nodes
+        indptr, terminals = self.eq_indptr, self.eq_terminals
+        for eq in range(len(self.equipment)):
+            if self.is_switch[eq] or self.is_open[eq]:
+                continue
+            buses = sorted(set(labels[self.terminal_cn[t]]
+                               for t in terminals[indptr[eq]:indptr[eq + 1]]))
+            for i, from_bus in enumerate(buses):
+                for to_bus in buses[i + 1:]:
+                    yield local(self.equipment[eq]), from_bus, to_bus
+
+    def node_edges(self):
+        """Yield (connectivity node, bus, island, substation) per node."""
+        local = self.cgmes.local
+        for cn, node in enumerate(self.cns):
+            substation = self.cn_substation[cn]
+            yield (local(node), self.topological_nodes[cn], self.islands[cn],
+                   local(substation) if substation is not None else '')
+
+    def write_edges(self, out, edges='bus-branch', delimiter=','):
+        """Write edge list `edges` as CSV with a header row."""
+        method, header = EDGES[edges]
+        writer = csv_writer(out, delimiter=delimiter, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(getattr(self, method)())
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""Referential integrity of a ForecastDataSet document.
+
+Entities refer to each other by mRID strings.  The document is streamed
+once; the mRID and section of every entity and every reference are
+written to a temporary SQLite database, so memory stays bounded for tens
+of millions of entities.  Indexed queries then report:
+
+- duplicate: an mRID used by more than one entity
+- dangling: a reference to an mRID that does not exist, or to an entity
+  in a section the field cannot refer to
+- orphan: an entity that nothing refers to
+"""
+
+from collections import Counter
+from json import dumps
+from tempfile import mkstemp
+import os
+import sqlite3
+
+from .jsonstream import iter_dataset
+
+import logging
+log = logging.getLogger(__name__)
+
+BATCH = 10000
+
+# Fields of models/dp_netbewust_laden.py holding mRIDs of other entities,
+# with the ForecastDataSet sections these may refer to.  Fields with the
+# same name refer to the same sections in every class.  Fields with no
+# sections hold mRIDs of entities that are not in a ForecastDataSet; they
+# are not checked.
+REFERENCES = {
+    # Terminal
+    'topological_node': ('topological_nodes',),
+    'connectivity_node': ('mkt_connectivity_nodes',),
+    'conducting_equipment': ('energy_consumers', 'power_transformers',
+                             'ac_line_segments'),
+    'operational_limit_set': ('operational_limit_sets',),
+    'measurements': ('analogs',),
+    # TopologicalNode, TransformerEnd
+    'terminal': ('terminals',),
+    # CGMES ConnectivityNodes of a TopologicalNode
+    'connectivity_nodes': (),
+    # OperationalLimitSet
+    'operational_limit_value': ('active_power_limits',),
+    # Equipment
+    'usage_points': ('usage_points',),
+    # Location
+    'coordinate_system': ('coordinate_systems',),
+    # EquipmentContainer
+    'equipments': ('power_transformers', 'ac_line_segments',
+                   'energy_consumers'),
+    # SubGeographicalRegion
+    'lines': ('lines',),
+    'substations': ('substations',),
+    # GeographicalRegion
+    'regions': ('sub_geographical_regions',),
+    # RegisteredResource
+    'market_participant': ('market_participants',),
+    # MktConnectivityNode
+    'registered_resource': ('registered_loads',),
+    # MarketParticipant
+    'market_role': ('market_roles',),
+}
+
+# Sections of which the entities are not referred to by anything
+ROOTS = ('geographical_regions',)
+
+SCHEMA = '''
+CREATE TABLE section (id INTEGER PRIMARY KEY, name);
+CREATE TABLE field (id INTEGER PRIMARY KEY, name);
+CREATE TABLE allowed (field, section);
+CREATE TABLE entity (mrid, section);
+CREATE TABLE ref (section, mrid, field, target);
+'''
+
+DUPLICATES = '''
+SELECT mrid, group_concat(s.name) FROM entity e
+JOIN section s ON s.id = e.section
+GROUP BY mrid HAVING count(*) > 1 ORDER BY mrid
+'''
+
+DANGLING = '''
+SELECT s.name, r.mrid, f.name, r.target, t.name FROM ref r
+JOIN section s ON s.id = r.section
+JOIN field f ON f.id = r.field
+LEFT JOIN entity e ON e.mrid = r.target
+LEFT JOIN section t ON t.id = e.section
+WHERE e.mrid IS NULL OR NOT EXISTS (
+    SELECT 1 FROM allowed a WHERE a.field = r.field AND a.section = e.section)
+'''
+
+ORPHANS = '''
+SELECT s.name, e.mrid FROM entity e
+JOIN section s ON s.id = e.section
+WHERE s.name NOT IN ({roots})
+AND NOT EXISTS (SELECT 1 FROM ref r WHERE r.target = e.mrid)
+'''.format(roots=', '.join(f"'{r}'" for r in ROOTS))
+
+
+class Verifier:
+    """Referential integrity problems of a ForecastDataSet document."""
+    def __init__(self, f, directory=None, cache_size=64 << 20):
+        fd, self._path = mkstemp(suffix='.sqlite', dir=directory)
+        os.close(fd)
+        self._db = sqlite3.connect(self._path)
+        self._db.execute('PRAGMA journal_mode = OFF')
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute(f'PRAGMA cache_size = -{cache_size >> 10}')
+        self._db.executescript(SCHEMA)
+        self._sections = {}
+        self._fields = {name: i for i, name in
+                        enumerate(n for n, s in REFERENCES.items() if s)}
+        self._db.executemany('INSERT INTO field VALUES (?, ?)',
+                             [(i, n) for n, i in self._fields.items()])
+        self._entities = []
+        self._refs = []
+        self.entities = 0
+        self._load(f)
+        self._db.executemany(
+            'INSERT INTO allowed VALUES (?, ?)',
+            [(self._fields[name], self._section(section))
+             for name, sections in REFERENCES.items()
+             for section in sections])
+        log.info('Indexing')
+        self._db.execute('CREATE INDEX entity_mrid ON entity (mrid)')
+        self._db.execute('CREATE INDEX ref_target ON ref (target)')
+
+    def _section(self, name):
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = len(self._sections)
+            self._db.execute('INSERT INTO section VALUES (?, ?)',
+                             (section, name))
+        return section
+
+    def _load(self, f):
+        for name, value in iter_dataset(f):
+            if not hasattr(value, '__next__'):
+                continue
+            log.info(f'Loading {name}')
+            section = self._section(name)
+            for item, _ in value:
+                mrid = item.get('m_rid')
+                self._entities.append((mrid, section))
+                self._references(section, mrid, item)
+                if len(self._entities) + len(self._refs) >= BATCH:
+                    self._flush()
+        self._flush()
+
+    def _references(self, section, mrid, obj):
+        """Add the references of `obj` and of the objects nested in it."""
+        for key, value in obj.items():
+            field = self._fields.get(key)
+            values = value if isinstance(value, list) else (value,)
+            for v in values:
+                if isinstance(v, dict):
+                    self._references(section, mrid, v)
+                elif field is not None and isinstance(v, str):
+                    self._refs.append((section, mrid, field, v))
+
+    def _flush(self):
+        self.entities += len(self._entities)
+        self._db.executemany('INSERT INTO entity VALUES (?, ?)',
+                             self._entities)
+        self._db.executemany('INSERT INTO ref VALUES (?, ?, ?, ?)', self._refs)
+        self._entities.clear()
+        self._refs.clear()
+
+    def duplicates(self):
+        for mrid, sections in self._db.execute(DUPLICATES):
+            yield {'problem': 'duplicate', 'm_rid': mrid,
+                   'sections': sections.split(',')}
+
+    def dangling(self):
+        for section, mrid, field, target, found in self._db.execute(DANGLING):
+            record = {'problem': 'dangling', 'section': section,
+                      'm_rid': mrid, 'field': field, 'target': target}
+            if found is not None:
+                record['target_section'] = found
+            yield record
+
+    def orphans(self):
+        for section, mrid in self._db.execute(ORPHANS):
+            yield {'problem': 'orphan', 'section': section, 'm_rid': mrid}
+
+    def __iter__(self):
+        yield from self.duplicates()
+        yield from self.dangling()
+        yield from self.orphans()
+
+    def write(self, out):
+        """Write the problems as NDJSON, returns their number per kind."""
+        counts = Counter()
+        for record in self:
+            counts[record['problem']] += 1
+            out.write(dumps(record))
+            out.write('\n')
+        return counts
+
+    def close(self):
+        self._db.close()
+        os.remove(self._path)
+
+
+def verify(f, directory=None, cache_size=64 << 20):
+    """Number of duplicate, dangling and orphan problems in the
+    ForecastDataSet document read from `f`."""
+    verifier = Verifier(f, directory, cache_size)
+    try:
+        return Counter(record['problem'] for record in verifier)
+    finally:
+        verifier.close()
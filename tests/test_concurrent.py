@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from io import StringIO
+from json import dumps, loads
+from threading import Barrier, Thread
+import re
+import sys
+
+import pytest
+
+from linkml_dataset.netbewust_laden import (ConcurrentNetbewustLaden,
+                                            NetbewustLaden)
+from linkml_dataset.store import EntityStore
+from linkml_dataset.verify import verify
+
+CRS = 'urn:ogc:def:crs:EPSG::28992'
+UUID = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                  r'[0-9a-f]{12}$')
+THREADS = 8
+
+
+def rows(substations=40, transformers=3, charge_points=4):
+    for s in range(substations):
+        for t in range(transformers):
+            ce_name = f'TR-{s}-{t}'
+            for c in range(charge_points):
+                yield 'charge_points', (
+                    f'SUB-{s}', ce_name, f'8710{s:04d}{t}{c:03d}',
+                    f'CPO {c % 3}', 'Charge Point Operator', '1234AB',
+                    str(c + 1), 'Arnhem', 'Centrum', 'Gelderland', CRS,
+                    str(120000.5 + c), str(480000.25 + c))
+            yield 'assets', (
+                f'SUB-{s}', ce_name, 'Transformer', '1234AB', 'Straat', '1',
+                None, 'Arnhem', 'Centrum', 'Gelderland', CRS, str(s), '1.0',
+                ('Load', 'ThreePhaseActivePower', 'k', 'W', 100.0 + t,
+                 '2025-01-01T00:00:00+00:00'),
+                ('Capacity', 'k', 'W', 400.0), ('NBL Limit', 'k', 'W', 320.0))
+
+
+def canonical(value):
+    """`value` with the mRIDs left out and lists in a fixed order."""
+    if isinstance(value, dict):
+        return {k: canonical(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return sorted((canonical(v) for v in value), key=dumps)
+    if isinstance(value, str) and UUID.match(value):
+        return 'mRID'
+    return value
+
+
+def build(nbl, threads=1):
+    work = list(rows())
+    barrier = Barrier(threads)
+
+    def produce(part):
+        barrier.wait()
+        for kind, args in part:
+            getattr(nbl, kind)(*args)
+
+    producers = [Thread(target=produce, args=(work[i::threads],))
+                 for i in range(threads)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    out = StringIO()
+    nbl.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def switching():
+    """Switch threads often, so the producers interleave."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize('store', [False, True])
+def test_same_as_sequential(store, switching):
+    expected = loads(build(NetbewustLaden(
+        'Test', False, EntityStore(0) if store else None)))
+    text = build(ConcurrentNetbewustLaden(
+        'Test', False, EntityStore(0) if store else None), THREADS)
+    assert not verify(StringIO(text))
+    actual = loads(text)
+    for name, value in expected.items():
+        if isinstance(value, list):
+            assert len(actual[name]) == len(value), name
+            assert canonical(actual[name]) == canonical(value), name
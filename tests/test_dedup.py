@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from io import StringIO
+
+import pytest
+
+from linkml_dataset.dedup import (Deduplicator, DuplicateError,
+                                  FingerprintSet, fingerprint)
+
+
+def charge_point(ean):
+    return ('SUB', 'TR', ean)
+
+
+def test_fingerprint_set_grows():
+    fps = FingerprintSet(capacity=8)
+    keys = [fingerprint(f'key-{i}') for i in range(1000)]
+    assert all(fps.add(fp) for fp in keys)
+    assert len(fps) == 1000
+    assert len(fps._table) >= 1000 * 4 // 3
+    assert all(fp in fps for fp in keys)
+    assert not any(fps.add(fp) for fp in keys)
+    assert fingerprint('other') not in fps
+
+
+def test_fingerprint_set_probes_collisions():
+    fps = FingerprintSet(capacity=8)
+    # Same slot in a table of 8, different fingerprints
+    colliding = [8 * i + 3 for i in range(1, 6)]
+    for fp in colliding:
+        assert fps.add(fp)
+    assert all(fp in fps for fp in colliding)
+    assert 8 * 7 + 3 not in fps
+    assert not fps.add(colliding[-1])
+
+
+def test_fingerprint_is_not_zero():
+    assert fingerprint('') != 0
+
+
+def rows(*eans):
+    return [charge_point(ean) if ean is not None else None for ean in eans]
+
+
+def test_first():
+    rejects = StringIO()
+    dedup = Deduplicator('first', rejects)
+    result = list(dedup.rows(rows('a', 'b', None, 'a', 'b', 'a'),
+                             'charge_points'))
+    assert result == rows('a', 'b', None, None, None, None)
+    assert dedup.rejected['charge_points'] == 3
+    assert rejects.getvalue().splitlines() == [
+        'kind,row,key', 'charge_points,4,a', 'charge_points,5,b',
+        'charge_points,6,a']
+
+
+def test_last():
+    dedup = Deduplicator('last')
+    data = rows('a', 'b', 'a', 'c', 'a', None)
+    dedup.scan(data, 'charge_points')
+    result = list(dedup.rows(data, 'charge_points'))
+    assert result == rows(None, 'b', None, 'c', 'a', None)
+    assert dedup.rejected['charge_points'] == 2
+
+
+def test_error():
+    dedup = Deduplicator('error')
+    with pytest.raises(DuplicateError, match='row 3'):
+        list(dedup.rows(rows('a', 'b', 'a'), 'charge_points'))
+
+
+def test_seeded_keys_are_duplicates():
+    for policy in ('first', 'last'):
+        dedup = Deduplicator(policy)
+        dedup.seed('charge_points', ['a', None])
+        data = rows('a', 'b', 'b')
+        if policy == 'last':
+            dedup.scan(data, 'charge_points')
+        result = list(dedup.rows(data, 'charge_points'))
+        expected = rows(None, 'b', None) if policy == 'first' else \
+            rows(None, None, 'b')
+        assert result == expected, policy
+    dedup = Deduplicator('error')
+    dedup.seed('charge_points', ['a'])
+    with pytest.raises(DuplicateError, match='row 1'):
+        list(dedup.rows(rows('a'), 'charge_points'))
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Deduplicator('random')
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Thread
+from time import process_time
+import signal
+
+import pytest
+
+from linkml_dataset.profiling import Profiler
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                                reason='needs signal.setitimer')
+
+
+def spin(seconds):
+    end = process_time() + seconds
+    while process_time() < end:
+        pass
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def names(profiler):
+    return {code.co_name for stack in profiler.stacks for code in stack}
+
+
+def test_waiting_threads_are_left_out():
+    stop = Event()
+    with ThreadPoolExecutor(4) as pool:
+        # Start the workers, which then wait for work
+        for future in [pool.submit(int) for _ in range(4)]:
+            future.result()
+        waiter = Thread(target=stop.wait)
+        waiter.start()
+        worker = Thread(target=busy, args=(stop,))
+        worker.start()
+        profiler = Profiler(0.001)
+        profiler.start()
+        try:
+            spin(0.3)
+        finally:
+            profiler.stop()
+            stop.set()
+            waiter.join()
+            worker.join()
+    found = names(profiler)
+    assert 'spin' in found
+    assert 'busy' in found
+    assert '_worker' not in found and 'wait' not in found
+    assert profiler.idle
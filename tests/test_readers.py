@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from linkml_dataset.readers import ARGS, _used_columns, read_rows, RowCache
+
+
+def write_csv(path, rows, unused=True):
+    header = _used_columns(ARGS['charge_points']) + ['REGION']
+    if unused:
+        header.append('999_Unused')
+    lines = [','.join(header)]
+    for i, short in enumerate(rows):
+        values = [f'v{i}'] * len(header)
+        values[header.index('126_CoordinateSystem.Name')] = 'EPSG:28992'
+        values[header.index('REGION')] = f'R{i}'
+        lines.append(','.join(values[:len(values) - short]))
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+def test_short_rows(tmp_path, mapped):
+    path = tmp_path / 'cp.csv'
+    # Short in the unused column, in REGION, in a used column
+    write_csv(path, [0, 1, 2, 5])
+    with open(path) as f:
+        rows = list(read_rows(f, 'charge_points', mapped=mapped,
+                              extra='REGION'))
+    assert [row is not None for row in rows] == [True, True, False, False]
+    assert [row[-1] for row in rows[:2]] == ['R0', 'R1']
+
+
+def test_cache(tmp_path):
+    path = tmp_path / 'cp.csv'
+    write_csv(path, [0, 0, 3])
+    cache = RowCache(str(tmp_path / 'cache'), 1 << 20)
+    with open(path) as f:
+        rows = list(read_rows(f, 'charge_points', cache=cache))
+    with open(path) as f:
+        assert list(read_rows(f, 'charge_points', cache=cache)) == rows
+    with open(path) as f:
+        extra = list(read_rows(f, 'charge_points', cache=cache,
+                               extra='REGION'))
+    assert [row[:-1] for row in extra[:2]] == rows[:2]
+
+
+def test_missing_column(tmp_path):
+    path = tmp_path / 'cp.csv'
+    write_csv(path, [0])
+    with open(path) as f, pytest.raises(KeyError):
+        list(read_rows(f, 'charge_points', extra='NOPE'))
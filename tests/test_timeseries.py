@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from io import StringIO
+from json import loads
+import warnings
+
+import pytest
+
+from linkml_dataset.netbewust_laden import NetbewustLaden
+from linkml_dataset.rdf import write_rdf
+from linkml_dataset.store import EntityStore
+from linkml_dataset.timeseries import Series, duration, read_loads
+
+CRS = 'urn:ogc:def:crs:EPSG::28992'
+LOADS = '''2_ConductingEquipment.Name,35_AnalogValue.Timestamp,34_AnalogValue.Value
+TR-1,2025-01-01T00:15:00+00:00,20
+TR-1,2025-01-01T00:00:00+00:00,10
+TR-1,2025-01-01T01:00:00+00:00,30
+TR-2,2025-01-01T00:00:00+00:00,5
+'''
+
+
+def build(store=None):
+    nbl = NetbewustLaden('Test', False, store)
+    nbl.set_loads(read_loads(StringIO(LOADS)))
+    for ce_name in ('TR-1', 'TR-3'):
+        nbl.assets('SUB', ce_name, 'Transformer', '1234AB', 'Straat', '1',
+                   None, 'Arnhem', 'Centrum', 'Gelderland', CRS, '1.0',
+                   '2.0', ('Load', 'ThreePhaseActivePower', 'k', 'W', 100.0,
+                           '2025-01-01T00:00:00+00:00'),
+                   ('Capacity', 'k', 'W', 400.0),
+                   ('NBL Limit', 'k', 'W', 320.0))
+    return nbl
+
+
+def test_aggregate():
+    series = Series()
+    for t, v in ((0, 1.0), (600, 3.0), (900, 2.0), (1800, 4.0)):
+        series.append(t, v)
+    assert list(series.aggregate(900, 'max').values) == [3.0, 2.0, 4.0]
+    assert list(series.aggregate(1800, 'mean').values) == [2.0, 4.0]
+    assert duration('15m') == 900
+    with pytest.raises(ValueError):
+        duration('0')
+
+
+def test_read_loads_sorts():
+    series = read_loads(StringIO(LOADS))
+    assert list(series['TR-1'].values) == [10.0, 20.0, 30.0]
+
+
+@pytest.mark.parametrize('store', [False, True])
+def test_series_analogs(store):
+    nbl = build(EntityStore(0) if store else None)
+    # The models stay valid pydantic models
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        nbl._fc.model_dump_json()
+    out = StringIO()
+    nbl.write(out)
+    analogs = loads(out.getvalue())['analogs']
+    assert [[v['value'] for v in a['analog_values']] for a in analogs] == \
+        [[10.0, 20.0, 30.0], [100.0]]
+    assert loads(str(nbl))['analogs'] == analogs
+    # Same mRIDs in every serialization
+    out = StringIO()
+    nbl.write(out)
+    assert loads(out.getvalue())['analogs'] == analogs
+    out = StringIO()
+    write_rdf(out, nbl.fields(), 'nt')
+    assert out.getvalue().count('AnalogValue.value>') == 4
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from io import StringIO
+import os
+
+from linkml_dataset.cgmes import CGMES
+from linkml_dataset.cgmes_forecast import CGMESForecast
+from linkml_dataset.netbewust_laden import NetbewustLaden
+from linkml_dataset.verify import verify
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+CRS = 'urn:ogc:def:crs:EPSG::28992'
+
+
+def problems(nbl):
+    return verify(StringIO(str(nbl)))
+
+
+def test_netbewust_laden_is_clean():
+    nbl = NetbewustLaden('Test', False)
+    for t in range(2):
+        ce_name = f'TR-{t}'
+        nbl.assets('SUB', ce_name, 'Transformer', '1234AB', 'Straat', '1',
+                   None, 'Arnhem', 'Centrum', 'Gelderland', CRS, '1.0',
+                   '2.0', ('Load', 'ThreePhaseActivePower', 'k', 'W', 100.0,
+                           '2025-01-01T00:00:00+00:00'),
+                   ('Capacity', 'k', 'W', 400.0),
+                   ('NBL Limit', 'k', 'W', 320.0))
+        for c in range(3):
+            nbl.charge_points('SUB', ce_name, f'87100000000{t}{c}', 'Shell',
+                              'CPO', '1234AB', str(c), 'Arnhem', 'Centrum',
+                              'Gelderland', CRS, '1.0', '2.0')
+    assert not problems(nbl)
+
+
+def test_cgmes_forecast_is_clean():
+    with open(os.path.join(DATA, 'cgmes.jsonld'), encoding='utf-8') as f:
+        converter = CGMESForecast(CGMES(f))
+    nbl = converter.convert(NetbewustLaden('Test', False))
+    assert 'connectivity_nodes' in str(nbl)
+    assert not problems(nbl)
+
+
+def test_dangling_reference():
+    nbl = NetbewustLaden('Test', False)
+    nbl._fc.sub_geographical_regions[0].substations.append('missing')
+    counts = problems(nbl)
+    assert counts['dangling'] == 1